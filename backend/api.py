@@ -1,46 +1,100 @@
-from flask import Flask, jsonify, send_file, make_response
+from flask import Flask, Response, jsonify, request, send_file, make_response
 from flask_cors import CORS
 from flask_socketio import SocketIO
 import io
-from network_scanner import NetworkScanner
-from device_identifier import DeviceIdentifier
-from graph_generator import NetworkGraphGenerator
+from components import Components
+from metrics import REGISTRY, ScanProfiler, ScanTimer, span
+from contextlib import nullcontext
+import os
 import traceback
-import threading
-import queue
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
+import uuid
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Queue for scan results
-scan_queue = queue.Queue()
-last_scan_results = []  # Cache for last scan results
-
-# Initialize components with error handling
-try:
-    scanner = NetworkScanner()  # Let it auto-detect network range
-    identifier = DeviceIdentifier()
-    graph_gen = NetworkGraphGenerator()
-except Exception as e:
-    print(f"Initialization error: {str(e)}")
-    traceback.print_exc()
-    raise
-
-def background_scan():
-    """Perform network scan in background"""
-    global last_scan_results
-    try:
-        devices = scanner.scan_network()
-        if devices:
-            for device in devices:
-                device['type'] = identifier.identify_device(device)
-            last_scan_results = devices
-        scan_queue.put(devices)
-    except Exception as e:
-        scan_queue.put({'error': str(e)})
+GRAPH_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'json': 'application/json'}
+SCAN_PROCESSES = int(os.environ.get('NETMAP_SCAN_PROCESSES', os.cpu_count() or 1))
+# Seconds between liveness sweeps, and the period over which every host is re-fingerprinted; 0 disables
+MONITOR_INTERVAL = float(os.environ.get('NETMAP_MONITOR_INTERVAL', 60))
+MONITOR_DEEP_INTERVAL = float(os.environ.get('NETMAP_MONITOR_DEEP_INTERVAL', 900))
+# 'adaptive' probes the ports learned from earlier scans per host, 'fixed' the same four everywhere
+PORT_SELECTION = os.environ.get('NETMAP_PORT_SELECTION', 'adaptive')
+
+# Scanner, identifier, graph generator, jobs and monitor are built on first use
+components = Components(scan_processes=SCAN_PROCESSES, monitor_interval=MONITOR_INTERVAL,
+                        monitor_deep_interval=MONITOR_DEEP_INTERVAL, registry=REGISTRY,
+                        port_selection=PORT_SELECTION)
+
+# Every job and monitor event is pushed to connected clients
+components.add_listener(lambda event, payload: socketio.emit(event, payload))
+
+# Monitor sequence numbers restart with the process, so validators built from them carry this too
+INSTANCE = uuid.uuid4().hex[:8]
+_monitor_tables = {}  # version -> DeviceTable of the monitor's devices at that version
+
+def submit_scan(mode: str = 'delta', profile: str = None, budget: float = None, resume=None):
+    """Start a sweep of every range, or attach to the one already running.
+
+    profile names a ScanProfiler engine to run this one scan under; such
+    scans never coalesce with others. budget, in seconds, runs a
+    ScheduledScan instead, which fingerprints hosts in priority order and
+    stops when the budget is spent; resume, a job such a scan left a
+    checkpoint on, carries that scan on from where it stopped.
+    """
+    scanner = components.scanner()
+    identifier = components.identifier()
+    source = components.sharded_scanner() or scanner
+    timer = ScanTimer()
+    if budget is not None or resume is not None:
+        if profile:
+            raise ValueError('Budgeted scans cannot be profiled')
+        # Scheduled in this process: the priority queue spans every range
+        from scan_scheduler import ScheduledScan
+        checkpoint = resume.checkpoint if resume is not None else None
+
+        def run_scheduled(progress_callback):
+            return ScheduledScan(scanner, budget, identifier=identifier, mode=mode, checkpoint=checkpoint,
+                                 progress_callback=progress_callback, timer=timer)
+
+        key = f"resume:{resume.id}" if resume is not None else f"{mode}:{','.join(scanner.network_ranges)}"
+        return components.scan_jobs().submit(f"{key}:budget:{budget}", run_scheduled, timer)
+    profiler = ScanProfiler(profile) if profile else None
+
+    def run_scan(progress_callback):
+        with profiler or nullcontext():
+            for device in source.iter_scan_network(progress_callback=progress_callback, mode=mode, timer=timer):
+                with timer.span('identify'):
+                    device['type'] = identifier.identify_device(device)
+                yield device
+        if source is not scanner and scanner.port_selector is not None:
+            # Workers kept their own port statistics in the inventory
+            scanner.port_selector.reload()
+        if profiler is not None:
+            timer.profile = profiler.summary()
+
+    key = f"{mode}:{','.join(scanner.network_ranges)}"
+    if profiler is not None:
+        key += f":profile:{timer.started_at}"
+    return components.scan_jobs().submit(key, run_scan, timer)
+
+def device_snapshot():
+    """(DeviceTable, version) of the monitor's state or the last completed scan, or (None, None)"""
+    monitor = components.monitor()
+    status = monitor.status()
+    if status['device_count']:
+        version = f"monitor:{INSTANCE}:{status['last_seq']}"
+        table = _monitor_tables.get(version)
+        if table is None:
+            from device_table import DeviceTable
+            table = DeviceTable(monitor.devices())
+            _monitor_tables.clear()
+            _monitor_tables[version] = table
+        return table, version
+    job = components.scan_jobs().latest_completed()
+    if job is None:
+        return None, None
+    return job.devices, f"scan:{job.id}"
 
 @app.after_request
 def after_request(response):
@@ -52,46 +106,177 @@ def after_request(response):
 @app.route('/api/scan', methods=['GET'])
 def scan_network():
     try:
-        # Start background scan
-        scan_thread = threading.Thread(target=background_scan)
-        scan_thread.start()
-        
-        # Wait for results with timeout
+        # Results are pushed as device_found / scan_progress / scan_complete events
+        mode = request.args.get('mode', 'delta')
+        if mode not in ('delta', 'full'):
+            return jsonify({'error': f'Unknown scan mode: {mode}'}), 400
+        # ?profile=cprofile|pyinstrument profiles this scan; the report path lands in its timings
+        profile = request.args.get('profile')
+        # ?budget=<seconds> bounds the scan; ?resume=<scan_id> continues one that ran out
         try:
-            result = scan_queue.get(timeout=45)  # Extended timeout
-            if isinstance(result, dict) and 'error' in result:
-                return jsonify({'error': result['error']}), 500
-            if result:
-                return jsonify(result)
-            return jsonify({'error': 'No devices found'}), 404
-        except queue.Empty:
-            return jsonify({'error': 'Scan timeout'}), 504
-            
+            budget = float(request.args['budget']) if 'budget' in request.args else None
+        except ValueError:
+            return jsonify({'error': 'budget must be a number of seconds'}), 400
+        if budget is not None and budget <= 0:
+            return jsonify({'error': 'budget must be positive'}), 400
+        resume = None
+        if 'resume' in request.args:
+            resume = components.scan_jobs().get(request.args['resume'])
+            if resume is None:
+                return jsonify({'error': 'Unknown scan id'}), 404
+            if resume.checkpoint is None:
+                return jsonify({'error': 'Scan has nothing left to resume'}), 409
+        try:
+            job, coalesced = submit_scan(mode, profile, budget, resume)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        response = job.to_dict(include_devices=coalesced)
+        response['coalesced'] = coalesced
+        return jsonify(response), 202
     except Exception as e:
         print(f"Scan error: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/scan/<scan_id>', methods=['GET'])
+def get_scan(scan_id):
+    job = components.scan_jobs().get(scan_id)
+    if job is None:
+        return jsonify({'error': 'Unknown scan id'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/probe-stats', methods=['GET'])
+def get_probe_stats():
+    """Achieved packets per second, loss and congestion limits per probe type"""
+    return jsonify(components.scanner().probe_stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latency histograms, host and probe counters in Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    """Monitor change feed: device_joined / device_left / device_changed newer than ?since=<seq>"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 500)), 1000)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    monitor = components.monitor()
+    events, last_seq = monitor.events_since(since, limit)
+    return jsonify({'events': events, 'last_seq': last_seq, 'monitor': monitor.status()})
+
+@app.route('/api/devices', methods=['GET'])
+def get_devices():
+    """One page of the current devices in IPv4 order.
+
+    Filters: ?subnet= &type= &vendor= &port= (repeatable or comma-separated);
+    ?fields=ip,mac projects; ?limit= and ?cursor=<next_cursor> page. JSON, or
+    MessagePack with Accept: application/msgpack or ?format=msgpack;
+    compressed per Accept-Encoding.
+    """
+    try:
+        import device_query
+        try:
+            query = device_query.DeviceQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        available = device_query.formats()
+        fmt = request.args.get('format')
+        if fmt is None and request.accept_mimetypes:
+            best = request.accept_mimetypes.best_match([device_query.MEDIA_TYPES[f] for f in available])
+            if best is None:
+                return jsonify({'error': f'Acceptable formats: {", ".join(available)}'}), 406
+            fmt = available[[device_query.MEDIA_TYPES[f] for f in available].index(best)]
+        fmt = fmt or 'json'
+        if fmt not in device_query.MEDIA_TYPES:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        if fmt not in available:
+            return jsonify({'error': f'{fmt} encoding is not installed'}), 406
+
+        table, version = device_snapshot()
+        if table is None:
+            job, _ = submit_scan()
+            response = jsonify({'status': 'scanning', 'scan_id': job.id})
+            response.headers['Retry-After'] = '5'
+            return response, 202
+
+        coding = request.accept_encodings.best_match(device_query.content_codings())
+        etag = device_query.etag(version, query, fmt, coding)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            with span('devices'):
+                page = query.page(table)
+                page['version'] = version
+                body = device_query.encode(page, fmt)
+                compressed = coding is not None and len(body) >= device_query.COMPRESS_MIN_BYTES
+                if compressed:
+                    body = device_query.compress(body, coding)
+            response = Response(body, mimetype=device_query.MEDIA_TYPES[fmt])
+            if compressed:
+                response.headers['Content-Encoding'] = coding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        return response
+    except Exception as e:
+        print(f"Devices error: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/graph', methods=['GET'])
 def get_graph():
+    """Rendered network map: ?format=png|svg|json, ?size=thumb for a small PNG/SVG,
+    ?layout=auto|spring|radial|force"""
     try:
-        devices = last_scan_results if last_scan_results else scanner.scan_network()
+        # Deferred: networkx and matplotlib load with the first graph request
+        from graph_generator import FORMATS as GRAPH_FORMATS, LAYOUTS as GRAPH_LAYOUTS
+        fmt = request.args.get('format', 'png')
+        if fmt not in GRAPH_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        thumbnail = request.args.get('size') == 'thumb'
+        layout = request.args.get('layout', 'auto')
+        if layout not in GRAPH_LAYOUTS:
+            return jsonify({'error': f'Unsupported layout: {layout}'}), 400
+
+        # Served from the monitor's state or the last scan; never waits for a sweep
+        devices = components.monitor().devices()
+        if not devices:
+            job = components.scan_jobs().latest_completed()
+            if job is None:
+                job, _ = submit_scan()
+                response = jsonify({'status': 'scanning', 'scan_id': job.id})
+                response.headers['Retry-After'] = '5'
+                return response, 202
+            devices = list(job.devices)
         if not devices:
             return jsonify({'error': 'No devices found'}), 404
             
         for device in devices:
             if 'type' not in device:
-                device['type'] = identifier.identify_device(device)
+                device['type'] = components.identifier().identify_device(device)
             
-        graph_image = graph_gen.create_graph(devices)
-        response = make_response(send_file(
-            io.BytesIO(graph_image),
-            mimetype='image/png',
-            download_name='network_map.png'
-        ))
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+        graph_gen = components.graph_generator()
+        # The content key doubles as the ETag, so a revalidation never renders
+        etag = graph_gen.render_key(devices, fmt, thumbnail, layout)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            try:
+                with span('render'):
+                    graph_data, etag = graph_gen.render(devices, fmt, thumbnail, layout)
+            except ValueError as e:
+                # A layout the graph is too large for
+                return jsonify({'error': str(e)}), 400
+            response = make_response(send_file(
+                io.BytesIO(graph_data),
+                mimetype=GRAPH_MIMETYPES[fmt],
+                download_name=f'network_map.{fmt}'
+            ))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
         return response
     except Exception as e:
         print(f"Graph error: {str(e)}")
@@ -99,4 +284,6 @@ def get_graph():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Start the monitor while the server comes up rather than on the first request
+    components.warm_up()
     socketio.run(app, debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,190 @@
+import ipaddress
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .rate_control import ScanRateLimiter
+except ImportError:
+    from rate_control import ScanRateLimiter
+
+ETH_P_ARP = 0x0806
+_BROADCAST = b'\xff' * 6
+_TARGET_IP_OFFSET = 38
+_FRAME_SIZE = 42
+# Seconds local interface addresses are reused before psutil is asked again
+INTERFACE_CACHE_TTL = 300.0
+
+_interfaces: Optional[Tuple[float, List[Dict]]] = None
+_interfaces_lock = threading.Lock()
+
+
+def build_request_template(src_mac: bytes, src_ip: bytes) -> bytearray:
+    """Broadcast ARP who-has frame with the target address left blank"""
+    ether = _BROADCAST + src_mac + struct.pack('!H', ETH_P_ARP)
+    arp = struct.pack('!HHBBH', 1, 0x0800, 6, 4, 1) + src_mac + src_ip + b'\x00' * 6 + b'\x00' * 4
+    return bytearray(ether + arp)
+
+
+def parse_reply(frame: bytes) -> Optional[Tuple[str, str]]:
+    """(sender ip, sender mac) of an ARP reply frame, or None"""
+    if len(frame) < _FRAME_SIZE or frame[12:14] != b'\x08\x06' or frame[20:22] != b'\x00\x02':
+        return None
+    mac = ':'.join(f'{b:02x}' for b in frame[22:28])
+    return socket.inet_ntoa(frame[28:32]), mac
+
+
+def local_interfaces(max_age: float = INTERFACE_CACHE_TTL) -> List[Dict]:
+    """IPv4 addresses (name, ip, netmask, mac) of every interface that is up.
+
+    Enumerating interfaces is slow on hosts with many of them, so the list
+    is cached for max_age seconds; max_age=0 forces a fresh read.
+    """
+    global _interfaces
+    with _interfaces_lock:
+        if _interfaces is not None and time.monotonic() - _interfaces[0] < max_age:
+            return _interfaces[1]
+        import psutil  # deferred: only scans of the live network need it
+        stats = psutil.net_if_stats()
+        interfaces = []
+        for name, addrs in psutil.net_if_addrs().items():
+            if name in stats and not stats[name].isup:
+                continue
+            link = [a.address for a in addrs if a.family == psutil.AF_LINK]
+            for addr in addrs:
+                if addr.family == socket.AF_INET and addr.netmask:
+                    interfaces.append({'name': name, 'ip': addr.address, 'netmask': addr.netmask,
+                                       'mac': link[0] if link else ''})
+        _interfaces = (time.monotonic(), interfaces)
+        return interfaces
+
+
+def interface_for_range(network_range: str) -> Optional[Dict]:
+    """Local interface (name, ip, mac) whose subnet contains network_range"""
+    network = ipaddress.IPv4Network(network_range, strict=False)
+    for interface in local_interfaces():
+        if not interface['mac']:
+            continue
+        local = ipaddress.IPv4Network(f"{interface['ip']}/{interface['netmask']}", strict=False)
+        if network.subnet_of(local) or local.subnet_of(network):
+            return {'name': interface['name'], 'ip': interface['ip'], 'mac': interface['mac']}
+    return None
+
+
+class RawArpSweeper:
+    """ARP sweep over a raw AF_PACKET socket.
+
+    Requests are written from a precomputed frame template at a fixed rate
+    while a receiver thread collects replies, so sending and receiving
+    overlap instead of waiting on each other. Unanswered targets are
+    retried in later passes.
+
+    With a rate_limiter, sends also draw on its global and range budgets.
+    Hosts that only answer a retransmission count as lost requests; when
+    a pass loses too many, the limiter's ARP controller halves the rate
+    used for later passes and sweeps.
+    """
+
+    def __init__(self, interface: str, src_mac: str, src_ip: str, rate_pps: float = 5000,
+                 retries: int = 2, reply_timeout: float = 1.0, rate_limiter: ScanRateLimiter = None):
+        self.interface = interface
+        self.src_mac = bytes.fromhex(src_mac.replace(':', '').replace('-', ''))
+        self.src_ip = socket.inet_aton(src_ip)
+        self.rate_pps = rate_pps
+        self.retries = retries
+        self.reply_timeout = reply_timeout
+        self.rate_limiter = rate_limiter
+
+    def _pass_rate(self) -> float:
+        if self.rate_limiter is None:
+            return self.rate_pps
+        return min(self.rate_pps, self.rate_limiter.congestion['arp'].current)
+
+    @staticmethod
+    def supported() -> bool:
+        """True when raw packet sockets can be opened (Linux with CAP_NET_RAW)"""
+        if not hasattr(socket, 'AF_PACKET'):
+            return False
+        try:
+            socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP)).close()
+            return True
+        except OSError:
+            return False
+
+    def _open(self) -> socket.socket:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        sock.bind((self.interface, ETH_P_ARP))
+        sock.settimeout(0.1)
+        return sock
+
+    def _receive(self, sock: socket.socket, pending: set, found: Dict[str, str], stop: threading.Event):
+        while not stop.is_set():
+            try:
+                frame = sock.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            reply = parse_reply(frame)
+            if reply and reply[0] in pending:
+                ip, mac = reply
+                found.setdefault(ip, mac)
+
+    def _send(self, sock: socket.socket, template: bytearray, targets: List[str],
+              found: Dict[str, str]):
+        """Send one pass of requests, pacing to the pass rate; returns the targets sent to"""
+        rate = self._pass_rate()
+        interval = 1.0 / rate if rate else 0
+        limiter = self.rate_limiter
+        started = time.monotonic()
+        sent = []
+        for ip in targets:
+            if ip in found:
+                continue
+            if limiter is not None:
+                limiter.acquire(ip, per_host=False)
+            template[_TARGET_IP_OFFSET:_FRAME_SIZE] = socket.inet_aton(ip)
+            try:
+                sock.send(template)
+            except OSError as e:
+                print(f"ARP send error on {self.interface}: {e}")
+                break
+            sent.append(ip)
+            if interval:
+                ahead = started + len(sent) * interval - time.monotonic()
+                if ahead > 0:
+                    time.sleep(ahead)
+        return sent
+
+    def sweep(self, targets: Iterable[str]) -> Dict[str, str]:
+        """ARP every target, returning the MAC address of each responder"""
+        targets = list(targets)
+        pending = set(targets)
+        found = {}
+        template = build_request_template(self.src_mac, self.src_ip)
+        stop = threading.Event()
+
+        sock = self._open()
+        receiver = threading.Thread(target=self._receive, args=(sock, pending, found, stop), daemon=True)
+        receiver.start()
+        try:
+            for attempt in range(self.retries + 1):
+                answered_before = len(found)
+                sent = self._send(sock, template, targets, found)
+                time.sleep(self.reply_timeout)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.record_pass('arp', len(sent), len(found) - answered_before, attempt, len(found))
+                if len(found) == len(pending):
+                    break
+        finally:
+            stop.set()
+            receiver.join()
+            sock.close()
+        return found
+
+    def sweep_range(self, network_range: str) -> Dict[str, str]:
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        return self.sweep(str(ip) for ip in network.hosts())
+
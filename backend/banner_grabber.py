@@ -0,0 +1,209 @@
+"""
+Service banner grabbing and signature matching.
+
+Open ports are connected to concurrently. Each connection either waits
+for the greeting a server sends first (SSH, FTP, SMTP, ...) or sends a
+small protocol probe (HTTP HEAD, SMB negotiate, RTSP OPTIONS), and reads
+at most read_bytes of the reply before a hard deadline. Ports without a
+known probe get the null probe and, if they stay silent, an HTTP HEAD on
+the same connection.
+
+Replies are matched against SIGNATURES through a SignatureIndex, which
+compiles every pattern into a single regex so a banner is scanned once
+however many signatures there are.
+"""
+import asyncio
+import re
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .port_scanner import _max_open_sockets
+    from .rate_control import ScanRateLimiter
+except ImportError:
+    from port_scanner import _max_open_sockets
+    from rate_control import ScanRateLimiter
+
+
+def _smb_negotiate() -> bytes:
+    """SMB1 negotiate request offering NT LM 0.12 and SMB 2.x, which SMB1 and SMB2 servers both answer"""
+    dialects = b''.join(b'\x02' + name + b'\x00' for name in (b'NT LM 0.12', b'SMB 2.002', b'SMB 2.???'))
+    header = b'\xffSMB' + struct.pack('<BIBH12xHHHH', 0x72, 0, 0x18, 0xc801, 0, 0xfeff, 0, 0)
+    body = header + b'\x00' + struct.pack('<H', len(dialects)) + dialects
+    return struct.pack('!I', len(body)) + body
+
+
+PROBES = {
+    'null': b'',
+    'http': b'HEAD / HTTP/1.0\r\n\r\n',
+    'rtsp': b'OPTIONS * RTSP/1.0\r\nCSeq: 1\r\n\r\n',
+    'smb': _smb_negotiate(),
+}
+
+# Probe sent first on well-known ports; other ports get 'null' then 'http'
+PORT_PROBES = {
+    80: 'http', 81: 'http', 631: 'http', 5000: 'http', 8000: 'http', 8008: 'http',
+    8080: 'http', 8081: 'http', 8888: 'http', 32400: 'http',
+    445: 'smb',
+    554: 'rtsp', 8554: 'rtsp',
+}
+
+# (pattern, service, product), matched at the start of the banner; the first
+# signature in the list that matches wins. When product is None, group 1 is
+# the product and group 2 the version; otherwise group 1, if any, is the version.
+SIGNATURES: List[Tuple[str, str, Optional[str]]] = [
+    (r'^SSH-[\d.]+-OpenSSH[_-]([\w.]+)', 'ssh', 'OpenSSH'),
+    (r'^SSH-[\d.]+-dropbear[_-]?([\w.]*)', 'ssh', 'Dropbear'),
+    (r'^SSH-[\d.]+-ROSSSH', 'ssh', 'MikroTik RouterOS'),
+    (r'^SSH-[\d.]+-(\S+)', 'ssh', None),
+    (r'^220[- ][^\r\n]*vsFTPd ([\w.]+)', 'ftp', 'vsftpd'),
+    (r'^220[- ][^\r\n]*ProFTPD ([\w.]+)', 'ftp', 'ProFTPD'),
+    (r'^220[- ][^\r\n]*FileZilla Server ([\w.]+)', 'ftp', 'FileZilla Server'),
+    (r'^220[- ][^\r\n]*Microsoft FTP', 'ftp', 'Microsoft FTP'),
+    (r'^220[- ][^\r\n]*FTP', 'ftp', 'FTP'),
+    (r'^220[- ][^\r\n]*Postfix', 'smtp', 'Postfix'),
+    (r'^220[- ][^\r\n]*Exim ([\w.]+)', 'smtp', 'Exim'),
+    (r'^220[- ][^\r\n]*Microsoft ESMTP', 'smtp', 'Microsoft Exchange'),
+    (r'^220[- ][^\r\n]*E?SMTP', 'smtp', 'SMTP'),
+    (r'^\+OK[^\r\n]*(?:POP3|ready)', 'pop3', 'POP3'),
+    (r'^\* OK[^\r\n]*IMAP', 'imap', 'IMAP'),
+    (r'^RFB (\d{3}\.\d{3})', 'vnc', 'VNC'),
+    (r'^RTSP/1\.0 \d{3}.*?\r\nServer: ([^\r\n/]+?)(?:/([\w.]+)[^\r\n]*)?\r', 'rtsp', None),
+    (r'^RTSP/1\.0 \d{3}', 'rtsp', 'RTSP'),
+    (r'^.\x00\x00\x00\x0a(5\.5\.[\w.-]+-MariaDB)', 'mysql', 'MariaDB'),
+    (r'^.\x00\x00\x00\x0a([\d.]+)', 'mysql', 'MySQL'),
+    (r'^\x00...\xfeSMB', 'smb', 'SMB2'),
+    (r'^\x00...\xffSMB', 'smb', 'SMB1'),
+    (r'^HTTP/1\.[01] \d{3}.*?\r\nServer: ([^\r\n/]+?)(?:/([\w.]+)[^\r\n]*)?\r', 'http', None),
+    (r'^HTTP/1\.[01] \d{3}', 'http', 'HTTP'),
+]
+
+
+class SignatureIndex:
+    """All signatures compiled into one alternation, matched in a single pass over a banner.
+
+    Signatures are anchored at the start of the banner, and an alternation
+    tries its branches in order, so the branch that matches is the first
+    signature in the list that would have matched on its own.
+    """
+
+    def __init__(self, signatures: List[Tuple[str, str, Optional[str]]] = None):
+        self.signatures = list(SIGNATURES if signatures is None else signatures)
+        self._patterns = [re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern, _, _ in self.signatures]
+        alternation = '|'.join(f'(?P<s{index}>{pattern})' for index, (pattern, _, _) in enumerate(self.signatures))
+        self._regex = re.compile(alternation, re.IGNORECASE | re.DOTALL)
+
+    def match(self, banner: bytes) -> Optional[Dict]:
+        """Service, product and version of the first signature matching banner, or None"""
+        text = banner.decode('latin-1')
+        found = self._regex.match(text)
+        if found is None:
+            return None
+        # The signature's own group encloses its inner groups, so it is the last one closed
+        index = int(found.lastgroup[1:])
+        _, service, product = self.signatures[index]
+        groups = [g for g in self._patterns[index].match(text).groups() if g]
+        if product is None:
+            product = groups.pop(0) if groups else ''
+        return {'service': service, 'product': product.strip(), 'version': groups[0] if groups else ''}
+
+
+def banner_summary(banner: bytes, limit: int = 80) -> str:
+    """First printable line of a banner, for display"""
+    line = banner.split(b'\n', 1)[0].decode('latin-1').strip()
+    return ''.join(c if c.isprintable() else '.' for c in line)[:limit]
+
+
+class BannerGrabber:
+    """Concurrent banner grabbing with capped reads and per-connection deadlines.
+
+    With a rate_limiter every connection spends a token from its global,
+    range and host budgets and is counted in its 'banner' metrics.
+    """
+
+    def __init__(self, max_concurrency: int = 512, read_bytes: int = 1024, connect_timeout: float = 1.0,
+                 read_timeout: float = 2.0, greeting_timeout: float = 0.5, idle_timeout: float = 0.1,
+                 index: SignatureIndex = None, rate_limiter: ScanRateLimiter = None):
+        self.max_concurrency = _max_open_sockets(max_concurrency)
+        self.read_bytes = read_bytes
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.greeting_timeout = greeting_timeout
+        self.idle_timeout = idle_timeout
+        self.index = index or SignatureIndex()
+        self.rate_limiter = rate_limiter
+
+    async def _read(self, reader: asyncio.StreamReader, timeout: float) -> bytes:
+        """Read until read_bytes, EOF, or the line goes quiet after the first chunk"""
+        data = b''
+        deadline = time.monotonic() + timeout
+        while len(data) < self.read_bytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(self.read_bytes - len(data)),
+                                               min(remaining, self.idle_timeout) if data else remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    async def _grab(self, ip: str, port: int) -> bytes:
+        """Banner of one port: the probe for the port, or null then HTTP"""
+        probes = [PORT_PROBES[port]] if port in PORT_PROBES else ['null', 'http']
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), self.connect_timeout)
+        try:
+            for name in probes:
+                payload = PROBES[name]
+                if payload:
+                    writer.write(payload)
+                    await writer.drain()
+                timeout = self.read_timeout if payload else self.greeting_timeout
+                data = await self._read(reader, timeout)
+                if data:
+                    return data
+            return b''
+        finally:
+            writer.close()
+
+    async def _probe(self, ip: str, port: int, semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        limiter = self.rate_limiter
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire_async(ip)
+            try:
+                banner = await self._grab(ip, port)
+            except (OSError, asyncio.TimeoutError):
+                banner = b''
+            if limiter is not None:
+                limiter.metrics['banner'].record(sent=1, answered=int(bool(banner)), lost=int(not banner))
+        if not banner:
+            return None
+        service = self.index.match(banner) or {'service': 'unknown', 'product': '', 'version': ''}
+        return dict(service, port=port, banner=banner_summary(banner))
+
+    async def grab_many_async(self, targets: Dict[str, Iterable[int]]) -> Dict[str, List[Dict]]:
+        """Grab every open port of every host; returns the identified services per host, by port"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [(ip, asyncio.ensure_future(self._probe(ip, port, semaphore)))
+                 for ip, ports in targets.items() for port in sorted(set(ports))]
+        results = {}
+        for ip, task in tasks:
+            try:
+                service = await task
+            except Exception as e:
+                print(f"Banner grab error for {ip}: {e}")
+                continue
+            if service:
+                results.setdefault(ip, []).append(service)
+        return results
+
+    def grab_many(self, targets: Dict[str, Iterable[int]]) -> Dict[str, List[Dict]]:
+        """Blocking wrapper around grab_many_async"""
+        if not any(targets.values()):
+            return {}
+        return asyncio.run(self.grab_many_async(targets))
@@ -0,0 +1,136 @@
+"""
+Lazily built application components.
+
+Importing the scanner pulls in the port, ARP, DNS and nmap stages, the
+graph generator pulls in networkx and matplotlib, and building a scanner
+enumerates interfaces. Components defers all of it: each component is
+created on first use, exactly once, and only its own modules are
+imported then. The API module can therefore be imported in a fraction of
+a second, and a request that only needs metrics never builds a scanner.
+"""
+import importlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+Listener = Callable[[str, Dict], None]
+
+
+def _load(name: str):
+    """Sibling module name, whether this package is imported as backend or run from backend/"""
+    return importlib.import_module(f'{__package__}.{name}' if __package__ else name)
+
+
+class Components:
+    """Factory for the scanner, identifier, graph generator, job manager and monitor.
+
+    Listeners are attached to the job manager and the monitor when those
+    are built. With monitor_interval > 0 the monitor starts as soon as it
+    is built; warm_up() builds it ahead of the first request.
+    port_selection is the scanner's 'fixed' or 'adaptive' port selection.
+    """
+
+    def __init__(self, scan_processes: int = 1, monitor_interval: float = 60,
+                 monitor_deep_interval: float = 900, inventory_path: str = None,
+                 registry=None, job_workers: int = 2, port_selection: str = 'fixed'):
+        self.scan_processes = scan_processes
+        self.monitor_interval = monitor_interval
+        self.monitor_deep_interval = monitor_deep_interval
+        self.inventory_path = inventory_path
+        self.registry = registry
+        self.job_workers = job_workers
+        self.port_selection = port_selection
+        self._listeners: List[Listener] = []
+        self._built: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def _get(self, name: str, build: Callable[[], object]):
+        component = self._built.get(name)
+        if component is None and name not in self._built:
+            with self._lock:
+                if name not in self._built:
+                    self._built[name] = build()
+                component = self._built[name]
+        return component
+
+    def built(self) -> List[str]:
+        """Names of the components created so far"""
+        return sorted(self._built)
+
+    def scanner(self):
+        def build():
+            inventory_module = _load('inventory')
+            inventory = (inventory_module.DeviceInventory(self.inventory_path) if self.inventory_path
+                         else inventory_module.DeviceInventory())
+            # Let it auto-detect network range; delta scans reuse the persistent inventory
+            # Devices are typed before they are stored, so the inventory keeps their type
+            scanner = _load('network_scanner').NetworkScanner(mode='delta', inventory=inventory,
+                                                              port_selection=self.port_selection,
+                                                              identifier=self.identifier())
+            if scanner.port_selector is not None:
+                # Hosts the inventory has no type for yet are classified from what the sweep saw
+                scanner.port_selector.classify = self.identifier().identify_device
+            if self.registry is not None:
+                scanner.rate_limiter.register_metrics(self.registry)
+            return scanner
+        return self._get('scanner', build)
+
+    def sharded_scanner(self):
+        """ShardedScanner over the scanner's ranges, or None when they form a single segment"""
+        def build():
+            scanner = self.scanner()
+            sharding = _load('sharding')
+            # Several /24s are spread over worker processes; a single segment stays in-process
+            if self.scan_processes <= 1 or len(sharding.split_cidr(scanner.network_ranges)) <= 1:
+                return None
+            options = {'mode': 'delta', 'port_selection': self.port_selection,
+                       'inventory_path': scanner.inventory.path,
+                       'identifier_path': f'{type(self.identifier()).__module__}.DeviceIdentifier'}
+            return sharding.ShardedScanner(scanner.network_ranges, options=options,
+                                           processes=self.scan_processes,
+                                           scanner_path=f'{type(scanner).__module__}.NetworkScanner')
+        return self._get('sharded_scanner', build)
+
+    def identifier(self):
+        return self._get('identifier', lambda: _load('device_identifier').DeviceIdentifier())
+
+    def graph_generator(self):
+        return self._get('graph_generator', lambda: _load('graph_generator').NetworkGraphGenerator())
+
+    def scan_jobs(self):
+        def build():
+            jobs = _load('scan_jobs').ScanJobManager(max_workers=self.job_workers)
+            for listener in self._listeners:
+                jobs.add_listener(listener)
+            return jobs
+        return self._get('scan_jobs', build)
+
+    def monitor(self):
+        def build():
+            monitor = _load('monitor').NetworkMonitor(
+                self.scanner(), self.identifier(), liveness_interval=self.monitor_interval or 60,
+                deep_interval=self.monitor_deep_interval)
+            for listener in self._listeners:
+                monitor.add_listener(listener)
+            if self.monitor_interval > 0:
+                monitor.start()
+            return monitor
+        return self._get('monitor', build)
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Build the scanner, job manager and monitor now instead of on the first request"""
+        def build_all():
+            try:
+                self.monitor()
+                self.scan_jobs()
+                self.sharded_scanner()
+            except Exception as e:
+                print(f"Initialization error: {str(e)}")
+        if not background:
+            build_all()
+            return None
+        thread = threading.Thread(target=build_all, name='components-warm-up', daemon=True)
+        thread.start()
+        return thread
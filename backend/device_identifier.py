@@ -1,9 +1,53 @@
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
 import re
 import socket
 
+try:
+    from .oui_db import lookup_vendor
+except ImportError:
+    from oui_db import lookup_vendor
+
+
+def _compile_first_match(patterns: Iterable[str]) -> re.Pattern:
+    """Combine patterns into one regex that finds, at every position, the first pattern matching there.
+
+    Each pattern becomes a named group inside a single zero-width lookahead
+    alternation, so finditer visits every start position once. The smallest
+    group index seen over all positions is the first pattern that would have
+    matched when trying them one by one with re.search.
+    """
+    alternation = '|'.join(f'(?P<p{index}>{pattern})' for index, pattern in enumerate(patterns))
+    return re.compile(f'(?=(?:{alternation}))', re.DOTALL)
+
+
+def _first_group(regex: re.Pattern, text: str) -> Optional[int]:
+    """Index of the first pattern compiled into regex that matches text"""
+    best = None
+    for match in regex.finditer(text):
+        # The pattern's own group encloses any groups inside it, so it is the last one closed
+        index = int(match.lastgroup[1:])
+        if best is None or index < best:
+            best = index
+            if best == 0:
+                break
+    return best
+
+
+def discovered_device(ip: str, mac: str) -> Dict:
+    """Device record of a host known only from its ARP reply"""
+    return {'ip': ip, 'mac': mac, 'vendor': lookup_vendor(mac) or 'Unknown', 'hostname': '', 'ports': []}
+
+
+def set_type(device: Dict, identifier=None) -> Dict:
+    """Set device['type'] with identifier.identify_device when an identifier is given; returns device"""
+    if identifier is not None:
+        device['type'] = identifier.identify_device(device)
+    return device
+
+
 class DeviceIdentifier:
-    def __init__(self):
+    def __init__(self, cache_size: int = 65536):
         self.vendor_patterns = {
             r'Apple|iPhone|iPad|Mac|AirPort|iMac|MacBook': 'Apple Device',
             r'Android|Samsung|Huawei|Xiaomi|OPPO|OnePlus|Realme|Vivo|Galaxy': 'Android Device',
@@ -56,10 +100,7 @@ class DeviceIdentifier:
             ((548,), 'AFP Server')
         ]
 
-    def _check_hostname_patterns(self, hostname: str) -> str:
-        """Identify device type based on hostname patterns"""
-        hostname = hostname.lower()
-        patterns = {
+        self.hostname_patterns = {
             r'printer|print': 'Printer',
             r'camera|cam|ipcam': 'Security Camera',
             r'xbox': 'Gaming Console',
@@ -74,22 +115,98 @@ class DeviceIdentifier:
             r'chromebook': 'Computer',
             r'virtual|vm': 'Virtual Machine'
         }
-        
-        for pattern, device_type in patterns.items():
-            if re.search(pattern, hostname):
+
+        # Matched against '<service> <product>' of each service read from a banner,
+        # or advertised over mDNS, SSDP and DHCP when discovered passively
+        self.service_patterns = {
+            r'raspbian': 'Raspberry Pi',
+            r'cups|jetdirect|hp http server|xerox|epson|brother|lexmark|\bipps?\b|pdl-datastream': 'Printer',
+            r'rtsp|app-webs|dnvrs-webs|uc-httpd|hikvision|webcam': 'Security Camera',
+            r'microsoft|smb1|msft': 'Windows Device',
+            r'routeros|mikrotik|rompager|dropbear|micro_httpd|mini_httpd|luci|openwrt': 'Network Equipment',
+            r'synology|qnap|diskstation': 'Storage Device',
+            r'plex': 'Plex Server',
+            r'mosquitto|mqtt': 'MQTT Broker',
+            r'airtunes|airplay|raop': 'Apple Device',
+            r'googlecast': 'Chromecast',
+            r'vnc': 'Computer',
+            r'mysql|mariadb|postfix|exim|smtp|imap|pop3': 'Server',
+        }
+
+        self._hostname_cached = lru_cache(maxsize=cache_size)(self._match_hostname)
+        self._vendor_cached = lru_cache(maxsize=4096)(self._match_vendor)
+        self._ports_cached = lru_cache(maxsize=cache_size)(self._match_ports)
+        self._services_cached = lru_cache(maxsize=cache_size)(self._match_services)
+        self.compile_rules()
+
+    def compile_rules(self):
+        """Precompile the pattern tables; call again after modifying them"""
+        self._vendor_regex = _compile_first_match(p.lower() for p in self.vendor_patterns)
+        self._vendor_types = list(self.vendor_patterns.values())
+        self._hostname_regex = _compile_first_match(self.hostname_patterns)
+        self._hostname_types = list(self.hostname_patterns.values())
+        self._service_regex = _compile_first_match(self.service_patterns)
+        self._service_types = list(self.service_patterns.values())
+
+        # Signatures that mention each port, in table order
+        self._port_index = {}
+        for index, (signature_ports, _) in enumerate(self.port_signatures):
+            for port in set(signature_ports):
+                self._port_index.setdefault(port, []).append(index)
+
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Forget memoized hostname, vendor, service and port classifications"""
+        for cache in (self._hostname_cached, self._vendor_cached, self._ports_cached, self._services_cached):
+            cache.cache_clear()
+
+    def _match_hostname(self, hostname: str) -> str:
+        index = _first_group(self._hostname_regex, hostname)
+        return None if index is None else self._hostname_types[index]
+
+    def _match_vendor(self, vendor: str) -> str:
+        index = _first_group(self._vendor_regex, vendor)
+        return None if index is None else self._vendor_types[index]
+
+    def _match_services(self, services: Tuple[str, ...]) -> str:
+        # Services come sorted by port, so the type of the lowest port wins on a tie
+        for service in services:
+            index = _first_group(self._service_regex, service)
+            if index is not None:
+                return self._service_types[index]
+        return None
+
+    def _match_ports(self, ports: Tuple[int, ...]) -> str:
+        ports_set = set(ports)
+        candidates = set()
+        for port in ports_set:
+            candidates.update(self._port_index.get(port, ()))
+        for index in sorted(candidates):
+            signature_ports, device_type = self.port_signatures[index]
+            if all(port in ports_set for port in signature_ports):
                 return device_type
         return None
 
+    def _check_hostname_patterns(self, hostname: str) -> str:
+        """Identify device type based on hostname patterns"""
+        return self._hostname_cached(hostname.lower())
+
+    def _check_vendor_patterns(self, vendor: str) -> str:
+        """Identify device type based on vendor name patterns"""
+        return self._vendor_cached(vendor.lower())
+
+    def _check_services(self, services: Tuple[str, ...]) -> str:
+        """Identify device type from services matched in port banners"""
+        if not services:
+            return None
+        return self._services_cached(services)
+
     def _check_ports(self, ports: List[int]) -> str:
         """Identify device type based on open ports"""
         if not ports:
             return None
-            
-        ports_set = set(ports)
-        for signature_ports, device_type in self.port_signatures:
-            if all(port in ports_set for port in signature_ports):
-                return device_type
-        return None
+        return self._ports_cached(tuple(ports))
 
     def _analyze_mac_prefix(self, mac: str) -> str:
         """Analyze MAC address prefix for virtual machines and special devices"""
@@ -105,19 +222,33 @@ class DeviceIdentifier:
         vm_prefixes = ['00:05:69', '00:0c:29', '00:1c:14', '00:50:56', '00:1c:42']
         if any(mac.startswith(prefix) for prefix in vm_prefixes):
             return 'Virtual Machine'
+
+        # Fall back to the registered vendor of the MAC prefix
+        oui_vendor = lookup_vendor(mac)
+        if oui_vendor:
+            return self._check_vendor_patterns(oui_vendor)
             
         return None
 
-    def identify_device(self, device_info: Dict) -> str:
-        """Identify device type using multiple methods"""
+    def _cache_key(self, device_info: Dict) -> Tuple:
+        """Everything identification depends on, normalised for memoization"""
         ip = device_info.get('ip', '')
-        mac = device_info.get('mac', '').lower()
-        vendor = device_info.get('vendor', '').lower()
-        ports = device_info.get('ports', [])
-        hostname = device_info.get('hostname', '').lower()
-        
+        return (
+            ip.endswith('.1') or ip.endswith('.254'),
+            device_info.get('vendor', '').lower(),
+            device_info.get('hostname', '').lower(),
+            tuple(device_info.get('ports', [])),
+            # Long enough for the 36-bit MA-S prefixes in the OUI database
+            device_info.get('mac', '').lower()[:13],
+            tuple(f"{s.get('service', '')} {s.get('product', '')}".lower()
+                  for s in device_info.get('services', ())),
+        )
+
+    def _classify(self, is_gateway_ip: bool, vendor: str, hostname: str,
+                  ports: Tuple[int, ...], mac_prefix: str, services: Tuple[str, ...] = ()) -> str:
+        """Identify device type from a normalised cache key"""
         # Special handling for router detection
-        if (ip.endswith('.1') or ip.endswith('.254')) and any(port in ports for port in [53, 80, 443]):
+        if is_gateway_ip and any(port in ports for port in [53, 80, 443]):
             return 'Router'
         
         # Check hostname first
@@ -126,17 +257,22 @@ class DeviceIdentifier:
             return hostname_type
         
         # Vendor-based identification
-        for pattern, device_type in self.vendor_patterns.items():
-            if re.search(pattern.lower(), vendor):
-                return device_type
+        vendor_type = self._check_vendor_patterns(vendor)
+        if vendor_type:
+            return vendor_type
         
+        # Service banners say more than the port numbers they were read from
+        service_type = self._check_services(services)
+        if service_type:
+            return service_type
+
         # Port-based identification
         port_type = self._check_ports(ports)
         if port_type:
             return port_type
             
         # MAC address pattern matching
-        mac_type = self._analyze_mac_prefix(mac)
+        mac_type = self._analyze_mac_prefix(mac_prefix)
         if mac_type:
             return mac_type
             
@@ -153,4 +289,20 @@ class DeviceIdentifier:
         if len(ports) > 5:
             return 'Server'
             
-        return 'Unknown Device'
\ No newline at end of file
+        return 'Unknown Device'
+
+    def identify_device(self, device_info: Dict) -> str:
+        """Identify device type using multiple methods"""
+        return self._classify(*self._cache_key(device_info))
+
+    def identify_many(self, devices: Iterable[Dict]) -> List[str]:
+        """Identify a batch of devices, classifying each distinct fingerprint once"""
+        seen = {}
+        types = []
+        for device_info in devices:
+            key = self._cache_key(device_info)
+            device_type = seen.get(key)
+            if device_type is None:
+                device_type = seen[key] = self._classify(*key)
+            types.append(device_type)
+        return types
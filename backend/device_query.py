@@ -0,0 +1,187 @@
+"""
+Paged, filtered and projected reads of a DeviceTable for the device API.
+
+Filters on subnet, type, vendor and open port run as DeviceTable masks,
+so only the rows of the requested page ever become dicts. Pages follow
+IPv4 order and the cursor is the sort key of the last row returned
+(keyset pagination): unlike an offset it stays valid when devices are
+added or removed between requests.
+
+Bodies are JSON, or MessagePack when msgpack is installed, compressed
+with brotli when it is installed and accepted, else gzip.
+"""
+import base64
+import binascii
+import gzip
+import hashlib
+import ipaddress
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from .device_table import DeviceTable
+except ImportError:
+    from device_table import DeviceTable
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+MEDIA_TYPES = {'json': 'application/json', 'msgpack': 'application/msgpack'}
+
+
+def formats() -> List[str]:
+    """Body encodings available in this environment"""
+    return ['json', 'msgpack'] if msgpack is not None else ['json']
+
+
+def content_codings() -> List[str]:
+    """Compressions available in this environment, preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def encode_cursor(key: int) -> str:
+    return base64.urlsafe_b64encode(int(key).to_bytes(8, 'big')).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if len(raw) != 8:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int.from_bytes(raw, 'big')
+
+
+def _values(args, name: str) -> List[str]:
+    """Values of a repeatable, comma-separated query parameter"""
+    raw = args.getlist(name) if hasattr(args, 'getlist') else [args[name]] if name in args else []
+    return [value.strip() for item in raw for value in item.split(',') if value.strip()]
+
+
+class DeviceQuery:
+    """Filters, projection and page position of one device listing.
+
+    Values within a filter are alternatives; different filters must all
+    match. fields=None returns every field.
+    """
+
+    def __init__(self, subnets: Sequence[str] = (), types: Sequence[str] = (), vendors: Sequence[str] = (),
+                 ports: Sequence[int] = (), fields: Sequence[str] = None, limit: int = DEFAULT_LIMIT,
+                 cursor: Optional[str] = None):
+        for subnet in subnets:
+            ipaddress.IPv4Network(subnet, strict=False)
+        for port in ports:
+            if not 0 <= port <= 65535:
+                raise ValueError(f"Invalid port: {port}")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        self.subnets = tuple(subnets)
+        self.types = tuple(types)
+        self.vendors = tuple(vendors)
+        self.ports = tuple(ports)
+        self.fields = tuple(fields) if fields else None
+        self.limit = min(limit, MAX_LIMIT)
+        self.cursor = cursor
+        self._after = decode_cursor(cursor) if cursor else None
+
+    @classmethod
+    def from_args(cls, args) -> 'DeviceQuery':
+        """Query from request arguments; raises ValueError on a malformed one"""
+        try:
+            ports = [int(port) for port in _values(args, 'port')]
+            limit = int(args.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise ValueError("port and limit must be integers")
+        return cls(subnets=_values(args, 'subnet'), types=_values(args, 'type'),
+                   vendors=_values(args, 'vendor'), ports=ports, fields=_values(args, 'fields') or None,
+                   limit=limit, cursor=args.get('cursor') or None)
+
+    def key(self) -> Dict:
+        """Everything that affects the result, for cache validators"""
+        return {'subnet': sorted(self.subnets), 'type': sorted(self.types), 'vendor': sorted(self.vendors),
+                'port': sorted(self.ports), 'fields': self.fields, 'limit': self.limit, 'cursor': self.cursor}
+
+    def mask(self, table: DeviceTable) -> np.ndarray:
+        # Rows appended while filtering are left out: every mask is cut to the first size
+        size = len(table)
+        mask = np.ones(size, dtype=bool)
+        if self.subnets:
+            in_any = np.zeros(size, dtype=bool)
+            for subnet in self.subnets:
+                in_any |= table.in_subnet(subnet)[:size]
+            mask &= in_any
+        if self.types:
+            mask &= table.of_type(*self.types)[:size]
+        if self.vendors:
+            mask &= table.from_vendor(*self.vendors)[:size]
+        if self.ports:
+            mask &= table.with_port(*self.ports)[:size]
+        return mask
+
+    def page(self, table: DeviceTable) -> Dict:
+        """{'devices', 'total', 'next_cursor'}: one page of matches in IPv4 order.
+
+        total counts every match, not only those after the cursor;
+        next_cursor is None on the last page.
+        """
+        mask = self.mask(table)
+        keys = table.sort_keys()[:len(mask)]
+        total = int(mask.sum())
+        if self._after is not None:
+            mask &= keys > np.uint64(self._after)
+        rows = np.flatnonzero(mask)
+        more = len(rows) > self.limit
+        if more:
+            # Only the page itself needs a full sort
+            rows = rows[np.argpartition(keys[rows], self.limit - 1)[:self.limit]]
+        rows = rows[np.argsort(keys[rows], kind='stable')]
+        return {
+            'devices': table.rows(rows, self.fields),
+            'total': total,
+            'next_cursor': encode_cursor(keys[rows[-1]]) if more else None,
+        }
+
+
+def encode(payload: Dict, fmt: str = 'json') -> bytes:
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise ValueError("MessagePack encoding needs the msgpack package")
+        return msgpack.packb(payload, use_bin_type=True)
+    if fmt != 'json':
+        raise ValueError(f"Unsupported format: {fmt}")
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def compress(body: bytes, coding: Optional[str]) -> bytes:
+    """body in the given content coding; None or 'identity' leaves it as is"""
+    if coding == 'br':
+        if brotli is None:
+            raise ValueError("brotli coding needs the brotli package")
+        return brotli.compress(body, quality=5)
+    if coding == 'gzip':
+        # mtime=0 keeps the output, and so the ETag, a function of the body alone
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    if coding in (None, 'identity'):
+        return body
+    raise ValueError(f"Unsupported content coding: {coding}")
+
+
+def etag(version: str, query: DeviceQuery, fmt: str, coding: Optional[str]) -> str:
+    """Validator for one representation of a page of the data at version"""
+    payload = json.dumps({'version': version, 'query': query.key(), 'format': fmt, 'coding': coding or 'identity'},
+                         separators=(',', ':'), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
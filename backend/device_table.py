@@ -0,0 +1,464 @@
+"""
+Columnar device store.
+
+DeviceTable keeps devices as NumPy columns instead of one dict per host:
+IPv4 addresses as uint32, MACs as uint64, vendor/type/hostname/status as
+codes into shared string interners, timestamps as float64 and open ports
+as bitmaps over an interned port vocabulary. Filters by subnet, type or
+port are vectorized, and rows become dicts only when they are read.
+
+Round trips are exact for the usual device fields except that ports come
+back sorted and deduplicated. Values that do not fit a column (an IPv6
+address, a MAC in an unusual notation, unknown keys) are kept verbatim in
+a sparse per-row dict.
+"""
+import ipaddress
+import json
+import socket
+import struct
+import threading
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+STRING_FIELDS = ('vendor', 'type', 'hostname', 'status')
+TIME_FIELDS = ('first_seen', 'last_seen', 'fingerprinted_at')
+
+# Bits of the per-row presence mask
+_IP, _MAC, _MAC_UPPER, _PORTS = 1, 2, 4, 8
+_STRING_BITS = {field: 16 << i for i, field in enumerate(STRING_FIELDS)}
+_TIME_BITS = {field: 256 << i for i, field in enumerate(TIME_FIELDS)}
+_STRING_INDEX = {field: i for i, field in enumerate(STRING_FIELDS)}
+_TIME_INDEX = {field: i for i, field in enumerate(TIME_FIELDS)}
+_IP_STRUCT = struct.Struct('!I')
+# Port vocabularies are shared between tables, so they share one lock too
+_PORT_LOCK = threading.Lock()
+
+
+class _Columns(NamedTuple):
+    """One consistent set of column arrays; rows below the table size never change"""
+    ip: np.ndarray
+    mac: np.ndarray
+    present: np.ndarray
+    codes: Dict[str, np.ndarray]
+    times: Dict[str, np.ndarray]
+    ports: np.ndarray
+
+
+class StringInterner:
+    """Append-only string <-> int code table shared between tables"""
+
+    def __init__(self):
+        self._codes = {}
+        self.strings: List[str] = []
+        self._lock = threading.Lock()
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.strings)
+                    self.strings.append(value)
+                    self._codes[value] = code
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Existing code for value, without interning it"""
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+def ip_to_int(ip: str) -> Optional[int]:
+    try:
+        return _IP_STRUCT.unpack(socket.inet_aton(ip))[0] if ip.count('.') == 3 else None
+    except (OSError, AttributeError):
+        return None
+
+
+def int_to_ip(value: int) -> str:
+    return socket.inet_ntoa(_IP_STRUCT.pack(int(value)))
+
+
+def _parse_mac(mac) -> Optional[int]:
+    """48-bit value of a colon-separated MAC in all-lower or all-upper case, else None"""
+    if not isinstance(mac, str) or len(mac) != 17 or mac[2::3] != ':::::':
+        return None
+    if mac != mac.lower() and mac != mac.upper():
+        return None
+    try:
+        return int(mac.replace(':', ''), 16)
+    except ValueError:
+        return None
+
+
+def _mac_text(value: int, upper: bool) -> str:
+    text = value.to_bytes(6, 'big').hex(':')
+    return text.upper() if upper else text
+
+
+class DeviceTable:
+    """Append-friendly columnar table of devices with vectorized filters.
+
+    Appends may run while other threads read: growing builds new columns
+    before swapping them in, and readers work on a snapshot of the columns
+    and the size taken under the lock.
+    """
+
+    def __init__(self, devices: Iterable[Dict] = (), capacity: int = 64,
+                 interners: Dict[str, StringInterner] = None, port_vocabulary: Dict[int, int] = None):
+        self._interners = interners if interners is not None else {f: StringInterner() for f in STRING_FIELDS}
+        # port -> bit index; shared with tables selected from this one
+        self._port_bits = port_vocabulary if port_vocabulary is not None else {}
+        self._lock = threading.Lock()
+        self._size = 0
+        self._install(self._allocate(max(1, capacity), 1))
+        self._extras: Dict[int, Dict] = {}
+        self.extend(devices)
+
+    @staticmethod
+    def _allocate(capacity: int, port_words: int) -> _Columns:
+        return _Columns(
+            np.zeros(capacity, dtype=np.uint32),
+            np.zeros(capacity, dtype=np.uint64),
+            np.zeros(capacity, dtype=np.uint16),
+            {field: np.zeros(capacity, dtype=np.int32) for field in STRING_FIELDS},
+            {field: np.zeros(capacity, dtype=np.float64) for field in TIME_FIELDS},
+            np.zeros((capacity, port_words), dtype=np.uint64))
+
+    def _install(self, columns: _Columns):
+        self.ip, self.mac, self.present, self.codes, self.times, self.ports = columns
+
+    def _snapshot(self) -> Tuple[int, _Columns]:
+        """Size and columns as of now, safe to read while other threads append"""
+        with self._lock:
+            return self._size, _Columns(self.ip, self.mac, self.present, self.codes, self.times, self.ports)
+
+    def _columns(self) -> List[np.ndarray]:
+        return [self.ip, self.mac, self.present, self.ports] + list(self.codes.values()) + list(self.times.values())
+
+    def _grow(self, capacity: int, port_words: int):
+        """Copy the rows written so far into larger columns, then swap them in; the caller holds the lock"""
+        size = self._size
+        columns = self._allocate(capacity, port_words)
+        columns.ip[:size] = self.ip[:size]
+        columns.mac[:size] = self.mac[:size]
+        columns.present[:size] = self.present[:size]
+        columns.ports[:size, :self.ports.shape[1]] = self.ports[:size]
+        for field in STRING_FIELDS:
+            columns.codes[field][:size] = self.codes[field][:size]
+        for field in TIME_FIELDS:
+            columns.times[field][:size] = self.times[field][:size]
+        self._install(columns)
+
+    def _port_bit(self, port: int) -> int:
+        bit = self._port_bits.get(port)
+        if bit is None:
+            with _PORT_LOCK:
+                bit = self._port_bits.setdefault(port, len(self._port_bits))
+        return bit
+
+    # -- writing ---------------------------------------------------------
+
+    def append(self, device: Dict):
+        self.extend((device,))
+
+    def extend(self, devices: Iterable[Dict]):
+        """Encode devices in Python, then write each column with one slice assignment"""
+        encoded = [self._encode(device) for device in devices]
+        if not encoded:
+            return
+        with self._lock:
+            start = self._size
+            end = start + len(encoded)
+            words = max(self.ports.shape[1], max(row[5].bit_length() for row in encoded) // 64 + 1)
+            if end > len(self.ip) or words > self.ports.shape[1]:
+                capacity = len(self.ip)
+                while capacity < end:
+                    capacity *= 2
+                self._grow(capacity, words)
+
+            columns = list(zip(*encoded))
+            self.ip[start:end] = columns[0]
+            self.mac[start:end] = columns[1]
+            self.present[start:end] = columns[2]
+            for i, field in enumerate(STRING_FIELDS):
+                self.codes[field][start:end] = [codes[i] for codes in columns[3]]
+            for i, field in enumerate(TIME_FIELDS):
+                self.times[field][start:end] = [times[i] for times in columns[4]]
+            word_mask = (1 << 64) - 1
+            self.ports[start:end] = np.array(
+                [[(bitmap >> (64 * w)) & word_mask for w in range(words)] for bitmap in columns[5]],
+                dtype=np.uint64).reshape(-1, words)
+            for offset, extras in enumerate(columns[6]):
+                if extras:
+                    self._extras[start + offset] = extras
+            self._size = end
+
+    def _encode(self, device: Dict):
+        """(ip, mac, presence bits, string codes, times, port bitmap, extras) for one device"""
+        present = 0
+        extras = None
+        ip_value = mac_value = bitmap = 0
+        codes = [0] * len(STRING_FIELDS)
+        times = [0.0] * len(TIME_FIELDS)
+
+        for key, value in device.items():
+            if key == 'ip':
+                number = ip_to_int(value) if isinstance(value, str) else None
+                if number is not None and int_to_ip(number) == value:
+                    ip_value = number
+                    present |= _IP
+                    continue
+            elif key == 'mac':
+                number = _parse_mac(value)
+                if number is not None:
+                    mac_value = number
+                    present |= _MAC | (_MAC_UPPER if value != value.lower() else 0)
+                    continue
+            elif key == 'ports':
+                if value is not None:
+                    for port in value:
+                        bitmap |= 1 << self._port_bit(int(port))
+                    present |= _PORTS
+                    continue
+            elif key in _STRING_BITS:
+                if isinstance(value, str):
+                    codes[_STRING_INDEX[key]] = self._interners[key].code(value)
+                    present |= _STRING_BITS[key]
+                    continue
+            elif key in _TIME_BITS:
+                if isinstance(value, float):
+                    times[_TIME_INDEX[key]] = value
+                    present |= _TIME_BITS[key]
+                    continue
+            # Anything a column cannot hold exactly is kept as is
+            if extras is None:
+                extras = {}
+            extras[key] = value
+        return ip_value, mac_value, present, codes, times, bitmap, extras
+
+    # -- reading ---------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _ports_of(self, ports_row: np.ndarray, vocabulary: List[int]) -> List[int]:
+        found = []
+        for word_index, word in enumerate(ports_row.tolist()):
+            while word:
+                low = word & -word
+                found.append(vocabulary[(word_index << 6) + low.bit_length() - 1])
+                word ^= low
+        return sorted(found)
+
+    def _vocabulary(self) -> List[int]:
+        vocabulary = [0] * len(self._port_bits)
+        for port, bit in list(self._port_bits.items()):
+            vocabulary[bit] = port
+        return vocabulary
+
+    def _row(self, row: int, vocabulary: List[int], columns: _Columns) -> Dict:
+        present = int(columns.present[row])
+        device = {}
+        if present & _IP:
+            device['ip'] = int_to_ip(columns.ip[row])
+        if present & _MAC:
+            device['mac'] = _mac_text(int(columns.mac[row]), bool(present & _MAC_UPPER))
+        for field in STRING_FIELDS:
+            if present & _STRING_BITS[field]:
+                device[field] = self._interners[field].strings[columns.codes[field][row]]
+        if present & _PORTS:
+            device['ports'] = self._ports_of(columns.ports[row], vocabulary)
+        for field in TIME_FIELDS:
+            if present & _TIME_BITS[field]:
+                device[field] = float(columns.times[field][row])
+        # Column fields in the order the scanner builds them, then anything else
+        ordered = {key: device[key] for key in _FIELD_ORDER if key in device}
+        extras = self._extras.get(row)
+        if extras:
+            ordered.update(extras)
+        return ordered
+
+    def row(self, index: int) -> Dict:
+        """Row index as a fresh dict"""
+        size, columns = self._snapshot()
+        if not -size <= index < size:
+            raise IndexError(index)
+        return self._row(index % size, self._vocabulary(), columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            size, columns = self._snapshot()
+            vocabulary = self._vocabulary()
+            return [self._row(i, vocabulary, columns) for i in range(*index.indices(size))]
+        return self.row(index)
+
+    def __iter__(self) -> Iterator[Dict]:
+        size, columns = self._snapshot()
+        vocabulary = self._vocabulary()
+        for row in range(size):
+            yield self._row(row, vocabulary, columns)
+
+    def rows(self, indices: Iterable[int], fields: Sequence[str] = None) -> List[Dict]:
+        """Rows at indices as dicts, keeping only fields when given.
+
+        Same dicts as row(), but each column is read once for all rows and
+        columns outside fields are never decoded.
+        """
+        _, snapshot = self._snapshot()
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+        present = snapshot.present[indices].tolist()
+        columns = []
+        for field in _FIELD_ORDER:
+            if fields is not None and field not in fields:
+                continue
+            if field == 'ip':
+                bit, values = _IP, [int_to_ip(value) for value in snapshot.ip[indices].tolist()]
+            elif field == 'mac':
+                bit, values = _MAC, [_mac_text(value, bool(bits & _MAC_UPPER))
+                                     for value, bits in zip(snapshot.mac[indices].tolist(), present)]
+            elif field == 'ports':
+                vocabulary = self._vocabulary()
+                bit, values = _PORTS, [self._ports_of(row, vocabulary) for row in snapshot.ports[indices]]
+            elif field in _STRING_BITS:
+                strings = self._interners[field].strings
+                bit = _STRING_BITS[field]
+                values = [strings[code] if bits & bit else None
+                          for code, bits in zip(snapshot.codes[field][indices].tolist(), present)]
+            else:
+                bit, values = _TIME_BITS[field], snapshot.times[field][indices].tolist()
+            columns.append((field, bit, values))
+
+        rows = []
+        for n, row in enumerate(indices.tolist()):
+            bits = present[n]
+            device = {field: values[n] for field, bit, values in columns if bits & bit}
+            extras = self._extras.get(row)
+            if extras:
+                device.update(extras if fields is None else {k: v for k, v in extras.items() if k in fields})
+            rows.append(device)
+        return rows
+
+    def to_dicts(self) -> List[Dict]:
+        return list(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dicts())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, DeviceTable):
+            return self.to_dicts() == other.to_dicts()
+        if isinstance(other, Sequence):
+            return self.to_dicts() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"DeviceTable({len(self)} devices)"
+
+    # -- filters ---------------------------------------------------------
+
+    # Each filter reads one snapshot, so its mask covers the rows present when it
+    # was taken. Rows are only ever appended: masks taken later may be longer, and
+    # combining them means cutting each to the first one's length.
+
+    def _view(self) -> _Columns:
+        """Snapshot columns cut to the table size"""
+        size, columns = self._snapshot()
+        return _Columns(columns.ip[:size], columns.mac[:size], columns.present[:size],
+                        {field: codes[:size] for field, codes in columns.codes.items()},
+                        {field: times[:size] for field, times in columns.times.items()},
+                        columns.ports[:size])
+
+    @staticmethod
+    def _has(view: _Columns, bit: int) -> np.ndarray:
+        return (view.present & bit) != 0
+
+    def in_subnet(self, network_range: str) -> np.ndarray:
+        """Boolean mask of devices inside an IPv4 network"""
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        mask = np.uint32(int(network.netmask))
+        view = self._view()
+        return self._has(view, _IP) & ((view.ip & mask) == np.uint32(int(network.network_address)))
+
+    def of_type(self, *types: str) -> np.ndarray:
+        return self._string_mask('type', types)
+
+    def from_vendor(self, *vendors: str) -> np.ndarray:
+        return self._string_mask('vendor', vendors)
+
+    def _string_mask(self, field: str, values: Sequence[str]) -> np.ndarray:
+        view = self._view()
+        codes = [c for c in (self._interners[field].lookup(v) for v in values) if c is not None]
+        if not codes:
+            return np.zeros(len(view.present), dtype=bool)
+        return self._has(view, _STRING_BITS[field]) & np.isin(view.codes[field], codes)
+
+    def with_port(self, *ports: int) -> np.ndarray:
+        """Devices with any of the given ports open"""
+        view = self._view()
+        mask = np.zeros(len(view.present), dtype=bool)
+        for port in ports:
+            bit = self._port_bits.get(port)
+            if bit is None or bit >> 6 >= view.ports.shape[1]:
+                continue
+            mask |= (view.ports[:, bit >> 6] & np.uint64(1 << (bit & 63))) != 0
+        return mask
+
+    def sort_keys(self) -> np.ndarray:
+        """Unique uint64 key per row ordering devices by IPv4 address, then insertion.
+
+        Rows without an IPv4 address sort after every address.
+        """
+        view = self._view()
+        rows = np.arange(len(view.ip), dtype=np.uint64)
+        address = np.where(self._has(view, _IP), view.ip.astype(np.uint64), np.uint64(1 << 32))
+        return (address << np.uint64(31)) | rows
+
+    def gateways(self) -> np.ndarray:
+        """Devices whose address ends in .1"""
+        view = self._view()
+        return self._has(view, _IP) & ((view.ip & np.uint32(0xFF)) == 1)
+
+    def select(self, mask: np.ndarray) -> 'DeviceTable':
+        """New table with the rows where mask is true, sharing interners and port vocabulary"""
+        rows = np.flatnonzero(mask)
+        _, columns = self._snapshot()
+        table = DeviceTable(capacity=len(rows), interners=self._interners, port_vocabulary=self._port_bits)
+        table._grow(max(1, len(rows)), columns.ports.shape[1])
+        table.ip[:len(rows)] = columns.ip[rows]
+        table.mac[:len(rows)] = columns.mac[rows]
+        table.present[:len(rows)] = columns.present[rows]
+        table.ports[:len(rows)] = columns.ports[rows]
+        for field in STRING_FIELDS:
+            table.codes[field][:len(rows)] = columns.codes[field][rows]
+        for field in TIME_FIELDS:
+            table.times[field][:len(rows)] = columns.times[field][rows]
+        table._extras = {i: self._extras[row] for i, row in enumerate(rows.tolist()) if row in self._extras}
+        table._size = len(rows)
+        return table
+
+    def where(self, subnet: str = None, type: str = None, port: int = None) -> 'DeviceTable':
+        """Rows matching every given filter"""
+        size = len(self)
+        mask = np.ones(size, dtype=bool)
+        if subnet is not None:
+            mask &= self.in_subnet(subnet)[:size]
+        if type is not None:
+            mask &= self.of_type(type)[:size]
+        if port is not None:
+            mask &= self.with_port(port)[:size]
+        return self.select(mask)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns, interned strings and extras"""
+        columns = sum(column[:self._size].nbytes for column in self._columns())
+        strings = sum(len(s) + 49 for interner in self._interners.values() for s in interner.strings)
+        return columns + strings + len(self._extras) * 256
+
+
+_FIELD_ORDER = ('ip', 'mac', 'vendor', 'status', 'ports', 'hostname', 'type') + TIME_FIELDS
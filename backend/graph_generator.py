@@ -1,128 +1,365 @@
 import networkx as nx
-import matplotlib.pyplot as plt
-from typing import List, Dict
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import hashlib
 import io
+import json
 import threading
 
+FORMATS = ('png', 'svg', 'json')
+LAYOUTS = ('auto', 'spring', 'radial', 'force')
+FULL_SIZE = {'figsize': (15, 10), 'dpi': 300}
+THUMBNAIL_SIZE = {'figsize': (6, 4), 'dpi': 50}
+
+# Beyond these sizes 'auto' switches to cheaper layouts, and labels are dropped
+SPRING_LAYOUT_LIMIT = 200
+FORCE_LAYOUT_LIMIT = 5000
+LABEL_LIMIT = 150
+# nx.spring_layout hands graphs this large to a scipy solver, and scipy is not a dependency
+SPRING_LAYOUT_MAX = 500
+LAYOUT_SEED = 42
+
+# SVG element ids are salted with a random UUID by default; a fixed salt
+# makes identical graphs render to identical bytes
+if matplotlib.rcParams['svg.hashsalt'] is None:
+    matplotlib.rcParams['svg.hashsalt'] = 'network-mapper'
+
+DEVICE_COLORS = {
+    'Router': '#FF6B6B',
+    'Computer': '#4ECDC4',
+    'Network Equipment': '#45B7D1',
+    'Apple Device': '#96CEB4',
+    'Android Device': '#A8E6CF',
+    'IoT Device': '#FFD93D',
+    'Unknown Device': '#6C757D',
+    'Printer': '#FF9F1C',
+    'Media Device': '#2196F3',
+    'Security Camera': '#9C27B0',
+    'Windows Device': '#00BCD4',
+    'Smart Home Device': '#FF9800',
+    'Virtual Machine': '#9C27B0',
+    'Server': '#F44336',
+    'Gaming Console': '#E91E63'
+}
+
+
+def radial_layout(n: int, ring_capacity: int = 8) -> np.ndarray:
+    """Deterministic positions: node 0 at the centre, the rest on concentric rings.
+
+    Ring r holds ring_capacity * r nodes, so spacing along every ring stays
+    roughly constant. Computed in closed form for all nodes at once.
+    """
+    pos = np.zeros((n, 2))
+    if n <= 1:
+        return pos
+    i = np.arange(n - 1, dtype=float)
+    # Smallest ring r with ring_capacity * r * (r + 1) / 2 > i
+    ring = np.floor((-1 + np.sqrt(1 + 8 * i / ring_capacity)) / 2).astype(int) + 1
+    first_on_ring = ring_capacity * (ring - 1) * ring // 2
+    slot = i - first_on_ring
+    capacity = ring_capacity * ring
+    # The outermost ring may be partially filled; spread its nodes evenly
+    last = ring[-1]
+    capacity = np.where(ring == last, (n - 1) - ring_capacity * (last - 1) * last // 2, capacity)
+    angle = 2 * np.pi * slot / capacity
+    radius = ring / last
+    pos[1:, 0] = radius * np.cos(angle)
+    pos[1:, 1] = radius * np.sin(angle)
+    return pos
+
+
+def force_layout(n: int, edges: np.ndarray, iterations: int = 50, grid: int = 12,
+                 seed: int = LAYOUT_SEED) -> np.ndarray:
+    """Fruchterman-Reingold with Barnes-Hut style far-field approximation.
+
+    Nodes are binned into a grid x grid mesh every iteration and repelled by
+    each occupied cell's centre of mass rather than by every other node,
+    which makes an iteration O(n * cells) instead of O(n^2). edges is an
+    (m, 2) array of node indices.
+    """
+    if n <= 1:
+        return np.zeros((n, 2))
+    rng = np.random.default_rng(seed)
+    pos = radial_layout(n) + rng.normal(scale=0.01, size=(n, 2))
+    k = 1.0 / np.sqrt(n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    cells = grid * grid
+
+    for _ in range(iterations):
+        low = pos.min(axis=0)
+        span = np.maximum(pos.max(axis=0) - low, 1e-9)
+        cell_xy = np.minimum(((pos - low) / span * grid).astype(int), grid - 1)
+        cell = cell_xy[:, 0] * grid + cell_xy[:, 1]
+
+        mass = np.bincount(cell, minlength=cells).astype(float)
+        occupied = np.nonzero(mass)[0]
+        com = np.stack([np.bincount(cell, weights=pos[:, d], minlength=cells) for d in (0, 1)], axis=1)
+        com[occupied] /= mass[occupied, None]
+
+        # Far field: every node against every occupied cell, including its own
+        delta = pos[:, None, :] - com[None, occupied, :]
+        dist2 = np.maximum((delta ** 2).sum(axis=2), 1e-6)
+        disp = ((k * k * mass[occupied] / dist2)[:, :, None] * delta).sum(axis=1)
+
+        # Replace the own-cell term by the centre of mass of the other nodes in it
+        own = np.searchsorted(occupied, cell)
+        own_mass = mass[cell]
+        disp -= (k * k * own_mass / dist2[np.arange(n), own])[:, None] * delta[np.arange(n), own]
+        others = own_mass > 1
+        if others.any():
+            com_others = (com[cell[others]] * own_mass[others, None] - pos[others]) / (own_mass[others, None] - 1)
+            near = pos[others] - com_others
+            near_dist2 = np.maximum((near ** 2).sum(axis=1), 1e-6)
+            disp[others] += (k * k * (own_mass[others] - 1) / near_dist2)[:, None] * near
+
+        # Attraction along edges
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+            pull = (dist / k)[:, None] * delta
+            np.add.at(disp, edges[:, 0], -pull)
+            np.add.at(disp, edges[:, 1], pull)
+
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+
+    return pos - pos.mean(axis=0)
+
+
+def build_graph(devices: List[Dict]) -> nx.Graph:
+    """New graph with a router node and every device connected to it"""
+    graph = nx.Graph()
+    if not devices:
+        return graph
+
+    # Router is the first device typed as one or ending in .1, else the first device
+    router = next((d for d in devices if d['type'] == 'Router' or d['ip'].endswith('.1')), devices[0])
+    graph.add_node(router['ip'],
+                   type='Router',
+                   label=f"Router\n{router['ip']}\n{router.get('vendor', 'Unknown')}")
+
+    for device in devices:
+        if device is router or device['type'] == 'Router' or device['ip'].endswith('.1'):
+            continue
+        label = f"{device['type']}\n{device['ip']}"
+        if device.get('vendor') and device['vendor'] != 'Unknown':
+            label += f"\n{device['vendor']}"
+        if device.get('hostname'):
+            label += f"\n{device['hostname']}"
+        graph.add_node(device['ip'], type=device['type'], label=label)
+        graph.add_edge(router['ip'], device['ip'])
+    return graph
+
+
+def choose_layout(node_count: int) -> str:
+    """Layout used for 'auto': spring for small graphs, cheaper ones as they grow"""
+    if node_count <= SPRING_LAYOUT_LIMIT:
+        return 'spring'
+    if node_count <= FORCE_LAYOUT_LIMIT:
+        return 'force'
+    return 'radial'
+
+
+def compute_layout(graph: nx.Graph, layout: str = 'auto') -> Dict[str, np.ndarray]:
+    """Node positions for graph; nodes are indexed in insertion order, router first"""
+    if layout == 'auto':
+        layout = choose_layout(len(graph))
+    if layout == 'spring':
+        if len(graph) >= SPRING_LAYOUT_MAX:
+            raise ValueError(f"The spring layout supports graphs of fewer than {SPRING_LAYOUT_MAX} nodes")
+        return nx.spring_layout(graph, k=1, iterations=50, seed=LAYOUT_SEED)
+
+    nodes = list(graph.nodes)
+    if layout == 'radial':
+        # Group rings by device type so similar devices sit together
+        order = sorted(range(1, len(nodes)), key=lambda i: graph.nodes[nodes[i]]['type'])
+        nodes = nodes[:1] + [nodes[i] for i in order]
+        coords = radial_layout(len(nodes))
+    elif layout == 'force':
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(index[u], index[v]) for u, v in graph.edges], dtype=int).reshape(-1, 2)
+        coords = force_layout(len(nodes), edges)
+    else:
+        raise ValueError(f"Unsupported graph layout: {layout}")
+    return dict(zip(nodes, coords))
+
+
+def draw_graph(graph: nx.Graph, pos: Dict[str, np.ndarray], fmt: str, figsize: Tuple[float, float],
+               dpi: int, colors: Dict[str, str] = DEVICE_COLORS) -> bytes:
+    """Draw graph on its own Figure and Agg canvas.
+
+    Nothing goes through pyplot, so concurrent calls share no figure state.
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.tick_params(axis='both', which='both', bottom=False, left=False,
+                   labelbottom=False, labelleft=False)
+
+    # Shrink nodes and edges as the graph grows so large networks stay legible
+    node_count = max(len(graph), 1)
+    scale = min(1.0, 30 / node_count)
+    by_type = {}
+    for node, node_type in graph.nodes(data='type'):
+        by_type.setdefault(node_type, []).append(node)
+
+    # Edges under nodes
+    if graph.number_of_edges():
+        segments = [(pos[u], pos[v]) for u, v in graph.edges]
+        ax.add_collection(LineCollection(segments, colors='#2f3640', linewidths=max(2 * scale, 0.2),
+                                         alpha=0.5, zorder=1))
+
+    # Nodes for each device type
+    for device_type, color in colors.items():
+        node_list = by_type.get(device_type)
+        if node_list:
+            xy = np.array([pos[node] for node in node_list])
+            ax.scatter(xy[:, 0], xy[:, 1], s=max(3000 * scale, 10), c=color, alpha=0.7,
+                       edgecolors='face', zorder=2)
+
+    # Labels only while they can still be read
+    if node_count <= LABEL_LIMIT:
+        for node, label in graph.nodes(data='label'):
+            x, y = pos[node]
+            ax.text(x, y, label, fontsize=8, fontweight='bold', ha='center', va='center',
+                    zorder=3, clip_on=True)
+
+    ax.autoscale_view()
+    ax.margins(0.1)
+    ax.set_title("Network Device Map", fontsize=16, pad=20)
+
+    legend_elements = [
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=color, markersize=10, label=device_type)
+        for device_type, color in colors.items() if device_type in by_type
+    ]
+    if legend_elements:
+        ax.legend(handles=legend_elements, loc='center left', bbox_to_anchor=(1, 0.5))
+
+    fig.tight_layout()
+
+    # No timestamp so identical graphs give identical SVG
+    buf = io.BytesIO()
+    metadata = {'Date': None} if fmt == 'svg' else None
+    fig.savefig(buf, format=fmt, bbox_inches='tight', dpi=dpi, metadata=metadata)
+    return buf.getvalue()
+
+
+def render_image(devices: List[Dict], fmt: str, figsize: Tuple[float, float], dpi: int,
+                 layout: str = 'auto', colors: Dict[str, str] = DEVICE_COLORS) -> bytes:
+    """Build, lay out and draw devices; a plain function so it can run in a process pool"""
+    graph = build_graph(devices)
+    return draw_graph(graph, compute_layout(graph, layout), fmt, figsize, dpi, colors)
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered graphs keyed by content hash, bounded by total size"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
 class NetworkGraphGenerator:
-    def __init__(self):
+    def __init__(self, cache: RenderCache = None):
         self.G = nx.Graph()
-        self.colors = {
-            'Router': '#FF6B6B',
-            'Computer': '#4ECDC4',
-            'Network Equipment': '#45B7D1',
-            'Apple Device': '#96CEB4',
-            'Android Device': '#A8E6CF',
-            'IoT Device': '#FFD93D',
-            'Unknown Device': '#6C757D',
-            'Printer': '#FF9F1C',
-            'Media Device': '#2196F3',
-            'Security Camera': '#9C27B0',
-            'Windows Device': '#00BCD4',
-            'Smart Home Device': '#FF9800',
-            'Virtual Machine': '#9C27B0',
-            'Server': '#F44336',
-            'Gaming Console': '#E91E63'
-        }
+        self.cache = cache if cache is not None else RenderCache()
+        self.colors = dict(DEVICE_COLORS)
         
+    @staticmethod
+    def render_key(devices: List[Dict], fmt: str = 'png', thumbnail: bool = False,
+                   layout: str = 'auto') -> str:
+        """Content hash of everything that affects the rendered output"""
+        if fmt == 'json':
+            layout = 'auto'  # JSON carries no positions, the client lays it out
+        drawn = sorted(
+            (d['ip'], d.get('type', ''), d.get('vendor', ''), d.get('hostname', ''))
+            for d in devices
+        )
+        payload = json.dumps({'devices': drawn, 'format': fmt, 'thumbnail': thumbnail, 'layout': layout},
+                             separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def render(self, devices: List[Dict], fmt: str = 'png', thumbnail: bool = False,
+               layout: str = 'auto') -> Tuple[bytes, str]:
+        """Render devices as PNG, SVG or node/edge JSON; returns (data, content key)"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported graph format: {fmt}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unsupported graph layout: {layout}")
+        key = self.render_key(devices, fmt, thumbnail, layout)
+        data = self.cache.get(key)
+        if data is None:
+            if fmt == 'json':
+                data = json.dumps(self.graph_json(devices)).encode('utf-8')
+            else:
+                size = THUMBNAIL_SIZE if thumbnail else FULL_SIZE
+                data = self._draw(devices, fmt, layout=layout, **size)
+            self.cache.put(key, data)
+        return data, key
+
+    def graph_json(self, devices: List[Dict]) -> Dict:
+        """Nodes and edges for client-side layout"""
+        graph = self._build_graph(devices)
+        nodes = [
+            {
+                'id': node,
+                'type': data['type'],
+                'label': data['label'],
+                'color': self.colors.get(data['type'], self.colors['Unknown Device']),
+            }
+            for node, data in graph.nodes(data=True)
+        ]
+        edges = [{'source': u, 'target': v} for u, v in graph.edges]
+        return {'nodes': nodes, 'edges': edges}
+
     def create_graph(self, devices: List[Dict]) -> bytes:
         """Generate network graph visualization"""
-        # Create a new figure to ensure clean state
-        plt.close('all')
-        fig = plt.figure(figsize=(15, 10))
-        
-        # Clear the graph
-        self.G.clear()
-        
-        try:
-            # Add router node (assumed to be first device or device ending in .1)
-            router_found = False
-            for device in devices:
-                if device['type'] == 'Router' or device['ip'].endswith('.1'):
-                    self.G.add_node(device['ip'], 
-                                  type='Router',
-                                  label=f"Router\n{device['ip']}\n{device.get('vendor', 'Unknown')}")
-                    router_found = True
-                    break
-                    
-            if not router_found and devices:
-                self.G.add_node(devices[0]['ip'], 
-                              type='Router',
-                              label=f"Router\n{devices[0]['ip']}\n{devices[0].get('vendor', 'Unknown')}")
-            
-            # Add other devices
-            for device in devices:
-                if device['type'] != 'Router' and not device['ip'].endswith('.1'):
-                    label = f"{device['type']}\n{device['ip']}"
-                    if device.get('vendor') and device['vendor'] != 'Unknown':
-                        label += f"\n{device['vendor']}"
-                    if device.get('hostname'):
-                        label += f"\n{device['hostname']}"
-                    self.G.add_node(device['ip'], 
-                                  type=device['type'],
-                                  label=label)
-                    # Connect to router
-                    try:
-                        router_node = next(n for n in self.G.nodes if self.G.nodes[n]['type'] == 'Router')
-                        self.G.add_edge(router_node, device['ip'])
-                    except StopIteration:
-                        # If no router found, connect to first device
-                        if len(self.G.nodes) > 0:
-                            first_node = list(self.G.nodes)[0]
-                            self.G.add_edge(first_node, device['ip'])
-            
-            # Create layout
-            pos = nx.spring_layout(self.G, k=1, iterations=50)
-            
-            # Draw nodes for each device type
-            for device_type, color in self.colors.items():
-                node_list = [n for n in self.G.nodes if self.G.nodes[n]['type'] == device_type]
-                if node_list:
-                    nx.draw_networkx_nodes(self.G, pos,
-                                         nodelist=node_list,
-                                         node_color=color,
-                                         node_size=3000,
-                                         alpha=0.7)
-            
-            # Draw edges
-            nx.draw_networkx_edges(self.G, pos, 
-                                 edge_color='#2f3640',
-                                 width=2,
-                                 alpha=0.5)
-            
-            # Add labels
-            labels = nx.get_node_attributes(self.G, 'label')
-            nx.draw_networkx_labels(self.G, pos,
-                                  labels,
-                                  font_size=8,
-                                  font_weight='bold')
-            
-            plt.title("Network Device Map", fontsize=16, pad=20)
-            
-            # Add legend
-            legend_elements = []
-            for device_type, color in self.colors.items():
-                if any(self.G.nodes[n]['type'] == device_type for n in self.G.nodes):
-                    legend_elements.append(plt.Line2D([0], [0], marker='o', color='w', 
-                                        markerfacecolor=color, 
-                                        markersize=10, 
-                                        label=device_type))
-            
-            if legend_elements:
-                plt.legend(handles=legend_elements, 
-                          loc='center left',
-                          bbox_to_anchor=(1, 0.5))
-            
-            plt.tight_layout()
-            
-            # Save to bytes buffer
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', dpi=300)
-            plt.close(fig)
-            
-            return buf.getvalue()
+        return self.render(devices, 'png')[0]
+
+    def _build_graph(self, devices: List[Dict]) -> nx.Graph:
+        """Build a fresh graph; self.G keeps the most recent one for inspection"""
+        graph = build_graph(devices)
+        self.G = graph
+        return graph
 
+    def _draw(self, devices: List[Dict], fmt: str, figsize: Tuple[float, float], dpi: int,
+              layout: str = 'auto') -> bytes:
+        """Draw the device graph with matplotlib"""
+        try:
+            graph = self._build_graph(devices)
+            return draw_graph(graph, compute_layout(graph, layout), fmt, figsize, dpi, self.colors)
         except Exception as e:
             print(f"Error generating graph: {str(e)}")
-            plt.close(fig)
-            raise
\ No newline at end of file
+            raise
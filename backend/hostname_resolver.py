@@ -0,0 +1,400 @@
+"""
+Batched reverse-DNS resolution.
+
+PTR queries for a whole batch of hosts are written to one UDP socket per
+nameserver and matched back by transaction id, so a host without a PTR
+record costs one timeout for the batch rather than a blocked worker.
+Answers, including "no name", are kept in a bounded LRU cache with a TTL
+that outlives a single scan.
+
+Hosts the nameserver cannot name can optionally be asked directly, via a
+NetBIOS node status query (UDP 137) or a unicast mDNS PTR query (UDP 5353).
+"""
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DNS_PORT = 53
+MDNS_PORT = 5353
+NETBIOS_PORT = 137
+FALLBACKS = ('netbios', 'mdns')
+
+_HEADER = struct.Struct('!HHHHHH')
+_TYPE_PTR = 12
+_TYPE_NBSTAT = 0x21
+_CLASS_IN = 1
+_RCODE_NXDOMAIN = 3
+
+# NetBIOS wildcard name '*' padded with NULs, first-level encoded (RFC 1002)
+_NBSTAT_NAME = b'\x20' + b'CK' + b'AA' * 15 + b'\x00'
+
+
+def read_nameservers(path: str = '/etc/resolv.conf') -> List[str]:
+    """IPv4 nameservers from a resolv.conf file; empty when there is none"""
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    try:
+                        if ipaddress.ip_address(fields[1]).version == 4:
+                            servers.append(fields[1])
+                    except ValueError:
+                        continue
+    except OSError:
+        pass
+    return servers
+
+
+def reverse_name(ip: str) -> str:
+    return ipaddress.IPv4Address(ip).reverse_pointer
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = bytearray()
+    for label in name.rstrip('.').split('.'):
+        raw = label.encode('ascii')
+        encoded.append(len(raw))
+        encoded.extend(raw)
+    encoded.append(0)
+    return bytes(encoded)
+
+
+def build_ptr_query(ip: str, txid: int) -> bytes:
+    """Recursive PTR query for ip's in-addr.arpa name"""
+    question = _encode_name(reverse_name(ip)) + struct.pack('!HH', _TYPE_PTR, _CLASS_IN)
+    return _HEADER.pack(txid, 0x0100, 1, 0, 0, 0) + question
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a possibly compressed name; returns (name, offset after it)"""
+    labels = []
+    end = None
+    for _ in range(128):  # bounds compression loops
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return '.'.join(labels), end if end is not None else offset
+        labels.append(data[offset:offset + length].decode('utf-8', 'replace'))
+        offset += length
+    raise ValueError('DNS name compression loop')
+
+
+def parse_ptr_response(data: bytes) -> Tuple[int, int, Optional[str], int]:
+    """(transaction id, rcode, PTR target or None, TTL) from a DNS response"""
+    txid, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(data, 0)
+    offset = _HEADER.size
+    for _ in range(qdcount):
+        _, offset = _read_name(data, offset)
+        offset += 4
+    for _ in range(ancount):
+        _, offset = _read_name(data, offset)
+        rtype, _, ttl, rdlength = struct.unpack_from('!HHIH', data, offset)
+        offset += 10
+        if rtype == _TYPE_PTR:
+            name, _ = _read_name(data, offset)
+            return txid, flags & 0x000F, name, ttl
+        offset += rdlength
+    return txid, flags & 0x000F, None, 0
+
+
+def build_nbstat_query(txid: int) -> bytes:
+    """NetBIOS node status request for the wildcard name"""
+    return _HEADER.pack(txid, 0, 1, 0, 0, 0) + _NBSTAT_NAME + struct.pack('!HH', _TYPE_NBSTAT, _CLASS_IN)
+
+
+def parse_nbstat_response(data: bytes) -> Optional[str]:
+    """Workstation name from a node status response, or None"""
+    offset = _HEADER.size + len(_NBSTAT_NAME)
+    if len(data) < offset + 11:
+        return None
+    rtype, = struct.unpack_from('!H', data, offset)
+    if rtype != _TYPE_NBSTAT:
+        return None
+    offset += 10  # type, class, ttl, rdlength
+    count = data[offset]
+    offset += 1
+    for i in range(count):
+        entry = data[offset + i * 18:offset + (i + 1) * 18]
+        if len(entry) < 18:
+            break
+        suffix = entry[15]
+        flags, = struct.unpack('!H', entry[16:18])
+        if suffix == 0x00 and not flags & 0x8000:  # unique workstation name
+            return entry[:15].decode('ascii', 'replace').strip() or None
+    return None
+
+
+def _question_name(data: bytes) -> Optional[str]:
+    """Name of a DNS message's first question, lowercased, or None without one"""
+    if _HEADER.unpack_from(data, 0)[2] == 0:
+        return None
+    return _read_name(data, _HEADER.size)[0].rstrip('.').lower()
+
+
+def _ptr_reply(data: bytes):
+    txid, rcode, name, ttl = parse_ptr_response(data)
+    return txid, (rcode, name, ttl)
+
+
+def _ptr_name_reply(data: bytes):
+    txid, _, name, _ = parse_ptr_response(data)
+    return txid, name
+
+
+def _nbstat_reply(data: bytes):
+    return _HEADER.unpack_from(data, 0)[0], parse_nbstat_response(data)
+
+
+class HostnameCache:
+    """Thread-safe LRU of ip -> hostname with per-entry expiry.
+
+    An empty string records that a host has no name, so repeated scans do
+    not keep asking about it.
+    """
+
+    def __init__(self, max_entries: int = 65536):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ip: str, now: float = None) -> Optional[str]:
+        """Cached hostname ('' when negatively cached), or None when unknown or expired"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None:
+                return None
+            hostname, expires = entry
+            if expires <= now:
+                del self._entries[ip]
+                return None
+            self._entries.move_to_end(ip)
+            return hostname
+
+    def put(self, ip: str, hostname: str, ttl: float, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[ip] = (hostname, now + ttl)
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _ReplyProtocol(asyncio.DatagramProtocol):
+    """Hands every datagram to a callback with its source address"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def datagram_received(self, data, addr):
+        self.callback(data, addr)
+
+
+class AsyncHostnameResolver:
+    """Concurrent PTR lookups with a shared TTL cache and optional direct fallbacks"""
+
+    def __init__(self, nameservers: List[str] = None, timeout: float = 1.0, retries: int = 1,
+                 max_concurrency: int = 512, cache: HostnameCache = None, min_ttl: float = 60,
+                 max_ttl: float = 3600, negative_ttl: float = 300, failure_ttl: float = 30,
+                 fallbacks: Iterable[str] = (), port: int = DNS_PORT, fallback_timeout: float = 0.5):
+        self.nameservers = read_nameservers() if nameservers is None else list(nameservers)
+        self.timeout = timeout
+        self.retries = retries
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else HostnameCache()
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.failure_ttl = failure_ttl
+        self.fallbacks = tuple(fallbacks)
+        for fallback in self.fallbacks:
+            if fallback not in FALLBACKS:
+                raise ValueError(f"Unknown hostname fallback: {fallback}")
+        self.port = port
+        self.fallback_timeout = fallback_timeout
+
+    async def _query_all(self, requests: Dict[str, Tuple[str, int]], build, parse, timeout: float,
+                         retries: int, question: Callable[[str], str] = None) -> Dict[str, object]:
+        """Send one datagram per key and collect the parsed replies, matched by transaction id.
+
+        requests maps a key to its destination (host, port); build(key, txid)
+        makes the datagram and parse(data) returns (txid, result). With
+        question, a reply must also repeat question(key) as its question
+        name. At most max_concurrency queries are in flight, each window
+        waiting until all of its replies are in or the timeout passes.
+        Transaction ids are not reused within 65535 queries, so a late reply
+        to an earlier window or retry cannot be taken for a newer query.
+        """
+        loop = asyncio.get_running_loop()
+        pending = {}
+        results = {}
+        done = asyncio.Event()
+
+        def on_reply(data, addr):
+            try:
+                txid, result = parse(data)
+                entry = pending.get(txid)
+                if entry is None or entry[1] != addr[0]:
+                    return
+                if question is not None and _question_name(data) != question(entry[0]).lower():
+                    return
+            except (ValueError, IndexError, struct.error):
+                return
+            del pending[txid]
+            results[entry[0]] = result
+            if not pending:
+                done.set()
+
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ReplyProtocol(on_reply), family=socket.AF_INET, local_addr=('0.0.0.0', 0))
+        window = min(self.max_concurrency, 0xFFFF)
+        txids = random.sample(range(1, 0x10000), min(0xFFFF, len(requests) * (retries + 1)))
+        sent = 0
+        try:
+            for _ in range(retries + 1):
+                keys = [key for key in requests if key not in results]
+                for start in range(0, len(keys), window):
+                    batch = keys[start:start + window]
+                    pending.clear()
+                    done.clear()
+                    for key in batch:
+                        txid = txids[sent % len(txids)]
+                        sent += 1
+                        host, port = requests[key]
+                        try:
+                            transport.sendto(build(key, txid), (host, port))
+                        except OSError:
+                            continue
+                        pending[txid] = (key, host)
+                    if pending:
+                        try:
+                            await asyncio.wait_for(done.wait(), timeout)
+                        except asyncio.TimeoutError:
+                            pass
+        finally:
+            transport.close()
+        return results
+
+    async def _nameserver_stage(self, ips: List[str], now: float) -> Dict[str, str]:
+        resolved = {}
+        remaining = list(ips)
+        for server in self.nameservers:
+            if not remaining:
+                break
+            answers = await self._query_all(
+                {ip: (server, self.port) for ip in remaining}, build_ptr_query, _ptr_reply,
+                self.timeout, self.retries, question=reverse_name)
+            unanswered = []
+            for ip in remaining:
+                answer = answers.get(ip)
+                if answer is None or answer[0] not in (0, _RCODE_NXDOMAIN):
+                    unanswered.append(ip)  # timeout or SERVFAIL: try the next server
+                    continue
+                rcode, name, ttl = answer
+                name = (name or '').rstrip('.')
+                resolved[ip] = name
+                if name:
+                    self.cache.put(ip, name, min(max(ttl, self.min_ttl), self.max_ttl), now)
+            remaining = unanswered
+        return resolved
+
+    async def _fallback_stage(self, ips: List[str]) -> Dict[str, str]:
+        names = {}
+        for fallback in self.fallbacks:
+            ips = [ip for ip in ips if not names.get(ip)]
+            if not ips:
+                break
+            if fallback == 'netbios':
+                answers = await self._query_all(
+                    {ip: (ip, NETBIOS_PORT) for ip in ips}, lambda ip, txid: build_nbstat_query(txid),
+                    _nbstat_reply, self.fallback_timeout, 0)
+                names.update((ip, name) for ip, name in answers.items() if name)
+            else:
+                # A query from an ephemeral port gets a legacy unicast reply (RFC 6762 6.7)
+                answers = await self._query_all(
+                    {ip: (ip, MDNS_PORT) for ip in ips}, build_ptr_query,
+                    _ptr_name_reply, self.fallback_timeout, 0, question=reverse_name)
+                names.update((ip, name.rstrip('.')) for ip, name in answers.items() if name)
+        return names
+
+    async def _system_stage(self, ips: List[str]) -> Dict[str, str]:
+        """gethostbyaddr in worker threads, for systems without a usable resolv.conf"""
+        loop = asyncio.get_running_loop()
+
+        def lookup(ip):
+            try:
+                return socket.gethostbyaddr(ip)[0]
+            except (OSError, UnicodeError):
+                return ''
+        names = await asyncio.gather(*(loop.run_in_executor(None, lookup, ip) for ip in ips))
+        return dict(zip(ips, names))
+
+    async def resolve_many_async(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Hostname for every ip, '' when it has none"""
+        now = time.monotonic()
+        results = {}
+        missing = []
+        for ip in dict.fromkeys(ips):
+            hostname = self.cache.get(ip, now)
+            if hostname is None:
+                missing.append(ip)
+            else:
+                results[ip] = hostname
+        if not missing:
+            return results
+
+        if self.nameservers:
+            resolved = await self._nameserver_stage(missing, now)
+        else:
+            resolved = await self._system_stage(missing)
+            for ip, name in resolved.items():
+                if name:
+                    self.cache.put(ip, name, self.min_ttl, now)
+
+        unnamed = [ip for ip in missing if not resolved.get(ip)]
+        if unnamed and self.fallbacks:
+            for ip, name in (await self._fallback_stage(unnamed)).items():
+                resolved[ip] = name
+                self.cache.put(ip, name, self.min_ttl, now)
+
+        for ip in missing:
+            name = resolved.get(ip)
+            if not name:
+                # A definite "no name" is kept longer than a timeout
+                self.cache.put(ip, '', self.negative_ttl if ip in resolved else self.failure_ttl, now)
+            results[ip] = name or ''
+        return results
+
+    def resolve_many(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Blocking wrapper around resolve_many_async"""
+        ips = list(ips)
+        if not ips:
+            return {}
+        return asyncio.run(self.resolve_many_async(ips))
+
+    def resolve(self, ip: str) -> str:
+        """Hostname for one ip, answered from the cache when possible"""
+        hostname = self.cache.get(ip)
+        if hostname is not None:
+            return hostname
+        return self.resolve_many([ip]).get(ip, '')
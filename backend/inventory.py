@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_INVENTORY_PATH = os.environ.get(
+    'NETMAP_INVENTORY',
+    os.path.join(os.path.expanduser('~'), '.network-mapper', 'inventory.db')
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    ip TEXT PRIMARY KEY,
+    mac TEXT NOT NULL DEFAULT '',
+    vendor TEXT NOT NULL DEFAULT 'Unknown',
+    hostname TEXT NOT NULL DEFAULT '',
+    ports TEXT NOT NULL DEFAULT '[]',
+    type TEXT,
+    services TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    fingerprinted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_devices_mac_lower ON devices (lower(mac));
+CREATE TABLE IF NOT EXISTS port_stats (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    probed INTEGER NOT NULL DEFAULT 0,
+    open INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, key, port)
+);
+"""
+
+_COLUMNS = ('ip', 'mac', 'vendor', 'hostname', 'ports', 'type', 'services',
+            'first_seen', 'last_seen', 'fingerprinted_at')
+
+
+class DeviceInventory:
+    """Persistent SQLite record of every device seen, with fingerprint freshness"""
+
+    def __init__(self, path: str = DEFAULT_INVENTORY_PATH, max_age: float = 24 * 3600):
+        """max_age is how long, in seconds, a fingerprint stays fresh"""
+        self.path = path
+        self.max_age = max_age
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            # Inventories written before services were kept lack the column
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(devices)')}
+            if 'services' not in columns:
+                self._conn.execute('ALTER TABLE devices ADD COLUMN services TEXT')
+
+    def _row_to_device(self, row: sqlite3.Row) -> Dict:
+        device = {column: row[column] for column in _COLUMNS}
+        device['ports'] = json.loads(row['ports'])
+        if device['type'] is None:
+            del device['type']
+        if device['services'] is None:
+            del device['services']
+        else:
+            device['services'] = json.loads(device['services'])
+        return device
+
+    def get(self, ip: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM devices WHERE ip = ?', (ip,)).fetchone()
+        return self._row_to_device(row) if row else None
+
+    def get_many(self, ips: Iterable[str]) -> Dict[str, Dict]:
+        """Records of the given hosts that are in the inventory, by IP"""
+        ips = list(ips)
+        rows = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit on large sweeps
+            for i in range(0, len(ips), 500):
+                chunk = ips[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for row in self._conn.execute(
+                        f'SELECT * FROM devices WHERE ip IN ({placeholders})', chunk):
+                    rows[row['ip']] = self._row_to_device(row)
+        return rows
+
+    def relocate(self, arp_results: Dict[str, str]) -> Dict[str, Dict]:
+        """Move records of hosts that answer at a new address to it, matched by MAC.
+
+        A record moves only when its old address is not in arp_results and
+        the new one has no record yet; returns the moved records by new IP.
+        """
+        missing = {}
+        with self._lock:
+            known = set()
+            ips = list(arp_results)
+            for i in range(0, len(ips), 500):
+                chunk = ips[i:i + 500]
+                known.update(row[0] for row in self._conn.execute(
+                    f"SELECT ip FROM devices WHERE ip IN ({','.join('?' * len(chunk))})", chunk))
+        for ip, mac in arp_results.items():
+            if mac and ip not in known:
+                missing.setdefault(mac.lower(), ip)
+        if not missing:
+            return {}
+
+        moved = {}
+        with self._lock, self._conn:
+            macs = list(missing)
+            rows = []
+            for i in range(0, len(macs), 500):
+                chunk = macs[i:i + 500]
+                rows.extend(self._conn.execute(
+                    f"SELECT * FROM devices WHERE lower(mac) IN ({','.join('?' * len(chunk))}) "
+                    "ORDER BY last_seen DESC", chunk).fetchall())
+            for row in rows:
+                new_ip = missing[row['mac'].lower()]
+                if new_ip in moved or row['ip'] in arp_results:
+                    continue
+                self._conn.execute('UPDATE devices SET ip = ? WHERE ip = ?', (new_ip, row['ip']))
+                device = self._row_to_device(row)
+                device['ip'] = new_ip
+                moved[new_ip] = device
+        return moved
+
+    def all_devices(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM devices ORDER BY last_seen DESC').fetchall()
+        return [self._row_to_device(row) for row in rows]
+
+    def needs_fingerprint(self, record: Optional[Dict], mac: str, now: float = None) -> bool:
+        """True for new hosts, hosts whose MAC changed, and stale fingerprints"""
+        if record is None or record['fingerprinted_at'] is None:
+            return True
+        if mac and record['mac'] and mac.lower() != record['mac'].lower():
+            return True
+        now = time.time() if now is None else now
+        return now - record['fingerprinted_at'] > self.max_age
+
+    def plan_delta(self, arp_results: Dict[str, str], now: float = None) -> Tuple[Dict[str, str], List[Dict]]:
+        """Split an ARP sweep into hosts to fingerprint and up-to-date cached devices.
+
+        Cached devices have their last-seen timestamp refreshed. A host found
+        at a new address is looked up by its MAC and its record moved there.
+        """
+        now = time.time() if now is None else now
+        self.relocate(arp_results)
+        rows = self.get_many(arp_results)
+
+        to_fingerprint = {}
+        cached = []
+        for ip, mac in arp_results.items():
+            record = rows.get(ip)
+            if self.needs_fingerprint(record, mac, now):
+                to_fingerprint[ip] = mac
+            else:
+                record['last_seen'] = now
+                cached.append(record)
+        self.touch([device['ip'] for device in cached], now)
+        return to_fingerprint, cached
+
+    def touch(self, ips: List[str], now: float = None):
+        """Mark hosts as seen without re-fingerprinting them"""
+        if not ips:
+            return
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE devices SET last_seen = ? WHERE ip = ?',
+                                   [(now, ip) for ip in ips])
+
+    def upsert(self, device: Dict, fingerprinted: bool = True, now: float = None):
+        """Insert or update a device record from a scan result"""
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO devices (ip, mac, vendor, hostname, ports, type, services,
+                                     first_seen, last_seen, fingerprinted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(ip) DO UPDATE SET
+                    mac = excluded.mac,
+                    vendor = excluded.vendor,
+                    hostname = excluded.hostname,
+                    ports = excluded.ports,
+                    type = COALESCE(excluded.type, devices.type),
+                    services = CASE WHEN excluded.fingerprinted_at IS NULL
+                                    THEN devices.services ELSE excluded.services END,
+                    last_seen = excluded.last_seen,
+                    fingerprinted_at = COALESCE(excluded.fingerprinted_at, devices.fingerprinted_at)
+                """,
+                (device['ip'], device.get('mac', ''), device.get('vendor', 'Unknown'),
+                 device.get('hostname', ''), json.dumps(device.get('ports', [])),
+                 device.get('type'), json.dumps(device['services']) if device.get('services') else None,
+                 now, now, now if fingerprinted else None)
+            )
+
+    def port_stats(self) -> List[Tuple[str, str, int, int, int]]:
+        """(scope, key, port, probed, open) counts kept for adaptive port selection"""
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(
+                'SELECT scope, key, port, probed, open FROM port_stats')]
+
+    def add_port_stats(self, counts: Dict[Tuple[str, str, int], Tuple[int, int]]):
+        """Add (probed, open) to the counts of each (scope, key, port)"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO port_stats (scope, key, port, probed, open) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(scope, key, port) DO UPDATE SET
+                    probed = probed + excluded.probed,
+                    open = open + excluded.open
+                """,
+                [(scope, key, port, probed, opened) for (scope, key, port), (probed, opened) in counts.items()])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
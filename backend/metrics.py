@@ -0,0 +1,287 @@
+"""
+Scan instrumentation: stage timing spans, counters and histograms.
+
+REGISTRY holds process-wide counters and histograms and renders them in
+the Prometheus text exposition format. Collectors registered on it add
+samples computed at scrape time, such as the probe counters a
+ScanRateLimiter already keeps.
+
+A ScanTimer collects the spans of one scan. Each span is added to the
+scan's own breakdown and observed in the netmap_stage_seconds histogram.
+ScanProfiler runs a single scan under cProfile, or pyinstrument when it
+is installed.
+"""
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, one value per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                labels = dict(key)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f'{self.name}_bucket', dict(labels, le=_format_value(bound)), cumulative))
+                samples.append((f'{self.name}_sum', labels, total))
+                samples.append((f'{self.name}_count', labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def register_collector(self, name: str, kind: str, help_text: str, collect: Callable[[], Iterable[Sample]]):
+        """Add a metric family whose samples are computed by collect() at every scrape"""
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != name]
+            self._collectors.append((name, kind, help_text, collect))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(m.name, m.kind, m.help, m.samples) for m in self._metrics.values()]
+            families += self._collectors
+        lines = []
+        for name, kind, help_text, collect in families:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram('netmap_stage_seconds', 'Wall-clock seconds spent in each scan stage')
+HOSTS = REGISTRY.counter('netmap_hosts_total', 'Hosts handled by scans, by source')
+SCANS = REGISTRY.counter('netmap_scans_total', 'Scans run, by outcome')
+
+
+@contextmanager
+def span(stage: str, timer: 'ScanTimer' = None):
+    """Time a block as one span of stage, in timer's breakdown when given"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if timer is not None:
+            timer.add(stage, elapsed)
+        else:
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+
+
+class ScanTimer:
+    """Stage spans and counters of a single scan; safe to share with worker threads"""
+
+    def __init__(self, histogram: Histogram = STAGE_SECONDS, hosts: Counter = HOSTS):
+        self.histogram = histogram
+        self.hosts_counter = hosts
+        self.started_at = time.time()
+        self.finished_at = None
+        self.profile = None
+        self._stages: Dict[str, List[float]] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, observe: bool = True):
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+        if observe and self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage)
+
+    def span(self, stage: str):
+        return span(stage, self)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        """fn wrapped so every call is a span of stage"""
+        def wrapper(*args, **kwargs):
+            with self.span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def count(self, name: str, amount: int = 1):
+        """Per-scan counter; host counters also feed netmap_hosts_total"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+        if name.startswith('hosts_') and self.hosts_counter is not None:
+            self.hosts_counter.inc(amount, source=name[len('hosts_'):])
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def breakdown(self) -> Dict:
+        """Seconds and span count per stage, counters, and the total so far"""
+        with self._lock:
+            stages = {stage: {'seconds': round(seconds, 6), 'spans': spans}
+                      for stage, (seconds, spans) in self._stages.items()}
+            counters = dict(self._counters)
+        end = self.finished_at or time.time()
+        data = {'total_seconds': round(end - self.started_at, 6), 'stages': stages, 'counters': counters}
+        if self.profile is not None:
+            data['profile'] = self.profile
+        return data
+
+
+class ScanProfiler:
+    """Profile the block it wraps with cProfile, or pyinstrument when installed and requested.
+
+    Only the thread entering the block is profiled. The report is written
+    to output_dir and its path, plus the hottest functions for cProfile,
+    is available as summary() afterwards.
+    """
+
+    ENGINES = ('cprofile', 'pyinstrument')
+
+    def __init__(self, engine: str = 'cprofile', output_dir: str = None, top: int = 20):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown profiler: {engine}")
+        if engine == 'pyinstrument':
+            # Optional, and only imported when asked for
+            try:
+                import pyinstrument
+            except ImportError:
+                raise ValueError("pyinstrument is not installed")
+            self._pyinstrument = pyinstrument
+        self.engine = engine
+        self.output_dir = output_dir or os.environ.get('NETMAP_PROFILE_DIR', tempfile.gettempdir())
+        self.top = top
+        self.path = None
+        self.hotspots = None
+        self._profiler = None
+
+    def __enter__(self):
+        if self.engine == 'pyinstrument':
+            self._profiler = self._pyinstrument.Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if self.engine == 'pyinstrument':
+            self._profiler.stop()
+            self.path = os.path.join(self.output_dir, f'netmap-scan-{stamp}.html')
+            with open(self.path, 'w') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self.path = os.path.join(self.output_dir, f'netmap-scan-{stamp}.prof')
+            self._profiler.dump_stats(self.path)
+            report = io.StringIO()
+            pstats.Stats(self._profiler, stream=report).sort_stats('cumulative').print_stats(self.top)
+            self.hotspots = report.getvalue()
+
+    def summary(self) -> Optional[Dict]:
+        if self.path is None:
+            return None
+        return {'engine': self.engine, 'path': self.path, 'hotspots': self.hotspots}
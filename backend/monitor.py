@@ -0,0 +1,219 @@
+"""
+Continuous network monitoring.
+
+A background thread runs a lightweight ARP liveness sweep every
+liveness_interval seconds. Hosts that appear are fingerprinted right away
+(or served from the inventory when their fingerprint is fresh); hosts that
+miss absent_sweeps sweeps in a row are dropped. Known hosts are also
+re-fingerprinted in staggered slices, the least recently fingerprinted
+first, so each is rescanned about every deep_interval seconds without a
+full scan ever running at once.
+
+Every pass is diffed against the maintained state and produces
+device_joined, device_left and device_changed events. These go to
+registered listeners and into a bounded, sequence-numbered feed that
+clients can poll with events_since().
+"""
+import math
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .device_identifier import discovered_device, set_type
+except ImportError:
+    from device_identifier import discovered_device, set_type
+
+Listener = Callable[[str, Dict], None]
+
+# Fields whose change is reported as device_changed
+TRACKED_FIELDS = ('mac', 'vendor', 'hostname', 'ports', 'type', 'services')
+
+
+class NetworkMonitor:
+    """Periodic liveness sweeps plus staggered deep rescans, diffed into change events.
+
+    scanner is polled from a background thread between start() and stop():
+    liveness_sweep() every liveness_interval seconds and fingerprint_hosts()
+    for new and due hosts. identifier, if given, types every device before
+    it is compared, so a type change is reported as device_changed.
+    """
+
+    def __init__(self, scanner, identifier=None, liveness_interval: float = 60,
+                 deep_interval: float = 900, absent_sweeps: int = 2, max_events: int = 1000,
+                 clock=time.time):
+        self.scanner = scanner
+        self.identifier = identifier
+        self.liveness_interval = liveness_interval
+        self.deep_interval = deep_interval
+        self.absent_sweeps = absent_sweeps
+        self._clock = clock
+        self._devices: Dict[str, Dict] = {}
+        self._missed: Dict[str, int] = {}
+        self._fingerprinted: Dict[str, float] = {}
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.passes = 0
+        self.last_pass_at = None
+
+    def add_listener(self, listener: Listener):
+        """Register a callback receiving (event_name, payload) for every change event"""
+        self._listeners.append(listener)
+
+    def _emit(self, event: str, device: Dict, changes: Dict = None):
+        with self._lock:
+            self._seq += 1
+            payload = {'seq': self._seq, 'event': event, 'at': self._clock(), 'device': device}
+            if changes is not None:
+                payload['changes'] = changes
+            self._events.append(payload)
+        for listener in self._listeners:
+            try:
+                listener(event, payload)
+            except Exception as e:
+                print(f"Monitor event listener error: {e}")
+
+    def events_since(self, seq: int = 0, limit: int = 500) -> Tuple[List[Dict], int]:
+        """Events newer than seq, oldest first, and the latest sequence number"""
+        with self._lock:
+            events = [event for event in self._events if event['seq'] > seq][:limit]
+            return events, self._seq
+
+    def devices(self) -> List[Dict]:
+        """Copy of the maintained device state"""
+        with self._lock:
+            return [dict(device) for device in self._devices.values()]
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'device_count': len(self._devices),
+                'passes': self.passes,
+                'last_pass_at': self.last_pass_at,
+                'last_seq': self._seq,
+                'liveness_interval': self.liveness_interval,
+                'deep_interval': self.deep_interval,
+            }
+
+    def _apply(self, device: Dict):
+        """Fold one observed device into the state, emitting joined or changed"""
+        device['status'] = 'active'
+        with self._lock:
+            known = self._devices.get(device['ip'])
+            self._devices[device['ip']] = device
+        if known is None:
+            self._emit('device_joined', device)
+            return
+        changes = {field: {'old': known.get(field), 'new': device.get(field)}
+                   for field in TRACKED_FIELDS
+                   if field in device and known.get(field) != device.get(field)}
+        if changes:
+            self._emit('device_changed', device, changes)
+
+    def _due_for_rescan(self, alive: Dict[str, str], now: float) -> List[str]:
+        """This pass's slice of known hosts, least recently fingerprinted first"""
+        known = [ip for ip in alive if ip in self._fingerprinted]
+        if not known:
+            return []
+        per_pass = math.ceil(len(known) * self.liveness_interval / max(self.deep_interval, self.liveness_interval))
+        known.sort(key=lambda ip: self._fingerprinted[ip])
+        return [ip for ip in known[:per_pass] if now - self._fingerprinted[ip] >= self.liveness_interval]
+
+    def run_once(self) -> Dict:
+        """One liveness sweep plus this pass's deep rescans; returns counts of what happened"""
+        now = self._clock()
+        alive = self.scanner.liveness_sweep()
+        counts = {'alive': len(alive), 'joined': 0, 'left': 0, 'fingerprinted': 0}
+
+        # Hosts missing from enough consecutive sweeps have left
+        with self._lock:
+            missing = [ip for ip in self._devices if ip not in alive]
+        for ip in missing:
+            self._missed[ip] = self._missed.get(ip, 0) + 1
+            if self._missed[ip] >= self.absent_sweeps:
+                with self._lock:
+                    device = self._devices.pop(ip)
+                del self._missed[ip]
+                self._fingerprinted.pop(ip, None)
+                device['status'] = 'inactive'
+                self._emit('device_left', device)
+                counts['left'] += 1
+        for ip in alive:
+            self._missed.pop(ip, None)
+
+        # New hosts and hosts answering from a different MAC are fingerprinted now
+        with self._lock:
+            new = {ip: mac for ip, mac in alive.items() if ip not in self._devices}
+            moved = {ip: mac for ip, mac in alive.items()
+                     if ip in self._devices and mac and self._devices[ip].get('mac')
+                     and mac.lower() != self._devices[ip]['mac'].lower()}
+        counts['joined'] = len(new)
+        inventory = getattr(self.scanner, 'inventory', None)
+        if inventory is not None and new:
+            new, cached = inventory.plan_delta(new, now)
+            for device in cached:
+                self._fingerprinted[device['ip']] = device.get('fingerprinted_at') or now
+                self._apply(set_type(device, self.identifier))
+        targets = dict(new, **moved)
+        for ip in self._due_for_rescan(alive, now):
+            targets.setdefault(ip, alive[ip])
+
+        if targets:
+            for device in self.scanner.fingerprint_hosts(targets, should_stop=self._stop.is_set):
+                self._fingerprinted[device['ip']] = now
+                self._apply(set_type(device, self.identifier))
+                counts['fingerprinted'] += 1
+            # Hosts that answered ARP but yielded no fingerprint still joined
+            for ip in new:
+                if ip not in self._fingerprinted:
+                    self._fingerprinted[ip] = now
+                    self._apply(set_type(discovered_device(ip, new[ip]), self.identifier))
+
+        if inventory is not None:
+            inventory.touch(list(alive), now)
+        with self._lock:
+            self.passes += 1
+            self.last_pass_at = now
+        return counts
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                counts = self.run_once()
+                print(f"Monitor pass: {counts}")
+            except Exception as e:
+                print(f"Monitor pass failed: {e}")
+                traceback.print_exc()
+            self._wake.wait(self.liveness_interval)
+            self._wake.clear()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background thread; the first pass runs immediately"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='network-monitor', daemon=True)
+        self._thread.start()
+
+    def trigger(self):
+        """Run the next pass now instead of waiting out the interval"""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
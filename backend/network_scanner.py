@@ -1,8 +1,6 @@
-from scapy.all import ARP, Ether, srp, conf, get_if_addr, get_if_list, ICMP, IP, sr1
-import nmap
 import os
 import sys
-from typing import List, Dict, Set
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 import socket
 import ipaddress
 import subprocess
@@ -10,24 +8,130 @@ import platform
 import traceback
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
-import netifaces
-import psutil
+
+try:
+    from .port_scanner import AsyncPortScanner
+    from .nmap_stage import NmapBatchScanner
+    from .inventory import DeviceInventory
+    from .oui_db import lookup_vendor
+    from .arp_engine import RawArpSweeper, interface_for_range, local_interfaces
+    from .ping_sweep import PingSweeper
+    from .hostname_resolver import AsyncHostnameResolver
+    from .rate_control import ScanRateLimiter
+    from .banner_grabber import BannerGrabber
+    from .scan_backends import ScanBackend
+    from .metrics import ScanTimer, span
+    from .scan_scheduler import ScheduledScan
+    from .port_selector import PortSelector
+except ImportError:
+    from port_scanner import AsyncPortScanner
+    from nmap_stage import NmapBatchScanner
+    from inventory import DeviceInventory
+    from oui_db import lookup_vendor
+    from arp_engine import RawArpSweeper, interface_for_range, local_interfaces
+    from ping_sweep import PingSweeper
+    from hostname_resolver import AsyncHostnameResolver
+    from rate_control import ScanRateLimiter
+    from banner_grabber import BannerGrabber
+    from scan_backends import ScanBackend
+    from metrics import ScanTimer, span
+    from scan_scheduler import ScheduledScan
+    from port_selector import PortSelector
 
 class NetworkScanner:
-    def __init__(self, network_range: str = None):
-        """Initialize scanner with optional network range"""
-        self.clear_arp_cache()  # Clear ARP cache on start
+    COMMON_PORTS = [80, 443, 22, 445]
+
+    def __init__(self, network_range: str = None, engine: str = 'async', mode: str = 'full',
+                 inventory: DeviceInventory = None, arp_engine: str = 'auto',
+                 hostname_fallbacks: List[str] = (), rate_limiter: ScanRateLimiter = None,
+                 banners: bool = True, backend: ScanBackend = None, ping_sweep: bool = True,
+                 port_selection: str = 'fixed', probe_budget: int = 8, identifier=None):
+        """Initialize scanner with optional network range.
+
+        engine selects how the common-port probe runs: 'async' probes every
+        discovered host at once through AsyncPortScanner, 'threaded' keeps the
+        original blocking socket per port inside each _scan_ip worker.
+
+        mode 'delta' only fingerprints hosts that are new, changed or stale
+        in the inventory and serves the rest from it; 'full' fingerprints
+        every host. Results are recorded in the inventory in both modes.
+
+        arp_engine 'raw' sweeps over an AF_PACKET socket (Linux, needs
+        CAP_NET_RAW), 'scapy' uses srp, and 'auto' prefers raw when possible.
+
+        Hostnames come from batched PTR lookups cached across scans;
+        hostname_fallbacks may add 'netbios' and/or 'mdns' queries sent to
+        hosts the nameserver cannot name.
+
+        rate_limiter caps probes per second globally, per range and per
+        host, across ARP, port probes and nmap (--max-rate); its snapshot()
+        reports the achieved rate and loss of each.
+
+        banners grabs a banner from every open port and adds the services
+        matched from them to each device as 'services'.
+
+        backend, if given, answers every stage (ARP, port probes, hostnames,
+        nmap and banners) in place of the live network, e.g. a
+        SimulatedNetwork; the ARP cache is then left alone and ranges come
+        from the backend.
+
+        ping_sweep finds hosts in ranges no local interface is on, which
+        ARP cannot reach, with batched ICMP echo and TCP SYN/ACK pings
+        (PingSweeper, needs CAP_NET_RAW). Such hosts have no MAC address.
+
+        port_selection 'fixed' probes COMMON_PORTS on every host and deep
+        scans 20-1024 on those with one open; 'adaptive' probes the
+        probe_budget ports a PortSelector ranks likeliest for each host from
+        the open ports of earlier scans (kept in the inventory, if any) and
+        deep scans the ports it ranks best overall.
+
+        identifier, e.g. a DeviceIdentifier, sets each fingerprinted
+        device's 'type' before it is recorded in the inventory.
+        """
+        if engine not in ('async', 'threaded'):
+            raise ValueError(f"Unknown scan engine: {engine}")
+        if mode not in ('full', 'delta'):
+            raise ValueError(f"Unknown scan mode: {mode}")
+        if arp_engine not in ('auto', 'raw', 'scapy'):
+            raise ValueError(f"Unknown ARP engine: {arp_engine}")
+        if port_selection not in ('fixed', 'adaptive'):
+            raise ValueError(f"Unknown port selection: {port_selection}")
+        self.arp_engine = arp_engine
+        self._raw_arp = arp_engine != 'scapy' and RawArpSweeper.supported()
+        self._ping_sweep = ping_sweep and backend is None and PingSweeper.supported()
+        self.engine = engine
+        self.mode = mode
+        self.backend = backend
+        if inventory is None and mode == 'delta':
+            inventory = DeviceInventory()
+        self.inventory = inventory
+        self.identifier = identifier
+        self.port_selector = (PortSelector(inventory, probe_budget=probe_budget)
+                              if port_selection == 'adaptive' else None)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else ScanRateLimiter()
+        self.port_scanner = AsyncPortScanner(rate_limiter=self.rate_limiter)
+        self.resolver = AsyncHostnameResolver(fallbacks=hostname_fallbacks)
+        self.banner_grabber = BannerGrabber(rate_limiter=self.rate_limiter) if banners else None
+        if mode == 'full':
+            if backend is not None:
+                backend.prepare()
+            else:
+                self.clear_arp_cache()  # Clear ARP cache on start
         if network_range is None:
-            self.network_ranges = self._get_all_network_ranges()
+            with span('interfaces'):
+                self.network_ranges = (backend.network_ranges() if backend is not None
+                                       else self._get_all_network_ranges())
         else:
             self.network_ranges = [network_range]
 
         print(f"Detected network ranges: {self.network_ranges}")
-        
-        try:
-            self.nm = nmap.PortScanner()
-        except nmap.PortScannerError:
-            self._setup_nmap()
+        for network_range in self.network_ranges:
+            self.rate_limiter.add_range(network_range)
+
+        self.nmap = NmapBatchScanner(metrics=self.rate_limiter.metrics['nmap'])
+        self.nmap.max_rate = self.rate_limiter.nmap_max_rate(self.nmap.max_processes)
+        if not self.nmap.available and backend is None:
+            print("Nmap not found in PATH, skipping nmap fingerprinting")
 
     def clear_arp_cache(self):
         """Clear ARP cache to ensure fresh results"""
@@ -42,31 +146,24 @@ class NetworkScanner:
     def _get_active_interfaces(self) -> List[Dict]:
         """Get all active network interfaces"""
         active_interfaces = []
-        
+        seen = set()
+
         def is_valid_ip(ip):
             try:
                 return not (ip.startswith('127.') or ip.startswith('169.254.') or ip.startswith('0.'))
             except:
                 return False
 
-        # Get all network interfaces using psutil
-        net_if_stats = psutil.net_if_stats()
-        net_if_addrs = psutil.net_if_addrs()
-
-        for interface, stats in net_if_stats.items():
-            # Skip interfaces that are down or loopback
-            if not stats.isup:
+        # Up interfaces come from the cached psutil listing shared with the ARP engine
+        for interface in local_interfaces():
+            if interface['name'] in seen or not is_valid_ip(interface['ip']):
                 continue
-
-            addrs = net_if_addrs.get(interface, [])
-            for addr in addrs:
-                if addr.family == socket.AF_INET and is_valid_ip(addr.address):
-                    active_interfaces.append({
-                        'name': interface,
-                        'ip': addr.address,
-                        'netmask': addr.netmask
-                    })
-                    break  # Only take first valid IPv4 address
+            seen.add(interface['name'])  # Only take first valid IPv4 address
+            active_interfaces.append({
+                'name': interface['name'],
+                'ip': interface['ip'],
+                'netmask': interface['netmask']
+            })
 
         return active_interfaces
 
@@ -119,21 +216,65 @@ class NetworkScanner:
 
         return list(network_ranges)
 
-    def _scan_ip_range_arp(self, ip_range: str) -> Set[str]:
-        """Perform ARP scan on IP range"""
-        active_ips = set()
+    def _scan_ip_range_arp(self, ip_range: str) -> Dict[str, str]:
+        """Perform ARP scan on IP range, returning the MAC address of each responding IP.
+
+        A routed range is ping swept instead, mapping each responder to ''.
+        """
+        if self.backend is not None:
+            return self.backend.arp_sweep(ip_range)
+        interface = interface_for_range(ip_range)
+        if interface is None and self._ping_sweep:
+            routed = self._ping_sweep_range(ip_range)
+            if routed is not None:
+                return routed
+        if self._raw_arp:
+            if interface is not None:
+                try:
+                    sweeper = RawArpSweeper(interface['name'], interface['mac'], interface['ip'],
+                                            rate_limiter=self.rate_limiter)
+                    active_ips = sweeper.sweep_range(ip_range)
+                    for ip, mac in active_ips.items():
+                        print(f"Found device via ARP: {ip} - {mac}")
+                    return active_ips
+                except OSError as e:
+                    print(f"Raw ARP sweep failed for {ip_range}, falling back to scapy: {e}")
+            elif self.arp_engine == 'raw':
+                print(f"No local interface for {ip_range}, falling back to scapy")
+        return self._scan_ip_range_arp_scapy(ip_range)
+
+    def _ping_sweep_range(self, ip_range: str) -> Optional[Dict[str, str]]:
+        """Batched ICMP/TCP ping sweep of a routed range; None if raw sockets fail"""
+        try:
+            alive = PingSweeper(rate_limiter=self.rate_limiter).sweep_range(ip_range)
+        except OSError as e:
+            print(f"Ping sweep failed for {ip_range}: {e}")
+            return None
+        for ip, answer in alive.items():
+            print(f"Found device via ping: {ip} ({answer})")
+        return {ip: '' for ip in alive}
+
+    def _scan_ip_range_arp_scapy(self, ip_range: str) -> Dict[str, str]:
+        """ARP scan through scapy srp"""
+        active_ips = {}
         try:
+            # scapy takes a third of a second to import; only this fallback needs it
+            from scapy.all import ARP, Ether, srp
+
             # Create ARP request packet
             arp = ARP(pdst=ip_range)
             ether = Ether(dst="ff:ff:ff:ff:ff:ff")
             packet = ether/arp
 
-            # Send packet and get response
-            ans, _ = srp(packet, timeout=3, retry=2, verbose=0)
+            # Send packet and get response, spacing requests to the current ARP rate
+            inter = 1.0 / self.rate_limiter.congestion['arp'].current
+            ans, _ = srp(packet, timeout=3, retry=2, verbose=0, inter=inter)
+            self.rate_limiter.metrics['arp'].record(
+                sent=ipaddress.IPv4Network(ip_range, strict=False).num_addresses, answered=len(ans))
             
             # Process responses
             for sent, received in ans:
-                active_ips.add(received.psrc)
+                active_ips[received.psrc] = received.hwsrc
                 print(f"Found device via ARP: {received.psrc} - {received.hwsrc}")
 
         except Exception as e:
@@ -141,12 +282,31 @@ class NetworkScanner:
         
         return active_ips
 
-    def _scan_ip(self, ip: str) -> Dict:
-        """Scan a single IP address"""
+    def _probe_common_ports(self, ip: str, ports: List[int] = None) -> List[int]:
+        """Blocking connect probe of the common ports, or of ports, on one host"""
+        ports = self.COMMON_PORTS if ports is None else ports
+        if self.backend is not None:
+            return self.backend.probe_ports([ip], ports).get(ip, [])
+        open_ports = []
+        for port in ports:
+            self.rate_limiter.acquire(ip)
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.settimeout(1)
+                if sock.connect_ex((ip, port)) == 0:
+                    open_ports.append(port)
+                sock.close()
+            except:
+                continue
+        return open_ports
+
+    def _scan_ip(self, ip: str, open_ports: List[int] = None, nmap_info: Dict = None,
+                 mac: str = '') -> Dict:
+        """Scan a single IP address, reusing port and nmap results from batched stages"""
         try:
             result = {
                 'ip': ip,
-                'mac': '',
+                'mac': mac,
                 'vendor': 'Unknown',
                 'status': 'active',
                 'ports': [],
@@ -154,87 +314,333 @@ class NetworkScanner:
             }
 
             # First try simple TCP connection to common ports
-            common_ports = [80, 443, 22, 445]
-            open_ports = []
-            for port in common_ports:
-                try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(1)
-                    if sock.connect_ex((ip, port)) == 0:
-                        open_ports.append(port)
-                    sock.close()
-                except:
-                    continue
+            standalone = open_ports is None
+            if open_ports is None:
+                open_ports = self._probe_common_ports(ip)
 
             if open_ports:
-                result['ports'] = open_ports
+                result['ports'] = list(open_ports)
 
-            # Try to get hostname
-            try:
-                hostname = socket.gethostbyaddr(ip)[0]
-                result['hostname'] = hostname
-            except:
-                pass
+            # Hostname from the resolver cache, normally filled by the batched stage
+            result['hostname'] = self._hostname(ip)
 
-            # Use nmap for more detailed scan
-            try:
-                self.nm.scan(ip, arguments='-sn -sP -T4')
-                if ip in self.nm.all_hosts():
-                    host = self.nm[ip]
-                    if 'addresses' in host:
-                        addrs = host['addresses']
-                        if 'mac' in addrs:
-                            result['mac'] = addrs['mac']
-                            if 'vendor' in host and addrs['mac'] in host['vendor']:
-                                result['vendor'] = host['vendor'][addrs['mac']]
-
-                # Additional port scan if initial connection was successful
+            # Merge the batched nmap results, or run nmap for this host alone
+            if nmap_info is None and self.backend is not None:
+                nmap_info = self.backend.fingerprint([ip], {ip: open_ports}).get(ip, {})
+            elif nmap_info is None:
+                nmap_info = self.nmap.discover([ip]).get(ip, {})
                 if open_ports:
-                    self.nm.scan(ip, arguments='-sS -p 20-1024 -T4 --host-timeout 10')
-                    if ip in self.nm.all_hosts() and 'tcp' in self.nm[ip]:
-                        result['ports'].extend([
-                            port for port, data in self.nm[ip]['tcp'].items()
-                            if data['state'] == 'open' and port not in result['ports']
-                        ])
-            except Exception as e:
-                print(f"Nmap scan error for {ip}: {e}")
+                    port_info = self.nmap.port_scan([ip]).get(ip, {})
+                    nmap_info = dict(nmap_info, ports=port_info.get('ports', []))
+            if nmap_info.get('mac'):
+                result['mac'] = nmap_info['mac']
+                if nmap_info.get('vendor'):
+                    result['vendor'] = nmap_info['vendor']
+            if not result['hostname'] and nmap_info.get('hostname'):
+                result['hostname'] = nmap_info['hostname']
+            result['ports'].extend(
+                port for port in nmap_info.get('ports', []) if port not in result['ports']
+            )
+
+            # Resolve the vendor offline when nmap did not report one
+            if result['mac'] and result['vendor'] == 'Unknown':
+                result['vendor'] = lookup_vendor(result['mac']) or 'Unknown'
 
-            return result if (result['mac'] or result['ports']) else None
+            # Outside the batched pipeline, read the service banners of this host alone
+            if standalone and result['ports']:
+                services = self._grab_banners({ip: result['ports']}).get(ip)
+                if services:
+                    result['services'] = services
+
+            # Hosts from the batched stages already answered ARP or a ping sweep
+            return result if (result['mac'] or result['ports'] or not standalone) else None
 
         except Exception as e:
             print(f"Error scanning {ip}: {str(e)}")
             return None
 
-    def scan_network(self) -> List[Dict]:
-        """Scan network using multiple methods"""
-        all_devices = []
-        
+    def _arp_sweep_all(self) -> Dict[str, Dict[str, str]]:
+        """ARP sweep every range concurrently"""
+        ranges = self.network_ranges
+        if len(ranges) <= 1:
+            return {r: self._scan_ip_range_arp(r) for r in ranges}
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            return dict(zip(ranges, executor.map(self._scan_ip_range_arp, ranges)))
+
+    def _probe_ports(self, ips: Set[str]) -> Dict[str, List[int]]:
+        """Probe the common ports on every host with the configured engine"""
+        if not ips:
+            return {}
+        if self.engine == 'async' and self.backend is not None:
+            return self.backend.probe_ports(ips, self.COMMON_PORTS)
+        if self.engine == 'async':
+            return self.port_scanner.scan_hosts(ips, self.COMMON_PORTS)
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            return dict(zip(ips, executor.map(self._probe_common_ports, ips)))
+
+    def _plan_ports(self, arp_results: Dict[str, str]) -> Dict[str, Tuple[Optional[str], List[int]]]:
+        """Device type and port selector probe list of every host"""
+        records = self.inventory.get_many(arp_results) if self.inventory is not None else {}
+        plan = {}
+        for ip, mac in arp_results.items():
+            record = records.get(ip)
+            if record is not None and mac and record.get('mac') and mac.lower() != record['mac'].lower():
+                record = None  # Another device holds the address now
+            device_type = self.port_selector.host_type(ip, mac, record)
+            known = (record.get('ports') or ()) if record is not None else ()
+            plan[ip] = (device_type, self.port_selector.probe_list(ip, device_type, known))
+        return plan
+
+    def _probe_targets(self, targets: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        """Probe each host's own port list with the configured engine"""
+        if not targets:
+            return {}
+        if self.engine == 'async' and self.backend is not None:
+            return self.backend.probe_targets(targets)
+        if self.engine == 'async':
+            return self.port_scanner.scan_targets(targets)
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            return dict(zip(targets, executor.map(self._probe_common_ports, targets, targets.values())))
+
+    def _record_ports(self, plan: Dict[str, Tuple[Optional[str], List[int]]], port_results: Dict[str, List[int]],
+                      nmap_results: Dict[str, Dict], deep_ports: Optional[List[int]]):
+        """Feed the probe and deep scan outcomes of every planned host back to the port selector"""
+        trials = []
+        for ip, (device_type, ports) in plan.items():
+            trials.append((ip, device_type, ports, port_results.get(ip, [])))
+            if deep_ports is not None and port_results.get(ip) and ip in nmap_results:
+                trials.append((ip, device_type, deep_ports, nmap_results[ip].get('ports', [])))
+        try:
+            self.port_selector.record(trials)
+        except Exception as e:
+            print(f"Port statistics error: {e}")
+
+    def _resolve_hostnames(self, ips: Set[str]) -> Dict[str, str]:
+        """Batched reverse-DNS lookup of every host, warming the resolver cache"""
+        try:
+            if self.backend is None:
+                return self.resolver.resolve_many(ips)
+            hostnames = self.backend.resolve_hostnames(ips)
+            for ip, hostname in hostnames.items():
+                self.resolver.cache.put(ip, hostname, self.resolver.min_ttl)
+            return hostnames
+        except Exception as e:
+            print(f"Hostname resolution error: {e}")
+            return {}
+
+    def _hostname(self, ip: str) -> str:
+        """Hostname of one host, from the resolver cache when the batched stage filled it"""
+        if self.backend is None:
+            return self.resolver.resolve(ip)
+        hostname = self.resolver.cache.get(ip)
+        if hostname is None:
+            hostname = self.backend.resolve_hostnames([ip]).get(ip, '')
+            self.resolver.cache.put(ip, hostname, self.resolver.min_ttl)
+        return hostname
+
+    def _deep_ports(self) -> Optional[List[int]]:
+        """Ports of the deep scan; None for nmap's well-known range"""
+        return self.port_selector.deep_ports() if self.port_selector is not None else None
+
+    def _nmap_stage(self, ips: Set[str], port_results: Dict[str, List[int]]) -> Dict[str, Dict]:
+        """Batched nmap discovery plus a deep port scan of hosts with open ports"""
+        deep_ports = self._deep_ports()
+        if ips and self.backend is not None:
+            if deep_ports is None:
+                return self.backend.fingerprint(ips, port_results)
+            return self.backend.fingerprint(ips, port_results, deep_ports)
+        if not ips or not self.nmap.available:
+            return {}
+        results = self.nmap.discover(ips)
+        deep_ips = [ip for ip in ips if port_results.get(ip)]
+        for ip, info in self.nmap.port_scan(deep_ips, deep_ports).items():
+            results.setdefault(ip, {})['ports'] = info['ports']
+        return results
+
+    def _grab_banners(self, targets: Dict[str, List[int]]) -> Dict[str, List[Dict]]:
+        """Concurrent banner grab of every open port, returning the matched services per host"""
+        if self.banner_grabber is None:
+            return {}
+        try:
+            if self.backend is not None:
+                return self.backend.grab_banners({ip: ports for ip, ports in targets.items() if ports})
+            return self.banner_grabber.grab_many({ip: ports for ip, ports in targets.items() if ports})
+        except Exception as e:
+            print(f"Banner grabbing error: {e}")
+            return {}
+
+    def fingerprint_hosts(self, arp_results: Dict[str, str], progress: Callable[[str, int], None] = None,
+                          should_stop: Callable[[], bool] = None, timer: ScanTimer = None) -> Iterator[Dict]:
+        """Port, hostname, nmap and banner stages over ARP-discovered hosts, then per-host fingerprinting
+
+        arp_results maps each IP to its MAC. progress, if given, receives the
+        next stage name and how many of these hosts are done; should_stop is
+        polled between stages and hosts. Every result is recorded in the
+        inventory as it is yielded. Each stage is a span of timer.
+        """
+        timer = timer if timer is not None else ScanTimer()
+        def report(stage, done):
+            if progress:
+                progress(stage, done)
+
+        active_ips = set(arp_results)
+        if self.inventory is not None:
+            # Hosts that moved update their old record rather than leave it behind
+            self.inventory.relocate(arp_results)
+
+        # Probe common ports on all hosts before fingerprinting, resolving names meanwhile
+        plan = None
+        with ThreadPoolExecutor(max_workers=1) as dns_executor:
+            hostnames = dns_executor.submit(timer.timed('dns', self._resolve_hostnames), active_ips)
+            with timer.span('tcp_probe'):
+                if self.port_selector is not None:
+                    plan = self._plan_ports(arp_results)
+                    port_results = self._probe_targets({ip: ports for ip, (_, ports) in plan.items()})
+                else:
+                    port_results = self._probe_ports(active_ips)
+            hostnames.result()
+        report('nmap', 0)
+        if should_stop and should_stop():
+            return
+
+        # One nmap discovery run for the range, one port scan for hosts with open ports
+        with timer.span('nmap'):
+            nmap_results = self._nmap_stage(active_ips, port_results)
+        if plan is not None:
+            self._record_ports(plan, port_results, nmap_results, self._deep_ports())
+
+        # Banners from every port either stage found open
+        with timer.span('banners'):
+            services = self._grab_banners({
+                ip: sorted(set(port_results.get(ip, [])) | set(nmap_results.get(ip, {}).get('ports', [])))
+                for ip in active_ips
+            })
+        report('hosts', 0)
+
+        # Scan discovered IPs in parallel
+        done = 0
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            future_to_ip = {
+                executor.submit(timer.timed('host', self._scan_ip), ip, port_results.get(ip, []),
+                                nmap_results.get(ip, {}), mac=arp_results[ip]): ip
+                for ip in active_ips
+            }
+            for future in as_completed(future_to_ip):
+                if should_stop and should_stop():
+                    for pending in future_to_ip:
+                        pending.cancel()
+                    return
+                done += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error processing scan result: {str(e)}")
+                    result = None
+                if result:
+                    if services.get(result['ip']):
+                        result['services'] = services[result['ip']]
+                    if self.identifier is not None:
+                        result['type'] = self.identifier.identify_device(result)
+                    if self.inventory is not None:
+                        self.inventory.upsert(result)
+                    print(f"Added device: {result['ip']} ({result.get('vendor', 'Unknown')})")
+                    timer.count('hosts_fingerprinted')
+                    yield result
+                report('hosts', done)
+
+    def liveness_sweep(self) -> Dict[str, str]:
+        """ARP sweep of every range, merged into one IP to MAC map"""
+        alive = {}
+        with span('arp'):
+            sweeps = self._arp_sweep_all()
+        for arp_results in sweeps.values():
+            alive.update(arp_results)
+        return alive
+
+    def iter_scan_network(self, progress_callback: Callable[[Dict], None] = None,
+                          mode: str = None, should_stop: Callable[[], bool] = None,
+                          timer: ScanTimer = None) -> Iterator[Dict]:
+        """Scan network using multiple methods, yielding each device as soon as it is fingerprinted
+
+        progress_callback, if given, receives a dict with the current range,
+        stage, and completed/total host counts after every stage and host.
+        mode overrides the scanner's default 'full' or 'delta' mode.
+        should_stop is polled between stages and hosts; once it returns
+        True the scan stops without starting further work.
+        timer, if given, collects the scan's stage spans and host counts.
+        """
+        mode = mode or self.mode
+        timer = timer if timer is not None else ScanTimer()
+        if mode == 'delta' and self.inventory is None:
+            raise ValueError("Delta scans need a device inventory")
+
+        def report(network_range, stage, completed, total):
+            if progress_callback:
+                progress_callback({
+                    'range': network_range,
+                    'stage': stage,
+                    'completed': completed,
+                    'total': total,
+                })
+
+        device_count = 0
         try:
             for network_range in self.network_ranges:
+                report(network_range, 'arp', 0, 0)
+            with timer.span('arp'):
+                arp_sweeps = self._arp_sweep_all()
+
+            for network_range in self.network_ranges:
+                if should_stop and should_stop():
+                    print("Scan cancelled")
+                    return
                 print(f"\nScanning range: {network_range}")
-                active_ips = set()
-                
-                # ARP scan for initial device discovery
-                arp_ips = self._scan_ip_range_arp(network_range)
-                active_ips.update(arp_ips)
-                print(f"ARP scan found {len(arp_ips)} devices")
-
-                # Scan discovered IPs in parallel
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    future_to_ip = {executor.submit(self._scan_ip, ip): ip for ip in active_ips}
-                    for future in as_completed(future_to_ip):
-                        try:
-                            result = future.result()
-                            if result:
-                                all_devices.append(result)
-                                print(f"Added device: {result['ip']} ({result.get('vendor', 'Unknown')})")
-                        except Exception as e:
-                            print(f"Error processing scan result: {str(e)}")
-
-            print(f"\nTotal devices found: {len(all_devices)}")
-            return all_devices
+
+                # ARP scan for initial device discovery, already run for all ranges at once
+                arp_results = arp_sweeps[network_range]
+                print(f"ARP scan found {len(arp_results)} devices")
+                total = len(arp_results)
+                timer.count('hosts_discovered', total)
+
+                # Delta mode serves unchanged hosts straight from the inventory
+                completed = 0
+                if mode == 'delta':
+                    arp_results, cached = self.inventory.plan_delta(arp_results)
+                    print(f"Delta scan: {len(cached)} unchanged, {len(arp_results)} to fingerprint")
+                    timer.count('hosts_cached', len(cached))
+                    for device in cached:
+                        device['status'] = 'active'
+                        completed += 1
+                        device_count += 1
+                        yield device
+                report(network_range, 'ports', completed, total)
+
+                for result in self.fingerprint_hosts(
+                        arp_results, should_stop=should_stop, timer=timer,
+                        progress=lambda stage, done: report(network_range, stage, completed + done, total)):
+                    device_count += 1
+                    yield result
+                if should_stop and should_stop():
+                    print("Scan cancelled")
+                    return
+
+            print(f"\nTotal devices found: {device_count}")
 
         except Exception as e:
             print(f"Scan error: {str(e)}")
             traceback.print_exc()
-            return []
\ No newline at end of file
+
+    def probe_stats(self) -> Dict:
+        """Achieved probe rates, loss and congestion limits per probe type"""
+        return self.rate_limiter.snapshot()
+
+    def scan_network(self, mode: str = None, budget: float = None) -> List[Dict]:
+        """Scan network using multiple methods.
+
+        With a budget in seconds, hosts are fingerprinted in priority order
+        until it runs out (ScheduledScan); the rest come back with
+        'complete': False.
+        """
+        if budget is not None:
+            return list(ScheduledScan(self, budget, mode=mode))
+        return list(self.iter_scan_network(mode=mode))
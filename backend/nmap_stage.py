@@ -0,0 +1,125 @@
+import re
+import shutil
+import subprocess
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+try:
+    from .rate_control import ProbeMetrics
+except ImportError:
+    from rate_control import ProbeMetrics
+
+DISCOVERY_ARGUMENTS = '-sn -T4'
+PORT_SCAN_ARGUMENTS = '-sS -p 20-1024 -T4 --host-timeout 10s'
+PORT_LIST_SCAN_ARGUMENTS = '-sS -p {ports} -T4 --host-timeout 10s'
+
+# nmap echoes its command line into a comment, and "--" options make that invalid XML
+_XML_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+
+
+def parse_nmap_xml(xml_output: str) -> Dict[str, Dict]:
+    """Parse nmap -oX output into per-host results keyed by IPv4 address"""
+    hosts = {}
+    root = ET.fromstring(_XML_COMMENT.sub('', xml_output))
+    for host in root.iter('host'):
+        status = host.find('status')
+        if status is not None and status.get('state') != 'up':
+            continue
+
+        result = {'mac': '', 'vendor': '', 'hostname': '', 'ports': []}
+        ip = None
+        for addr in host.findall('address'):
+            if addr.get('addrtype') == 'ipv4':
+                ip = addr.get('addr')
+            elif addr.get('addrtype') == 'mac':
+                result['mac'] = addr.get('addr', '')
+                result['vendor'] = addr.get('vendor', '')
+        if ip is None:
+            continue
+
+        hostname = host.find('hostnames/hostname')
+        if hostname is not None:
+            result['hostname'] = hostname.get('name', '')
+
+        for port in host.findall('ports/port'):
+            state = port.find('state')
+            if port.get('protocol') == 'tcp' and state is not None and state.get('state') == 'open':
+                result['ports'].append(int(port.get('portid')))
+
+        hosts[ip] = result
+    return hosts
+
+
+class NmapBatchScanner:
+    """Run nmap once per batch of hosts and parse its XML a single time"""
+
+    def __init__(self, nmap_path: str = 'nmap', max_processes: int = 2,
+                 chunk_size: int = 256, process_timeout: int = 600, max_rate: int = None,
+                 metrics: ProbeMetrics = None):
+        self.nmap_path = shutil.which(nmap_path)
+        self.max_processes = max_processes
+        self.chunk_size = chunk_size
+        self.process_timeout = process_timeout
+        # Packets per second for each nmap process (--max-rate); None leaves -T4 timing alone
+        self.max_rate = max_rate
+        self.metrics = metrics
+        # Shared across every caller so concurrent ranges stay within the bound
+        self._process_slots = threading.BoundedSemaphore(max_processes)
+
+    @property
+    def available(self) -> bool:
+        return self.nmap_path is not None
+
+    def _run(self, ips: List[str], arguments: str) -> Dict[str, Dict]:
+        """Run a single nmap process over a list of targets"""
+        command = [self.nmap_path, '-oX', '-', '-iL', '-'] + arguments.split()
+        if self.max_rate:
+            command += ['--max-rate', str(self.max_rate)]
+        with self._process_slots:
+            try:
+                proc = subprocess.run(command, input='\n'.join(ips), capture_output=True,
+                                      text=True, timeout=self.process_timeout)
+            except subprocess.TimeoutExpired:
+                print(f"Nmap timed out on a batch of {len(ips)} hosts")
+                return {}
+        if proc.returncode != 0 and not proc.stdout:
+            print(f"Nmap failed: {proc.stderr.strip()}")
+            return {}
+        try:
+            hosts = parse_nmap_xml(proc.stdout)
+        except ET.ParseError as e:
+            print(f"Failed to parse nmap output: {e}")
+            return {}
+        if self.metrics is not None:
+            # nmap handles its own retransmissions, so only targets and responders are known
+            self.metrics.record(sent=len(ips), answered=len(hosts))
+        return hosts
+
+    def scan(self, ips: Iterable[str], arguments: str) -> Dict[str, Dict]:
+        """Scan all hosts with as few nmap processes as the chunk size allows"""
+        ips = sorted(set(ips), key=lambda ip: tuple(int(part) for part in ip.split('.')))
+        if not ips or not self.available:
+            return {}
+
+        chunks = [ips[i:i + self.chunk_size] for i in range(0, len(ips), self.chunk_size)]
+        results = {}
+        if len(chunks) == 1:
+            results.update(self._run(chunks[0], arguments))
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.max_processes) as executor:
+            for chunk_result in executor.map(lambda chunk: self._run(chunk, arguments), chunks):
+                results.update(chunk_result)
+        return results
+
+    def discover(self, ips: Iterable[str]) -> Dict[str, Dict]:
+        """Host discovery pass: MAC address, vendor and hostname per host"""
+        return self.scan(ips, DISCOVERY_ARGUMENTS)
+
+    def port_scan(self, ips: Iterable[str], ports: Iterable[int] = None) -> Dict[str, Dict]:
+        """SYN scan of the well-known port range, or of ports when given"""
+        if ports is None:
+            return self.scan(ips, PORT_SCAN_ARGUMENTS)
+        return self.scan(ips, PORT_LIST_SCAN_ARGUMENTS.format(ports=','.join(str(p) for p in sorted(ports))))
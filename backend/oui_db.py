@@ -0,0 +1,224 @@
+"""
+Offline IEEE OUI vendor database.
+
+The MA-L (24-bit), MA-M (28-bit) and MA-S (36-bit) registries are compiled
+into a compact sorted binary file that is memory-mapped on first use and
+binary-searched, so vendor lookups need neither nmap nor a parsed copy of
+the registry in memory.
+
+File layout (little-endian):
+    header   8s magic, uint32 record count, uint32 string table offset
+    records  count x (uint64 key, uint32 string offset), sorted by key,
+             where key = (prefix bits of the MAC as a 48-bit int) << 8 | prefix length
+    strings  uint8 length + UTF-8 vendor name, deduplicated
+
+Rebuild the bundled file from the IEEE CSV exports with:
+    python -m backend.oui_db build oui.csv mam.csv oui36.csv
+"""
+import argparse
+import csv
+import mmap
+import os
+import re
+import struct
+import threading
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Tuple
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'oui.bin')
+
+MAGIC = b'OUIDB\x01\x00\x00'
+_HEADER = struct.Struct('<8sII')
+_RECORD = struct.Struct('<QI')
+PREFIX_LENGTHS = (36, 28, 24)  # most specific first
+
+_IEEE_REGISTRY_BITS = {'MA-L': 24, 'MA-M': 28, 'MA-S': 36, 'IAB': 36}
+_HEX_DIGITS = re.compile(r'[0-9a-fA-F]')
+
+
+def mac_to_int(mac: str) -> Optional[int]:
+    """48-bit integer for a MAC address; partial prefixes are zero-padded"""
+    digits = ''.join(_HEX_DIGITS.findall(mac))[:12]
+    if not digits:
+        return None
+    return int(digits.ljust(12, '0'), 16)
+
+
+def _prefix_key(value: int, bits: int) -> int:
+    mask = ((1 << bits) - 1) << (48 - bits)
+    return ((value & mask) << 8) | bits
+
+
+def _read_ieee_csv(path: str) -> Iterator[Tuple[int, int, str]]:
+    """Entries from an IEEE registry export (oui.csv, mam.csv, oui36.csv, iab.csv)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            bits = _IEEE_REGISTRY_BITS.get(row.get('Registry', ''))
+            assignment = row.get('Assignment', '')
+            if bits is None or not assignment:
+                continue
+            yield int(assignment.ljust(12, '0'), 16), bits, row['Organization Name'].strip()
+
+
+def _read_manuf(path: str) -> Iterator[Tuple[int, int, str]]:
+    """Entries from a Wireshark-style manuf file, restricted to 24/28/36-bit assignments"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 2:
+                continue
+            address, _, bits = fields[0].partition('/')
+            bits = int(bits) if bits else 24
+            if bits not in PREFIX_LENGTHS or (bits == 24 and len(address) != 8):
+                continue
+            name = fields[2] if len(fields) > 2 and fields[2] else fields[1]
+            yield mac_to_int(address), bits, name.strip()
+
+
+def read_registry(path: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (48-bit prefix, prefix length, vendor) from an IEEE CSV or manuf file"""
+    with open(path, encoding='utf-8') as f:
+        first_line = f.readline()
+    if first_line.startswith('Registry,'):
+        return _read_ieee_csv(path)
+    return _read_manuf(path)
+
+
+def compile_registry(entries: Iterable[Tuple[int, int, str]], output_path: str) -> int:
+    """Write entries to the binary format; returns the number of records"""
+    records = {}
+    for prefix, bits, name in entries:
+        records[_prefix_key(prefix, bits)] = name
+
+    strings = bytearray()
+    offsets = {}
+    table = []
+    for key in sorted(records):
+        name = records[key]
+        if name not in offsets:
+            encoded = name.encode('utf-8')[:255]
+            offsets[name] = len(strings)
+            strings.append(len(encoded))
+            strings.extend(encoded)
+        table.append(_RECORD.pack(key, offsets[name]))
+
+    strings_offset = _HEADER.size + len(table) * _RECORD.size
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(table), strings_offset))
+        f.writelines(table)
+        f.write(strings)
+    return len(table)
+
+
+class OUIDatabase:
+    """Memory-mapped vendor lookup by 36, 28 and 24-bit MAC prefix"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._map = None
+        self._count = 0
+        self._strings_offset = 0
+        self._failed = False
+        self._lock = threading.Lock()
+        self.lookup = lru_cache(maxsize=16384)(self._lookup)
+
+    def _open(self):
+        """Map the database file; a missing or corrupt file disables lookups"""
+        with self._lock:
+            if self._map is not None or self._failed:
+                return
+            try:
+                with open(self.path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                print(f"OUI database unavailable: {e}")
+                self._failed = True
+                return
+            magic, count, strings_offset = _HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                data.close()
+                print(f"OUI database unavailable: {self.path} is not an OUI database")
+                self._failed = True
+                return
+            self._count = count
+            self._strings_offset = strings_offset
+            self._map = data
+
+    def __len__(self) -> int:
+        self._open()
+        return self._count
+
+    def _find(self, key: int) -> Optional[int]:
+        """Binary search for an exact key, returning its string offset"""
+        data = self._map
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, offset = _RECORD.unpack_from(data, _HEADER.size + mid * _RECORD.size)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return offset
+        return None
+
+    def _lookup(self, mac: str) -> Optional[str]:
+        value = mac_to_int(mac)
+        if value is None:
+            return None
+        if self._map is None:
+            self._open()
+            if self._map is None:
+                return None
+        for bits in PREFIX_LENGTHS:
+            offset = self._find(_prefix_key(value, bits))
+            if offset is not None:
+                start = self._strings_offset + offset
+                length = self._map[start]
+                return self._map[start + 1:start + 1 + length].decode('utf-8', 'replace')
+        return None
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+        self.lookup.cache_clear()
+
+
+_default_db = None
+
+
+def lookup_vendor(mac: str) -> Optional[str]:
+    """Vendor for a MAC address from the bundled database, or None if unknown"""
+    global _default_db
+    if _default_db is None:
+        _default_db = OUIDatabase()
+    return _default_db.lookup(mac)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the OUI vendor database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='compile IEEE CSV or manuf files')
+    build.add_argument('sources', nargs='+')
+    build.add_argument('-o', '--output', default=DEFAULT_DB_PATH)
+    query = subparsers.add_parser('lookup', help='look up MAC addresses')
+    query.add_argument('macs', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        entries = (entry for source in args.sources for entry in read_registry(source))
+        count = compile_registry(entries, args.output)
+        print(f"Wrote {count} prefixes to {args.output}")
+    else:
+        for mac in args.macs:
+            print(f"{mac}\t{lookup_vendor(mac) or 'Unknown'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,711 @@
+"""
+Passive host discovery from captured traffic.
+
+PassiveDiscovery builds device records (ip, mac, vendor, hostname,
+inferred ports and services) from traffic hosts send on their own,
+without sending a single probe:
+
+    ARP        sender IP and MAC of every request and reply
+    DHCP       client MAC, leased IP, hostname (option 12/81)
+               and vendor class (option 60); servers answer on port 67
+    mDNS       A records name their sender, SRV/TXT records advertise its
+               services, ports and model
+    SSDP       NOTIFY and search replies carry the SERVER header and the
+               LOCATION port of the UPnP description
+    NetBIOS    name registrations, query responses and datagram source
+               names give Windows and Samba hostnames
+
+Frames come from pcap or pcapng files (read_capture) or from a live
+AF_PACKET socket with a BPF filter that only passes ARP and those UDP
+ports (LiveCapture), so the kernel drops everything else before it is
+copied to user space.
+
+Memory is bounded whatever the capture size: files are streamed, at
+most max_hosts devices are kept (least recently seen go first), each
+with a capped number of ports and services, and at most max_repeats
+frame hashes are remembered. Frames are classified from the link and IP
+headers alone and only the discovery protocols are decoded; a frame
+identical to one decoded before only refreshes its hosts' last_seen.
+On one core that reads about 550k packets/s (45 MB/s) from a capture of
+mostly other traffic and 220k packets/s (60 MB/s) from one of discovery
+traffic only, so a 1 GB pcap takes 15 to 25 seconds in about 15 MiB
+(benchmarks/bench_passive.py).
+
+PassiveBackend serves the records through the ScanBackend interface, so
+NetworkScanner(backend=PassiveBackend(discovery)) turns them into the
+usual device records and inventory entries at zero probe cost.
+"""
+import argparse
+import ctypes
+import ipaddress
+import json
+import socket
+import struct
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    from .hostname_resolver import _read_name
+    from .oui_db import lookup_vendor
+    from .scan_backends import ScanBackend
+except ImportError:
+    from hostname_resolver import _read_name
+    from oui_db import lookup_vendor
+    from scan_backends import ScanBackend
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+
+DHCP_PORTS = (67, 68)
+MDNS_PORT = 5353
+SSDP_PORT = 1900
+NBNS_PORT = 137
+NBDS_PORT = 138
+DISCOVERY_PORTS = DHCP_PORTS + (NBNS_PORT, NBDS_PORT, SSDP_PORT, MDNS_PORT)
+
+# Lower ranks win when several protocols name the same host
+HOSTNAME_RANKS = {'dhcp': 0, 'mdns': 1, 'netbios': 2}
+
+Frame = Tuple[float, int, bytes]  # (timestamp, link type, frame)
+
+_PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6), b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9), b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+_PCAPNG_SHB = b'\x0a\x0d\x0d\x0a'
+_READ_SIZE = 1 << 20
+# Longest frame read from a capture file (tcpdump's default snaplen); a pcap record over it is corrupt
+MAX_SNAPLEN = 262144
+_MAX_BLOCK = 1 << 24
+
+
+def _read_pcap(f: BinaryIO, header: bytes) -> Iterator[Frame]:
+    order, resolution = _PCAP_MAGIC[header[:4]]
+    linktype = struct.unpack(order + 'I', header[20:24])[0] & 0x0fffffff
+    record = struct.Struct(order + 'IIII')
+    read = f.read
+    while True:
+        head = read(16)
+        if len(head) < 16:
+            return
+        seconds, fraction, captured, _ = record.unpack(head)
+        if captured > MAX_SNAPLEN:
+            return
+        frame = read(captured)
+        if len(frame) < captured:
+            return
+        yield seconds + fraction * resolution, linktype, frame
+
+
+def _read_pcapng(f: BinaryIO, first: bytes) -> Iterator[Frame]:
+    order = '<'
+    interfaces: List[Tuple[int, float]] = []
+    read = f.read
+    head = first
+    while len(head) == 8:
+        block_type, length = struct.unpack(order + 'II', head)
+        if block_type == 0x0A0D0D0A:
+            # A new section may switch byte order; its interfaces replace the old ones
+            magic = read(4)
+            if magic == b'\x4d\x3c\x2b\x1a':
+                order = '<'
+            elif magic == b'\x1a\x2b\x3c\x4d':
+                order = '>'
+            else:
+                return
+            length = struct.unpack(order + 'I', head[4:])[0]
+            if length < 28 or length % 4 or length > _MAX_BLOCK or len(read(length - 12)) < length - 12:
+                return
+            interfaces = []
+        else:
+            # Every block is at least its type and two lengths, padded to 32 bits; anything else is corrupt
+            if length < 12 or length % 4 or length > _MAX_BLOCK:
+                return
+            body = read(length - 8)
+            if len(body) < length - 8:
+                return
+            if block_type == 6 and length >= 32:  # enhanced packet block
+                iface, high, low, captured = struct.unpack_from(order + 'IIII', body)
+                if iface < len(interfaces):
+                    linktype, resolution = interfaces[iface]
+                    captured = min(captured, length - 32, MAX_SNAPLEN)
+                    yield ((high << 32) | low) * resolution, linktype, body[20:20 + captured]
+            elif block_type == 3 and length >= 16 and interfaces:  # simple packet block
+                captured = min(struct.unpack_from(order + 'I', body)[0], length - 16, MAX_SNAPLEN)
+                yield 0.0, interfaces[0][0], body[4:4 + captured]
+            elif block_type == 1 and length >= 20:  # interface description block
+                interfaces.append((struct.unpack_from(order + 'H', body)[0], _if_tsresol(body, order)))
+        head = read(8)
+
+
+def _if_tsresol(body: bytes, order: str) -> float:
+    """Timestamp unit of an interface description block, from its if_tsresol option"""
+    offset = 8
+    while offset + 4 <= len(body) - 4:
+        code, length = struct.unpack_from(order + 'HH', body, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = body[offset + 4]
+            return 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def read_capture(path: str) -> Iterator[Frame]:
+    """(timestamp, link type, frame) of every packet in a pcap or pcapng file, streamed"""
+    with open(path, 'rb', buffering=_READ_SIZE) as f:
+        header = f.read(24)
+        if header[:4] in _PCAP_MAGIC:
+            yield from _read_pcap(f, header)
+        elif header[:4] == _PCAPNG_SHB:
+            f.seek(0)
+            yield from _read_pcapng(f, f.read(8))
+        else:
+            raise ValueError(f"{path} is not a pcap or pcapng file")
+
+
+def _mac(raw: bytes) -> str:
+    return raw.hex(':')
+
+
+def _netbios_name(encoded: bytes) -> Tuple[str, int]:
+    """(name, suffix) of a first-level encoded NetBIOS name"""
+    raw = bytes(((encoded[i] - 65) << 4) | (encoded[i + 1] - 65) for i in range(0, 32, 2))
+    return raw[:15].decode('ascii', 'replace').strip(), raw[15]
+
+
+def _local_name(name: str) -> str:
+    return name[:-len('.local')] if name.lower().endswith('.local') else name
+
+
+class PassiveHost:
+    __slots__ = ('mac', 'ip', 'hostnames', 'ports', 'services', 'sources', 'first_seen', 'last_seen')
+
+    def __init__(self, mac: str, now: float):
+        self.mac = mac
+        self.ip = ''
+        self.hostnames: Dict[str, str] = {}
+        self.ports: set = set()
+        self.services: Dict[Tuple[str, int], Dict] = {}
+        self.sources: set = set()
+        self.first_seen = now
+        self.last_seen = now
+
+    def hostname(self) -> str:
+        if not self.hostnames:
+            return ''
+        return min(self.hostnames.items(), key=lambda item: HOSTNAME_RANKS[item[0]])[1]
+
+    def to_device(self) -> Dict:
+        services = sorted(self.services.values(), key=lambda s: (s['port'], s['service']))
+        device = {
+            'ip': self.ip,
+            'mac': self.mac.upper(),
+            'vendor': lookup_vendor(self.mac) or 'Unknown',
+            'status': 'active',
+            'ports': sorted(self.ports),
+            'hostname': self.hostname(),
+            'sources': sorted(self.sources),
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+        }
+        if services:
+            device['services'] = services
+        return device
+
+
+# (MAC, field, key, value) a decoded frame set on a host
+Effect = Tuple[str, str, object, object]
+
+
+def _apply(host: PassiveHost, kind: str, key, value):
+    if kind == 'ip':
+        host.ip = value
+    elif kind == 'source':
+        host.sources.add(value)
+    elif kind == 'hostname':
+        host.hostnames[key] = value
+    elif kind == 'port':
+        host.ports.add(value)
+    else:
+        host.services[key] = value
+
+
+class PassiveDiscovery:
+    """Device records built from ARP, DHCP, mDNS, SSDP and NetBIOS frames.
+
+    Hosts are keyed by MAC address; one without an IP yet (a DHCP
+    DISCOVER) is kept until a later frame gives it one. At most
+    max_hosts are kept, evicting the least recently seen, each with at
+    most max_ports ports and max_services services.
+    """
+
+    def __init__(self, max_hosts: int = 65536, max_ports: int = 64, max_services: int = 32,
+                 max_repeats: int = 65536):
+        self.max_hosts = max_hosts
+        self.max_ports = max_ports
+        self.max_services = max_services
+        self.max_repeats = max_repeats
+        self.hosts: 'OrderedDict[str, PassiveHost]' = OrderedDict()
+        self.packets = 0
+        self.parsed = 0
+        self.repeats = 0
+        self.errors = 0
+        # Hash of a decoded frame (less its destination) -> what it set on which host
+        self._decoded: Dict[int, Tuple[Effect, ...]] = {}
+        self._effects: List[Effect] = []
+        self._udp = {67: self._dhcp, 68: self._dhcp, MDNS_PORT: self._mdns, SSDP_PORT: self._ssdp,
+                     NBNS_PORT: self._nbns, NBDS_PORT: self._nbds}
+
+    def _host(self, mac: str, ip: str, now: float, source: str) -> Optional[PassiveHost]:
+        """The host behind mac, seen now at ip; None for broadcast, multicast and unset addresses"""
+        if not mac or int(mac[:2], 16) & 1 or mac == '00:00:00:00:00:00':
+            return None
+        host = self.hosts.get(mac)
+        if host is None:
+            host = self.hosts[mac] = PassiveHost(mac, now)
+            if len(self.hosts) > self.max_hosts:
+                self.hosts.popitem(last=False)
+        else:
+            self.hosts.move_to_end(mac)
+            host.last_seen = max(host.last_seen, now)
+        if ip and ip != '0.0.0.0':
+            self._set(host, 'ip', None, ip)
+        self._set(host, 'source', None, source)
+        return host
+
+    def _set(self, host: PassiveHost, kind: str, key, value):
+        """Apply one field a frame sets, remembering it for when the frame repeats"""
+        _apply(host, kind, key, value)
+        self._effects.append((host.mac, kind, key, value))
+
+    def _repeat(self, key: int, now: float) -> bool:
+        """Re-apply a frame decoded before and timestamp its hosts; False when it must be decoded again.
+
+        Its fields are set again because another frame may have changed
+        them since, e.g. an IP or hostname that flips back.
+        """
+        effects = self._decoded.get(key)
+        if effects is None:
+            return False
+        hosts = self.hosts
+        for mac, _, _, _ in effects:
+            if mac not in hosts:
+                return False
+        for mac, kind, field, value in effects:
+            host = hosts[mac]
+            hosts.move_to_end(mac)
+            if now > host.last_seen:
+                host.last_seen = now
+            _apply(host, kind, field, value)
+        return True
+
+    def _add_port(self, host: PassiveHost, port: int):
+        if port and (port in host.ports or len(host.ports) < self.max_ports):
+            self._set(host, 'port', None, port)
+
+    def _add_service(self, host: PassiveHost, service: str, port: int, product: str = '', version: str = ''):
+        key = (service, port)
+        if key in host.services or len(host.services) < self.max_services:
+            self._set(host, 'service', key, {'service': service, 'product': product[:128], 'version': version,
+                                             'port': port, 'banner': ''})
+
+    def feed(self, frame: bytes, timestamp: float = 0.0, linktype: int = LINKTYPE_ETHERNET):
+        """Account one captured frame; anything that is not a discovery protocol is skipped"""
+        self.packets += 1
+        if linktype == LINKTYPE_ETHERNET:
+            if len(frame) < 14:
+                return
+            ethertype = (frame[12] << 8) | frame[13]
+            offset = 14
+            if ethertype == 0x8100 and len(frame) >= 18:
+                ethertype = (frame[16] << 8) | frame[17]
+                offset = 18
+            src_mac = frame[6:12]
+        elif linktype == LINKTYPE_LINUX_SLL:
+            # Ethernet hardware type with a 6-byte source address
+            if len(frame) < 16 or frame[2:6] != b'\x00\x01\x00\x06':
+                return
+            ethertype = (frame[14] << 8) | frame[15]
+            offset = 16
+            src_mac = frame[6:12]
+        else:
+            return
+
+        if ethertype == 0x0806:
+            handler, args = self._arp, (frame, offset)
+        elif ethertype == 0x0800 and len(frame) >= offset + 28 and frame[offset + 9] == 17:
+            # UDP, unfragmented; only the discovery ports are decoded further
+            if (frame[offset + 6] & 0x3f) or frame[offset + 7]:
+                return
+            udp = offset + (frame[offset] & 0x0f) * 4
+            if udp < offset + 20 or len(frame) < udp + 8:
+                return  # header length field points outside the frame
+            sport = (frame[udp] << 8) | frame[udp + 1]
+            dport = (frame[udp + 2] << 8) | frame[udp + 3]
+            handler = self._udp.get(sport) or self._udp.get(dport)
+            if handler is None:
+                return
+            src_ip = socket.inet_ntoa(frame[offset + 12:offset + 16])
+            args = (frame[udp + 8:], _mac(src_mac), src_ip, sport)
+        else:
+            return
+        # Announcements repeat verbatim; a frame seen before only refreshes its hosts
+        key = hash(frame[6:])
+        if self._repeat(key, timestamp):
+            self.repeats += 1
+            return
+        self._effects = []
+        try:
+            handler(*args, timestamp)
+            self.parsed += 1
+        except (IndexError, struct.error, ValueError, UnicodeDecodeError):
+            self.errors += 1  # truncated or malformed; keep going
+            return
+        if len(self._decoded) >= self.max_repeats:
+            self._decoded.clear()
+        self._decoded[key] = tuple(self._effects)
+
+    def feed_capture(self, frames: Iterable[Frame]) -> int:
+        """Feed every (timestamp, link type, frame); returns how many were read"""
+        count = 0
+        feed = self.feed
+        for timestamp, linktype, frame in frames:
+            feed(frame, timestamp, linktype)
+            count += 1
+        return count
+
+    def _arp(self, frame: bytes, offset: int, now: float):
+        if frame[offset:offset + 6] != b'\x00\x01\x08\x00\x06\x04':
+            return
+        sender_mac = _mac(frame[offset + 8:offset + 14])
+        sender_ip = socket.inet_ntoa(frame[offset + 14:offset + 18])
+        if sender_ip != '0.0.0.0':  # address conflict probes carry no sender IP
+            self._host(sender_mac, sender_ip, now, 'arp')
+
+    def _dhcp(self, payload: bytes, src_mac: str, src_ip: str, sport: int, now: float):
+        if len(payload) < 240 or payload[236:240] != b'\x63\x82\x53\x63' or payload[1:3] != b'\x01\x06':
+            return
+        op = payload[0]
+        options = {}
+        offset = 240
+        while offset < len(payload) and payload[offset] != 255:
+            code = payload[offset]
+            if code == 0:
+                offset += 1
+                continue
+            length = payload[offset + 1]
+            options[code] = payload[offset + 2:offset + 2 + length]
+            offset += 2 + length
+        message = options.get(53, b'\x00')[0]
+        client_mac = _mac(payload[28:34])
+        if op == 2:
+            if sport == 67:
+                server = self._host(src_mac, src_ip, now, 'dhcp')
+                if server is not None:
+                    self._add_port(server, 67)
+            # Only an ACK says the lease is in use
+            if message == 5:
+                self._host(client_mac, socket.inet_ntoa(payload[16:20]), now, 'dhcp')
+            return
+        # A DISCOVER or REQUEST names the client before it has an address; ciaddr is set on renewal
+        host = self._host(client_mac, socket.inet_ntoa(payload[12:16]), now, 'dhcp')
+        if host is None:
+            return
+        hostname = options.get(12, b'').decode('utf-8', 'replace').strip('\x00 ')
+        if not hostname and len(options.get(81, b'')) > 3:
+            hostname = options[81][3:].decode('utf-8', 'replace').strip('\x00 ').split('.')[0]
+        if hostname:
+            self._set(host, 'hostname', 'dhcp', hostname)
+        vendor_class = options.get(60, b'').decode('utf-8', 'replace').strip('\x00 ')
+        if vendor_class:
+            self._add_service(host, 'dhcp', 68, vendor_class)
+
+    def _mdns(self, payload: bytes, src_mac: str, src_ip: str, sport: int, now: float):
+        host = self._host(src_mac, src_ip, now, 'mdns')
+        if host is None or sport != MDNS_PORT:
+            return
+        flags, questions, answers, authority, additional = struct.unpack_from('!HHHHH', payload, 2)
+        if not flags & 0x8000:
+            return  # queries only say the sender is present
+        self._add_port(host, MDNS_PORT)
+        offset = 12
+        for _ in range(questions):
+            offset = _read_name(payload, offset)[1] + 4
+        srv: Dict[str, Tuple[int, str]] = {}
+        txt: Dict[str, Dict[str, str]] = {}
+        for _ in range(answers + authority + additional):
+            name, offset = _read_name(payload, offset)
+            rtype, _, _, length = struct.unpack_from('!HHIH', payload, offset)
+            offset += 10
+            rdata = payload[offset:offset + length]
+            if rtype == 1 and length == 4 and socket.inet_ntoa(rdata) == src_ip:
+                self._set(host, 'hostname', 'mdns', _local_name(name))
+            elif rtype == 33 and length > 6:
+                port = struct.unpack_from('!H', rdata, 4)[0]
+                srv[name] = (port, _read_name(payload, offset + 6)[0])
+            elif rtype == 16:
+                pairs = {}
+                i = 0
+                while i < length:
+                    item = rdata[i + 1:i + 1 + rdata[i]].decode('utf-8', 'replace')
+                    key, _, value = item.partition('=')
+                    pairs[key.lower()] = value
+                    i += 1 + rdata[i]
+                txt[name] = pairs
+            offset += length
+        for instance, (port, target) in srv.items():
+            # '<instance name>._ipp._tcp.local'
+            labels = instance.split('.')
+            if len(labels) < 4 or labels[-1].lower() != 'local':
+                continue
+            protocol = labels[-2]
+            service = labels[-3].lstrip('_')
+            pairs = txt.get(instance, {})
+            product = pairs.get('ty') or pairs.get('md') or pairs.get('model') or '.'.join(labels[:-3])
+            self._add_service(host, service, port, product)
+            if protocol == '_tcp':
+                self._add_port(host, port)
+            if 'mdns' not in host.hostnames and target:
+                self._set(host, 'hostname', 'mdns', _local_name(target))
+
+    def _ssdp(self, payload: bytes, src_mac: str, src_ip: str, sport: int, now: float):
+        host = self._host(src_mac, src_ip, now, 'ssdp')
+        if host is None:
+            return
+        lines = payload[:2048].decode('utf-8', 'replace').split('\r\n')
+        if not (lines[0].startswith('NOTIFY') or lines[0].startswith('HTTP/1.1 200')):
+            return  # an M-SEARCH comes from a control point, not a device
+        headers = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(':')
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+        self._add_port(host, SSDP_PORT)
+        port = SSDP_PORT
+        location = urlsplit(headers.get('location', ''))
+        try:
+            if location.hostname == src_ip and location.port:
+                port = location.port
+                self._add_port(host, port)
+        except ValueError:
+            pass
+        self._add_service(host, 'upnp', port, headers.get('server', ''))
+
+    def _nbns(self, payload: bytes, src_mac: str, src_ip: str, sport: int, now: float):
+        host = self._host(src_mac, src_ip, now, 'netbios')
+        if host is None:
+            return
+        flags, questions, answers, _, additional = struct.unpack_from('!HHHHH', payload, 2)
+        opcode = (flags >> 11) & 0x0f
+        response = flags & 0x8000
+        if payload[12] != 0x20:
+            return
+        name, suffix = _netbios_name(payload[13:45])
+        if response and answers:
+            record = 12 + 34
+        elif not response and opcode in (5, 8, 9) and questions and additional:
+            # Registrations and refreshes: the name is asked about, the address is in a record
+            record = 12 + 34 + 4
+            record += 2 if payload[record] >= 0xc0 else 34
+        else:
+            return
+        rtype, _, _, length = struct.unpack_from('!HHIH', payload, record)
+        if rtype != 0x20 or length < 6:
+            return
+        nb_flags = struct.unpack_from('!H', payload, record + 10)[0]
+        ip = socket.inet_ntoa(payload[record + 12:record + 16])
+        # Unique workstation or server names of the sender itself; group names are shared
+        if ip == src_ip and suffix in (0x00, 0x20) and not nb_flags & 0x8000:
+            self._add_port(host, NBNS_PORT)
+            self._set(host, 'hostname', 'netbios', name)
+
+    def _nbds(self, payload: bytes, src_mac: str, src_ip: str, sport: int, now: float):
+        host = self._host(src_mac, src_ip, now, 'netbios')
+        if host is None or payload[0] not in (0x10, 0x11, 0x12) or payload[14] != 0x20:
+            return
+        name, suffix = _netbios_name(payload[15:47])
+        if socket.inet_ntoa(payload[4:8]) == src_ip and suffix in (0x00, 0x20):
+            self._set(host, 'hostname', 'netbios', name)
+
+    def devices(self) -> List[Dict]:
+        """Device record of every host seen with an IP, the most recent one per IP"""
+        by_ip: Dict[str, PassiveHost] = {}
+        for host in self.hosts.values():
+            if host.ip and (host.ip not in by_ip or host.last_seen >= by_ip[host.ip].last_seen):
+                by_ip[host.ip] = host
+        return [by_ip[ip].to_device() for ip in sorted(by_ip, key=ipaddress.IPv4Address)]
+
+    def stats(self) -> Dict:
+        return {'packets': self.packets, 'parsed': self.parsed, 'repeats': self.repeats,
+                'errors': self.errors, 'hosts': len(self.hosts)}
+
+
+# Classic BPF opcodes
+_LD_H_ABS, _LD_B_ABS, _LD_H_IND, _LDX_B_MSH = 0x28, 0x30, 0x48, 0xb1
+_JEQ_K, _JSET_K, _RET_K = 0x15, 0x45, 0x06
+SO_ATTACH_FILTER = 26
+ETH_P_ALL = 0x0003
+
+
+def discovery_filter(ports: Iterable[int] = DISCOVERY_PORTS, snaplen: int = 2048) -> List[Tuple[int, int, int, int]]:
+    """Classic BPF program passing ARP and unfragmented IPv4 UDP from or to ports"""
+    ports = list(ports)
+    program = [
+        (_LD_H_ABS, 0, 0, 12),
+        (_JEQ_K, 'accept', 0, 0x0806),
+        (_JEQ_K, 0, 'reject', 0x0800),
+        (_LD_B_ABS, 0, 0, 23),
+        (_JEQ_K, 0, 'reject', 17),
+        (_LD_H_ABS, 0, 0, 20),
+        (_JSET_K, 'reject', 0, 0x3fff),
+        (_LDX_B_MSH, 0, 0, 14),
+    ]
+    for field in (14, 16):  # source port, then destination port
+        program.append((_LD_H_IND, 0, 0, field))
+        program.extend((_JEQ_K, 'accept', 0, port) for port in ports)
+    program.append((_RET_K, 0, 0, 0))
+    reject = len(program) - 1
+    program.append((_RET_K, 0, 0, snaplen))
+    accept = len(program) - 1
+
+    def offset(target, index):
+        return {'accept': accept, 'reject': reject}[target] - index - 1 if isinstance(target, str) else target
+    return [(code, offset(jt, i), offset(jf, i), k) for i, (code, jt, jf, k) in enumerate(program)]
+
+
+class LiveCapture:
+    """Discovery traffic from an AF_PACKET socket filtered in the kernel (Linux, needs CAP_NET_RAW)"""
+
+    def __init__(self, interface: str, program: List[Tuple[int, int, int, int]] = None,
+                 timeout: float = 0.5):
+        self.interface = interface
+        self.program = program if program is not None else discovery_filter()
+        self.timeout = timeout
+
+    @staticmethod
+    def supported() -> bool:
+        if not hasattr(socket, 'AF_PACKET'):
+            return False
+        try:
+            socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL)).close()
+            return True
+        except OSError:
+            return False
+
+    def _open(self) -> socket.socket:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        code = b''.join(struct.pack('HBBI', *instruction) for instruction in self.program)
+        buffer = ctypes.create_string_buffer(code)
+        fprog = struct.pack('HL', len(self.program), ctypes.addressof(buffer))
+        sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+        sock.bind((self.interface, ETH_P_ALL))
+        # Frames queued before the filter was attached may not match it
+        sock.setblocking(False)
+        try:
+            while sock.recv(65535):
+                pass
+        except OSError:
+            pass
+        sock.settimeout(self.timeout)
+        return sock
+
+    def frames(self, duration: float = None, should_stop=None) -> Iterator[Frame]:
+        """Frames passing the filter until duration elapses or should_stop() returns True"""
+        deadline = time.monotonic() + duration if duration is not None else None
+        sock = self._open()
+        try:
+            while not (should_stop and should_stop()):
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                try:
+                    frame = sock.recv(65535)
+                except socket.timeout:
+                    continue
+                yield time.time(), LINKTYPE_ETHERNET, frame
+        finally:
+            sock.close()
+
+
+class PassiveBackend(ScanBackend):
+    """NetworkScanner stages answered from a PassiveDiscovery: nothing is sent.
+
+    Open ports are those inferred from the traffic, whatever ports the
+    scanner asks about. Without network_ranges, the /24s of every host
+    seen are scanned.
+    """
+
+    def __init__(self, discovery: PassiveDiscovery, network_ranges: List[str] = None):
+        self.discovery = discovery
+        self._ranges = network_ranges
+        self._devices: Dict[str, Dict] = {}
+
+    def _current(self) -> Dict[str, Dict]:
+        return {device['ip']: device for device in self.discovery.devices()}
+
+    def network_ranges(self) -> List[str]:
+        if self._ranges is not None:
+            return list(self._ranges)
+        networks = {ipaddress.IPv4Network(f'{ip}/24', strict=False) for ip in self._current()}
+        return [str(network) for network in ipaddress.collapse_addresses(networks)]
+
+    def prepare(self):
+        self._devices = self._current()
+
+    def arp_sweep(self, ip_range: str) -> Dict[str, str]:
+        self._devices = self._current()
+        network = ipaddress.IPv4Network(ip_range, strict=False)
+        return {ip: device['mac'].lower() for ip, device in self._devices.items()
+                if ipaddress.IPv4Address(ip) in network}
+
+    def probe_ports(self, ips: Iterable[str], ports: List[int]) -> Dict[str, List[int]]:
+        return {ip: list(self._devices[ip]['ports']) if ip in self._devices else [] for ip in ips}
+
+    def resolve_hostnames(self, ips: Iterable[str]) -> Dict[str, str]:
+        return {ip: self._devices[ip]['hostname'] if ip in self._devices else '' for ip in ips}
+
+    def fingerprint(self, ips: Iterable[str], port_results: Dict[str, List[int]],
+                    ports: List[int] = None) -> Dict[str, Dict]:
+        return {ip: {key: self._devices[ip][key] for key in ('mac', 'vendor', 'hostname', 'ports')}
+                for ip in ips if ip in self._devices}
+
+    def grab_banners(self, targets: Dict[str, List[int]]) -> Dict[str, List[Dict]]:
+        return {ip: self._devices[ip]['services'] for ip in targets
+                if ip in self._devices and 'services' in self._devices[ip]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Passive device discovery from captures or live traffic')
+    parser.add_argument('captures', nargs='*', help='pcap or pcapng files')
+    parser.add_argument('-i', '--interface', help='capture live on this interface instead')
+    parser.add_argument('-d', '--duration', type=float, default=60, help='seconds of live capture')
+    args = parser.parse_args()
+    if not args.captures and not args.interface:
+        parser.error('give capture files or --interface')
+
+    try:
+        from .device_identifier import DeviceIdentifier
+    except ImportError:
+        from device_identifier import DeviceIdentifier
+    discovery = PassiveDiscovery()
+    started = time.perf_counter()
+    if args.interface:
+        discovery.feed_capture(LiveCapture(args.interface).frames(args.duration))
+    for path in args.captures:
+        discovery.feed_capture(read_capture(path))
+    elapsed = time.perf_counter() - started
+
+    identifier = DeviceIdentifier()
+    for device in discovery.devices():
+        device['type'] = identifier.identify_device(device)
+        print(json.dumps(device))
+    stats = discovery.stats()
+    print(f"{stats['packets']} packets, {stats['parsed']} parsed, {stats['hosts']} hosts "
+          f"in {elapsed:.2f}s ({stats['packets'] / max(elapsed, 1e-9):,.0f} packets/s)")
+
+
+if __name__ == '__main__':
+    main()
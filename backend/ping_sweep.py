@@ -0,0 +1,220 @@
+"""
+Batched ICMP and TCP liveness sweep for ranges ARP cannot reach.
+
+Hosts behind a router never see our ARP requests, so routed ranges are
+swept with an ICMP echo request plus TCP SYN pings (to syn_ports) and TCP
+ACK pings (to ack_ports) per address, all written in bulk through one raw
+socket per protocol while a single receiver thread reads replies from
+both.
+
+Probes are stateless. Each carries a cookie, a keyed hash of its target
+address, port and probe kind: in the echo payload, in the sequence number
+of a SYN (answered by a SYN-ACK or RST acknowledging cookie + 1) and in
+the acknowledgment number of an ACK (answered by a RST with sequence
+number cookie). A reply counts only if it carries the cookie of the
+address it came from, so no per-probe table is kept and stray traffic
+never marks a host alive.
+
+Sends are paced like RawArpSweeper: by the limiter's global and range
+budgets and by its 'ping' congestion window, which halves when too many
+hosts only answer a retransmission.
+"""
+import hashlib
+import ipaddress
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from .rate_control import ScanRateLimiter
+except ImportError:
+    from rate_control import ScanRateLimiter
+
+_ICMP_ECHO_REPLY, _ICMP_ECHO_REQUEST = 0, 8
+_SYN, _RST, _ACK = 0x02, 0x04, 0x10
+_KIND_ICMP, _KIND_SYN, _KIND_ACK = 0, 1, 2
+
+
+def checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+class PingSweeper:
+    """ICMP echo plus TCP SYN and ACK pings over raw sockets (needs CAP_NET_RAW).
+
+    sweep() returns, for every target that answered, how it answered:
+    'icmp', 'tcp-syn/<port>' or 'tcp-ack/<port>'. Unanswered targets are
+    probed again in up to retries later passes.
+    """
+
+    def __init__(self, syn_ports: Sequence[int] = (80, 443, 22), ack_ports: Sequence[int] = (80,),
+                 rate_pps: float = 2000, retries: int = 1, reply_timeout: float = 1.0,
+                 rate_limiter: ScanRateLimiter = None):
+        self.syn_ports = tuple(syn_ports)
+        self.ack_ports = tuple(ack_ports)
+        self.rate_pps = rate_pps
+        self.retries = retries
+        self.reply_timeout = reply_timeout
+        self.rate_limiter = rate_limiter
+        self._key = os.urandom(16)
+        self._ident = int.from_bytes(self._key[:2], 'big')
+        self._sport = 40000 + int.from_bytes(self._key[2:4], 'big') % 20000
+        self._sources: Dict[str, str] = {}
+
+    @staticmethod
+    def supported() -> bool:
+        """True when raw ICMP and TCP sockets can be opened"""
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP).close()
+            socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP).close()
+            return True
+        except (OSError, AttributeError):
+            return False
+
+    def _cookie(self, address: bytes, kind: int, port: int = 0) -> int:
+        digest = hashlib.blake2s(address + bytes((kind,)) + port.to_bytes(2, 'big'),
+                                 key=self._key, digest_size=4).digest()
+        return int.from_bytes(digest, 'big')
+
+    def _source(self, ip: str) -> bytes:
+        """Local address the kernel routes ip from, for the TCP pseudo-header; cached per /24"""
+        key = ip.rsplit('.', 1)[0]
+        source = self._sources.get(key)
+        if source is None:
+            probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                probe.connect((ip, 9))  # no packet is sent for a UDP connect
+                source = self._sources[key] = probe.getsockname()[0]
+            finally:
+                probe.close()
+        return socket.inet_aton(source)
+
+    def _echo(self, address: bytes) -> bytes:
+        cookie = self._cookie(address, _KIND_ICMP)
+        payload = struct.pack('!I', cookie) + b'netmap\x00\x00'
+        header = struct.pack('!BBHHH', _ICMP_ECHO_REQUEST, 0, 0, self._ident, cookie & 0xffff)
+        return header[:2] + struct.pack('!H', checksum(header + payload)) + header[4:] + payload
+
+    def _segment(self, source: bytes, address: bytes, port: int, flags: int) -> bytes:
+        if flags == _SYN:
+            seq, ack = self._cookie(address, _KIND_SYN, port), 0
+        else:
+            seq, ack = 0, self._cookie(address, _KIND_ACK, port)
+        header = struct.pack('!HHIIBBHHH', self._sport, port, seq, ack, 5 << 4, flags, 1024, 0, 0)
+        pseudo = source + address + struct.pack('!BBH', 0, socket.IPPROTO_TCP, len(header))
+        return header[:16] + struct.pack('!H', checksum(pseudo + header)) + header[18:]
+
+    def parse_reply(self, packet: bytes) -> Optional[Tuple[str, str]]:
+        """(sender ip, how it answered) of a reply to one of our probes, or None"""
+        if len(packet) < 20 or packet[0] >> 4 != 4:
+            return None
+        offset = (packet[0] & 0x0f) * 4
+        address = packet[12:16]
+        if packet[9] == socket.IPPROTO_ICMP:
+            if len(packet) < offset + 12 or packet[offset] != _ICMP_ECHO_REPLY:
+                return None
+            ident, = struct.unpack_from('!H', packet, offset + 4)
+            cookie, = struct.unpack_from('!I', packet, offset + 8)
+            if ident == self._ident and cookie == self._cookie(address, _KIND_ICMP):
+                return socket.inet_ntoa(address), 'icmp'
+        elif packet[9] == socket.IPPROTO_TCP and len(packet) >= offset + 14:
+            sport, dport, seq, ack = struct.unpack_from('!HHII', packet, offset)
+            flags = packet[offset + 13]
+            if dport != self._sport:
+                return None
+            if flags & _ACK and ack == (self._cookie(address, _KIND_SYN, sport) + 1) & 0xffffffff:
+                return socket.inet_ntoa(address), f'tcp-syn/{sport}'
+            if flags & _RST and seq == self._cookie(address, _KIND_ACK, sport):
+                return socket.inet_ntoa(address), f'tcp-ack/{sport}'
+        return None
+
+    def _receive(self, sockets: List[socket.socket], found: Dict[str, str], stop: threading.Event):
+        while not stop.is_set():
+            try:
+                readable, _, _ = select.select(sockets, [], [], 0.1)
+            except (OSError, ValueError):
+                break
+            for sock in readable:
+                try:
+                    packet = sock.recv(65535)
+                except OSError:
+                    continue
+                reply = self.parse_reply(packet)
+                if reply is not None:
+                    found.setdefault(*reply)
+
+    def _pass_rate(self) -> float:
+        if self.rate_limiter is None:
+            return self.rate_pps
+        return min(self.rate_pps, self.rate_limiter.congestion['ping'].current)
+
+    def _send(self, icmp: socket.socket, tcp: socket.socket, targets: List[str], found: Dict[str, str]) -> int:
+        """One pass of probes to every target not yet found, paced per target; returns probes sent"""
+        per_target = 1 + len(self.syn_ports) + len(self.ack_ports)
+        rate = self._pass_rate()
+        interval = per_target / rate if rate else 0
+        limiter = self.rate_limiter
+        started = time.monotonic()
+        sent = 0
+        paced = 0
+        for ip in targets:
+            if ip in found:
+                continue
+            if limiter is not None:
+                limiter.acquire(ip, tokens=per_target, per_host=False)
+            address = socket.inet_aton(ip)
+            try:
+                source = self._source(ip)
+                icmp.sendto(self._echo(address), (ip, 0))
+                for port in self.syn_ports:
+                    tcp.sendto(self._segment(source, address, port, _SYN), (ip, 0))
+                for port in self.ack_ports:
+                    tcp.sendto(self._segment(source, address, port, _ACK), (ip, 0))
+                sent += per_target
+            except OSError:
+                continue  # unroutable or filtered locally; the host stays unanswered
+            paced += 1
+            if interval:
+                ahead = started + paced * interval - time.monotonic()
+                if ahead > 0:
+                    time.sleep(ahead)
+        return sent
+
+    def sweep(self, targets: Iterable[str]) -> Dict[str, str]:
+        """Ping every target, returning how each responder answered"""
+        targets = list(targets)
+        found: Dict[str, str] = {}
+        stop = threading.Event()
+        icmp = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        receiver = threading.Thread(target=self._receive, args=([icmp, tcp], found, stop), daemon=True)
+        receiver.start()
+        try:
+            for attempt in range(self.retries + 1):
+                answered_before = len(found)
+                sent = self._send(icmp, tcp, targets, found)
+                time.sleep(self.reply_timeout)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.record_pass('ping', sent, len(found) - answered_before, attempt, len(found))
+                if len(found) == len(targets) or not sent:
+                    break
+        finally:
+            stop.set()
+            receiver.join()
+            icmp.close()
+            tcp.close()
+        return found
+
+    def sweep_range(self, network_range: str) -> Dict[str, str]:
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        return self.sweep(str(ip) for ip in network.hosts())
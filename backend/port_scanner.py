@@ -0,0 +1,192 @@
+import asyncio
+import errno
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from .rate_control import AdaptiveGate, ScanRateLimiter
+except ImportError:
+    from rate_control import AdaptiveGate, ScanRateLimiter
+
+
+class RttEstimator:
+    """Smoothed RTT tracker used to derive adaptive connect timeouts (RFC 6298 style)"""
+
+    def __init__(self, initial_timeout: float = 1.0, min_timeout: float = 0.05,
+                 max_timeout: float = 3.0, parent: 'RttEstimator' = None):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.parent = parent
+        self.srtt = None
+        self.rttvar = None
+
+    def observe(self, rtt: float):
+        """Feed a measured round-trip time in seconds"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        if self.parent is not None:
+            self.parent.observe(rtt)
+
+    @property
+    def timeout(self) -> float:
+        """Current connect timeout, falling back to the parent estimate when unsampled"""
+        if self.srtt is None:
+            if self.parent is not None:
+                return self.parent.timeout
+            return self.initial_timeout
+        timeout = self.srtt + 4 * self.rttvar
+        return max(self.min_timeout, min(self.max_timeout, timeout))
+
+
+def _max_open_sockets(requested: int) -> int:
+    """Clamp concurrency to what the process file descriptor limit allows"""
+    if resource is None:
+        return requested
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - 64))
+
+
+class AsyncPortScanner:
+    """Non-blocking TCP connect scanner keeping many connects in flight.
+
+    With a rate_limiter every connect spends a token from its global,
+    range and host budgets, and the number in flight follows the limiter's
+    TCP congestion controller, capped at max_concurrency. RTT estimates are
+    kept for the max_hosts most recently probed hosts.
+    """
+
+    def __init__(self, max_concurrency: int = 2000, per_host_concurrency: int = 8,
+                 initial_timeout: float = 1.0, min_timeout: float = 0.05,
+                 max_timeout: float = 3.0, retries: int = 0,
+                 rate_limiter: ScanRateLimiter = None, max_hosts: int = 65536):
+        self.max_concurrency = _max_open_sockets(max_concurrency)
+        self.per_host_concurrency = per_host_concurrency
+        self.retries = retries
+        self.rate_limiter = rate_limiter
+        self.rtt = RttEstimator(initial_timeout, min_timeout, max_timeout)
+        self.max_hosts = max_hosts
+        self._host_rtt = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _host_estimator(self, ip: str) -> RttEstimator:
+        with self._lock:
+            estimator = self._host_rtt.get(ip)
+            if estimator is None:
+                estimator = RttEstimator(self.rtt.initial_timeout, self.rtt.min_timeout,
+                                         self.rtt.max_timeout, parent=self.rtt)
+                self._host_rtt[ip] = estimator
+                if len(self._host_rtt) > self.max_hosts:
+                    self._host_rtt.popitem(last=False)
+            else:
+                self._host_rtt.move_to_end(ip)
+            return estimator
+
+    async def _connect(self, ip: str, port: int, timeout: float) -> Optional[bool]:
+        """Attempt one connect: True if open, False if refused, None on timeout"""
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return None
+        except ConnectionRefusedError:
+            return False
+        except OSError as e:
+            if e.errno in (errno.EHOSTUNREACH, errno.ENETUNREACH):
+                return False
+            return None
+        finally:
+            sock.close()
+
+    async def _probe(self, ip: str, port: int, global_sem, host_sem: asyncio.Semaphore) -> bool:
+        """Probe a single port under the global and per-host limits"""
+        estimator = self._host_estimator(ip)
+        limiter = self.rate_limiter
+        # Wait for the host first, so a busy host does not hold global slots other hosts could use
+        async with host_sem, global_sem:
+            for attempt in range(self.retries + 1):
+                if limiter is not None:
+                    await limiter.acquire_async(ip)
+                started = time.monotonic()
+                state = await self._connect(ip, port, estimator.timeout)
+                if limiter is not None:
+                    limiter.metrics['tcp'].record(sent=1, answered=int(state is not None),
+                                                  retransmits=int(attempt > 0))
+                if state is not None:
+                    # Both SYN/ACK and RST are complete round trips
+                    estimator.observe(time.monotonic() - started)
+                    if limiter is not None:
+                        self._record_answer(limiter, attempt)
+                    return state
+            return False
+
+    @staticmethod
+    def _record_answer(limiter: ScanRateLimiter, timeouts: int):
+        """Feed the TCP controller a probe answered after timeouts earlier attempts.
+
+        Only timeouts a retry then answered count as loss. A filtered port
+        times out on every attempt, so a probe that never answers says
+        nothing about congestion and is left out.
+        """
+        limiter.metrics['tcp'].record(lost=timeouts)
+        controller = limiter.congestion['tcp']
+        for _ in range(timeouts):
+            controller.record(True)
+        controller.record(False)
+
+    async def scan_hosts_async(self, ips: Iterable[str], ports: List[int]) -> Dict[str, List[int]]:
+        """Scan every port on every host, returning open ports per host"""
+        return await self.scan_targets_async({ip: ports for ip in ips})
+
+    async def scan_targets_async(self, targets: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        """Scan each host's own port list, returning open ports per host"""
+        if self.rate_limiter is not None:
+            global_sem = AdaptiveGate(self.rate_limiter.congestion['tcp'], self.max_concurrency)
+        else:
+            global_sem = asyncio.Semaphore(self.max_concurrency)
+        host_sems = {ip: asyncio.Semaphore(self.per_host_concurrency) for ip in targets}
+        # Port-major order spreads each host's probes out over the scan
+        depth = max((len(ports) for ports in targets.values()), default=0)
+        tasks = []
+        for rank in range(depth):
+            for ip, ports in targets.items():
+                if rank < len(ports):
+                    tasks.append((ip, ports[rank], asyncio.ensure_future(
+                        self._probe(ip, ports[rank], global_sem, host_sems[ip]))))
+
+        results = {ip: [] for ip in targets}
+        for ip, port, task in tasks:
+            try:
+                if await task:
+                    results[ip].append(port)
+            except Exception as e:
+                print(f"Port probe error for {ip}:{port}: {e}")
+        return results
+
+    def scan_hosts(self, ips: Iterable[str], ports: List[int]) -> Dict[str, List[int]]:
+        """Blocking wrapper around scan_hosts_async"""
+        return asyncio.run(self.scan_hosts_async(ips, ports))
+
+    def scan_targets(self, targets: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        """Blocking wrapper around scan_targets_async"""
+        return asyncio.run(self.scan_targets_async(targets))
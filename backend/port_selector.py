@@ -0,0 +1,196 @@
+"""
+Adaptive port selection learned from past scans.
+
+The fixed probe list spends the same four probes on every host and finds
+nothing it does not name, and the blanket 20-1024 deep scan then spends
+a thousand more on any host with one of them open while never reaching
+8009, 32400 or 62078. PortSelector instead counts, per port, how often a
+probe found it open: per device type, per /24 and over every host. The
+counts are kept in the inventory across scans. Candidate ports are ranked
+for each host by their estimated chance of being open, each level shrunk
+toward the one above it:
+
+    prior -> every host -> the host's /24 -> its device type -> its last scan
+
+probe_list() returns the best ports under a probe budget, keeping a few
+slots for ports with little evidence so the estimates keep improving;
+deep_ports() is the list the nmap deep scan covers in place of 20-1024.
+"""
+import ipaddress
+import threading
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .oui_db import lookup_vendor
+except ImportError:
+    from oui_db import lookup_vendor
+
+# Chance a port is open on a host we know nothing about. Ports the
+# identifier's port signatures and banner matching rely on are included.
+PORT_PRIORS: Dict[int, float] = {
+    80: 0.3, 443: 0.25, 22: 0.2, 445: 0.15, 139: 0.1, 135: 0.08, 53: 0.05, 8080: 0.05,
+    21: 0.03, 23: 0.02, 25: 0.02, 587: 0.01, 554: 0.03, 631: 0.03, 9100: 0.03, 3389: 0.05,
+    548: 0.03, 5000: 0.04, 5009: 0.01, 62078: 0.05, 8008: 0.03, 8009: 0.03, 32400: 0.01,
+    1400: 0.02, 1883: 0.02, 8883: 0.01, 3306: 0.02, 5900: 0.02, 8443: 0.02, 2869: 0.02,
+    5357: 0.02, 8200: 0.01, 3283: 0.01, 5938: 0.01, 1723: 0.01, 1194: 0.01, 1714: 0.01, 1764: 0.01,
+    # Mostly UDP services; kept so a TCP listener on them is still found
+    123: 0.005, 161: 0.005, 500: 0.005, 1701: 0.005, 1900: 0.005, 3478: 0.005, 5353: 0.005,
+}
+
+# (scope, key) of a set of counts: ('all', ''), ('subnet', '10.0.0.0/24') or ('type', 'Printer')
+Context = Tuple[str, str]
+
+
+def subnet_of(ip: str) -> str:
+    return str(ipaddress.ip_network(f'{ip}/24', strict=False)) if ip.count('.') == 3 else ip
+
+
+class PortSelector:
+    """Ranks ports per host from open/probed counts by device type and subnet.
+
+    inventory, if given, supplies the counts from earlier scans and keeps
+    every update. classify(device) -> type names a host's device type,
+    e.g. DeviceIdentifier().identify_device; without it only the 'type'
+    stored with a device counts. strength is how many probes of evidence
+    a level needs to outweigh the level above it.
+    """
+
+    def __init__(self, inventory=None, probe_budget: int = 8, deep_budget: int = 100, explore: float = 0.25,
+                 strength: float = 5.0, priors: Dict[int, float] = None,
+                 classify: Callable[[Dict], str] = None):
+        if probe_budget < 1:
+            raise ValueError("probe_budget must be positive")
+        self.inventory = inventory
+        self.probe_budget = probe_budget
+        self.deep_budget = deep_budget
+        self.explore = explore
+        self.strength = strength
+        self.priors = dict(PORT_PRIORS if priors is None else priors)
+        self.classify = classify
+        # context -> port -> [probed, open]
+        self._counts: Dict[Context, Dict[int, List[int]]] = {}
+        # contexts -> {port: estimate}, dropped whenever counts change
+        self._estimates: Dict[Tuple[Context, ...], Dict[int, float]] = {}
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Replace the counts with the inventory's, taking in what other scanners recorded"""
+        if self.inventory is None:
+            return
+        counts: Dict[Context, Dict[int, List[int]]] = {}
+        for scope, key, port, probed, opened in self.inventory.port_stats():
+            counts.setdefault((scope, key), {})[port] = [probed, opened]
+        with self._lock:
+            self._counts = counts
+            self._estimates = {}
+
+    def host_type(self, ip: str, mac: str = '', record: Optional[Dict] = None) -> Optional[str]:
+        """Device type a host is counted under: its stored type, else what classify makes of it"""
+        if record is not None and record.get('type'):
+            return record['type']
+        if self.classify is None:
+            return None
+        device = dict(record) if record is not None else {
+            'ip': ip, 'mac': mac, 'vendor': lookup_vendor(mac) or 'Unknown', 'hostname': '', 'ports': []}
+        return self.classify(device)
+
+    def contexts(self, ip: str, device_type: str = None) -> List[Context]:
+        """Contexts a host's estimates draw on, least specific first"""
+        contexts = [('all', ''), ('subnet', subnet_of(ip))]
+        if device_type:
+            contexts.append(('type', device_type))
+        return contexts
+
+    def _candidates(self, contexts: List[Context], known: Iterable[int]) -> set:
+        ports = set(self.priors) | set(known)
+        with self._lock:
+            for context in contexts:
+                ports.update(port for port, (_, opened) in self._counts.get(context, {}).items() if opened)
+        return ports
+
+    def estimate(self, port: int, contexts: List[Context], known_open: bool = False) -> float:
+        """Chance port is open, from the prior through each context in turn"""
+        estimate = self.priors.get(port, 0.001)
+        with self._lock:
+            for context in contexts:
+                probed, opened = self._counts.get(context, {}).get(port, (0, 0))
+                estimate = (opened + self.strength * estimate) / (probed + self.strength)
+        if known_open:
+            # One observation of this very host, weighted like a level of its own
+            estimate = (1 + estimate) / 2
+        return estimate
+
+    def _estimates_for(self, contexts: List[Context]) -> Dict[int, float]:
+        """Estimate of every candidate port in contexts, shared by all hosts in them"""
+        key = tuple(contexts)
+        estimates = self._estimates.get(key)
+        if estimates is None:
+            estimates = {port: self.estimate(port, contexts) for port in self._candidates(contexts, ())}
+            self._estimates[key] = estimates
+        return estimates
+
+    def ranked(self, ip: str, device_type: str = None, known: Iterable[int] = ()) -> List[Tuple[float, int]]:
+        """(estimate, port) for every candidate port of a host, best first; known are ports it had open"""
+        contexts = self.contexts(ip, device_type)
+        estimates = dict(self._estimates_for(contexts))
+        for port in known:
+            estimates[port] = self.estimate(port, contexts, known_open=True)
+        return sorted(((estimate, port) for port, estimate in estimates.items()),
+                      key=lambda item: (-item[0], item[1]))
+
+    def probe_list(self, ip: str, device_type: str = None, known: Iterable[int] = (),
+                   budget: int = None) -> List[int]:
+        """Ports to probe on one host: the likeliest, plus a few with little evidence yet"""
+        budget = budget or self.probe_budget
+        ranked = [port for _, port in self.ranked(ip, device_type, known)]
+        slots = min(len(ranked), budget)
+        explore = min(int(round(slots * self.explore)), len(ranked) - slots)
+        chosen = ranked[:slots - explore]
+        if explore:
+            # Least probed first; each host starts at its own offset so exploration is spread out
+            with self._lock:
+                overall = self._counts.get(('all', ''), {})
+                rest = [(overall.get(port, (0, 0))[0], rank, port)
+                        for rank, port in enumerate(ranked[slots - explore:])]
+            pool = [port for _, _, port in sorted(rest)[:explore * 4]]
+            start = zlib.crc32(ip.encode()) % len(pool)
+            chosen += [pool[(start + i) % len(pool)] for i in range(explore)]
+        return chosen
+
+    def deep_ports(self, budget: int = None) -> List[int]:
+        """Ports for a deep scan, by estimate over every host"""
+        budget = budget or self.deep_budget
+        contexts = [('all', '')]
+        candidates = self._candidates(contexts, ())
+        ranked = sorted(candidates, key=lambda port: (-self.estimate(port, contexts), port))
+        return sorted(ranked[:budget])
+
+    def record(self, results: Iterable[Tuple[str, Optional[str], Iterable[int], Iterable[int]]]):
+        """Count (ip, device type, ports probed, ports found open) of a batch of hosts"""
+        delta: Dict[Tuple[str, str, int], List[int]] = {}
+        for ip, device_type, probed, opened in results:
+            opened = set(opened)
+            for context in self.contexts(ip, device_type):
+                for port in set(probed):
+                    counts = delta.setdefault(context + (port,), [0, 0])
+                    counts[0] += 1
+                    counts[1] += port in opened
+        if not delta:
+            return
+        with self._lock:
+            for (scope, key, port), (probed, opened) in delta.items():
+                counts = self._counts.setdefault((scope, key), {}).setdefault(port, [0, 0])
+                counts[0] += probed
+                counts[1] += opened
+            self._estimates = {}
+        if self.inventory is not None:
+            self.inventory.add_port_stats(delta)
+
+    def stats(self, context: Context = ('all', '')) -> Dict[int, Dict]:
+        """Probed and open counts and open rate per port in one context"""
+        with self._lock:
+            counts = dict(self._counts.get(context, {}))
+        return {port: {'probed': probed, 'open': opened, 'rate': round(opened / probed, 4) if probed else None}
+                for port, (probed, opened) in sorted(counts.items())}
@@ -0,0 +1,287 @@
+"""
+Probe rate limiting and congestion control shared by every scan stage.
+
+ScanRateLimiter holds token buckets for the whole scanner, for each scanned
+range and for each host. A probe reserves a token in all three and waits
+for the slowest. AimdController adjusts how many probes may be in flight:
+it grows additively while responses come back and halves when the share of
+timeouts or retransmissions in a window passes a threshold. ProbeMetrics
+counts what each probe type actually achieved.
+"""
+import asyncio
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+DEFAULT_GLOBAL_PPS = 5000
+
+
+class TokenBucket:
+    """Token bucket allowing reservations, so callers can sleep outside the lock"""
+
+    def __init__(self, rate: float, burst: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate / 10)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens now, possibly going into debt; returns seconds to wait before using them"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ProbeMetrics:
+    """Counters for one probe type.
+
+    loss is lost / sent, where each engine records as lost whatever signals
+    a dropped probe for it: replies that only arrived to a retransmission,
+    for TCP connects as for ARP and ping.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.sent = 0
+            self.answered = 0
+            self.lost = 0
+            self.retransmits = 0
+            self._first = None
+            self._last = None
+
+    def record(self, sent: int = 0, answered: int = 0, lost: int = 0, retransmits: int = 0):
+        now = self._clock()
+        with self._lock:
+            if sent:
+                if self._first is None:
+                    self._first = now
+                self._last = now
+            self.sent += sent
+            self.answered += answered
+            self.lost += lost
+            self.retransmits += retransmits
+
+    @property
+    def pps(self) -> float:
+        """Achieved send rate between the first and last recorded send"""
+        if self._first is None or self._last == self._first:
+            return 0.0
+        return self.sent / (self._last - self._first)
+
+    @property
+    def loss(self) -> float:
+        return self.lost / self.sent if self.sent else 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            'sent': self.sent,
+            'answered': self.answered,
+            'lost': self.lost,
+            'retransmits': self.retransmits,
+            'pps': round(self.pps, 1),
+            'loss': round(self.loss, 4),
+        }
+
+
+class AimdController:
+    """Additive-increase / multiplicative-decrease limit driven by probe outcomes"""
+
+    def __init__(self, initial: float = 64, minimum: float = 4, maximum: float = 2000,
+                 increase: float = 8, decrease: float = 0.5, loss_threshold: float = 0.05,
+                 window: int = 64):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.loss_threshold = loss_threshold
+        self.window = window
+        self._samples = 0
+        self._losses = 0
+        self._lock = threading.Lock()
+
+    def record(self, lost: bool):
+        """Feed one probe outcome; the limit moves once per full window"""
+        with self._lock:
+            self._samples += 1
+            self._losses += bool(lost)
+            if self._samples < self.window:
+                return
+            if self._losses / self._samples > self.loss_threshold:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase)
+            self._samples = 0
+            self._losses = 0
+
+    def backoff(self):
+        """Immediate multiplicative decrease, e.g. after a lossy sweep pass"""
+        with self._lock:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._samples = 0
+            self._losses = 0
+
+    @property
+    def current(self) -> int:
+        return max(1, int(self.limit))
+
+
+class AdaptiveGate:
+    """asyncio concurrency gate whose width follows an AimdController"""
+
+    def __init__(self, controller: AimdController, cap: int):
+        self.controller = controller
+        self.cap = cap
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    def _width(self) -> int:
+        return min(self.cap, self.controller.current)
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self._width())
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._condition:
+            self.in_flight -= 1
+            # Wake as many waiters as there are free slots, which may have grown
+            self._condition.notify(max(1, self._width() - self.in_flight))
+
+
+class ScanRateLimiter:
+    """Global, per-range and per-host probe budgets plus per-probe-type metrics"""
+
+    def __init__(self, global_pps: float = DEFAULT_GLOBAL_PPS, range_pps: float = 2000, host_pps: float = 100,
+                 max_hosts: int = 65536, clock=time.monotonic):
+        self.global_pps = global_pps
+        self.range_pps = range_pps
+        self.host_pps = host_pps
+        self.max_hosts = max_hosts
+        self._clock = clock
+        self._global = TokenBucket(global_pps, clock=clock)
+        self._ranges = {}
+        self._networks: List[ipaddress.IPv4Network] = []
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {name: ProbeMetrics(clock) for name in ('arp', 'ping', 'tcp', 'nmap', 'banner')}
+        # ARP and ping sweeps are paced in probes per second, port probes by how many are in flight
+        self.congestion = {'arp': AimdController(initial=range_pps, minimum=50, maximum=range_pps,
+                                                 increase=range_pps / 10),
+                           'ping': AimdController(initial=range_pps, minimum=50, maximum=range_pps,
+                                                  increase=range_pps / 10),
+                           'tcp': AimdController()}
+
+    def add_range(self, network_range: str):
+        """Register a range so its hosts share that range's budget"""
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        with self._lock:
+            if network not in self._networks:
+                self._networks.append(network)
+                self._ranges[network] = TokenBucket(self.range_pps, clock=self._clock)
+
+    def _range_bucket(self, ip: str) -> Optional[TokenBucket]:
+        address = ipaddress.IPv4Address(ip)
+        for network in self._networks:
+            if address in network:
+                return self._ranges[network]
+        return None
+
+    def _host_bucket(self, ip: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._hosts.get(ip)
+            if bucket is None:
+                bucket = self._hosts[ip] = TokenBucket(self.host_pps, burst=max(1.0, self.host_pps / 10),
+                                                       clock=self._clock)
+                while len(self._hosts) > self.max_hosts:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(ip)
+            return bucket
+
+    def reserve(self, ip: str, tokens: float = 1, per_host: bool = True) -> float:
+        """Reserve tokens for probing ip in every applicable bucket; returns the wait in seconds"""
+        delay = self._global.reserve(tokens)
+        range_bucket = self._range_bucket(ip)
+        if range_bucket is not None:
+            delay = max(delay, range_bucket.reserve(tokens))
+        if per_host:
+            delay = max(delay, self._host_bucket(ip).reserve(tokens))
+        return delay
+
+    def acquire(self, ip: str, tokens: float = 1, per_host: bool = True):
+        """Blocking: wait until tokens for ip are available"""
+        delay = self.reserve(ip, tokens, per_host)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, ip: str, tokens: float = 1, per_host: bool = True):
+        delay = self.reserve(ip, tokens, per_host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_pass(self, kind: str, sent: int, answered: int, attempt: int, responders: int):
+        """Update the metrics and congestion state of kind after one sweep pass.
+
+        answered counts hosts that first replied in this pass; responders
+        counts every host that has replied so far. Attempt 0 is the first
+        pass and later ones are retransmissions.
+        """
+        if not sent:
+            return
+        # Hosts that only answer a retransmission mean an earlier probe or its reply was dropped
+        lost = answered if attempt else 0
+        self.metrics[kind].record(sent=sent, answered=answered, lost=lost, retransmits=sent if attempt else 0)
+        controller = self.congestion[kind]
+        # Dead addresses never answer, so loss is measured against the hosts that did
+        if attempt and lost / max(1, responders) > controller.loss_threshold:
+            controller.backoff()
+        elif not attempt:
+            for _ in range(answered):
+                controller.record(False)
+
+    def nmap_max_rate(self, processes: int) -> int:
+        """--max-rate for each of processes concurrent nmap runs sharing the global budget"""
+        return max(1, int(min(self.global_pps, self.range_pps) / max(1, processes)))
+
+    def register_metrics(self, registry):
+        """Expose the probe counters and congestion limits on a metrics.MetricsRegistry"""
+        def counter(field):
+            return lambda: [(f'netmap_probes_{field}_total', {'type': name}, getattr(metrics, field))
+                            for name, metrics in self.metrics.items()]
+
+        registry.register_collector('netmap_probes_sent_total', 'counter', 'Probes sent, by probe type',
+                                    counter('sent'))
+        registry.register_collector('netmap_probes_answered_total', 'counter', 'Probes answered, by probe type',
+                                    counter('answered'))
+        registry.register_collector('netmap_probes_lost_total', 'counter',
+                                    'Probes that timed out or went unanswered, by probe type', counter('lost'))
+        registry.register_collector('netmap_probes_retransmits_total', 'counter',
+                                    'Probe retries, by probe type', counter('retransmits'))
+        registry.register_collector('netmap_probe_limit', 'gauge', 'Current congestion window, by probe type',
+                                    lambda: [('netmap_probe_limit', {'type': name}, controller.current)
+                                             for name, controller in self.congestion.items()])
+
+    def snapshot(self) -> Dict:
+        """Achieved pps, loss and current congestion limits per probe type"""
+        stats = {name: metrics.snapshot() for name, metrics in self.metrics.items()}
+        for name, controller in self.congestion.items():
+            stats[name]['limit'] = controller.current
+        stats['budgets'] = {'global_pps': self.global_pps, 'range_pps': self.range_pps,
+                            'host_pps': self.host_pps}
+        return stats
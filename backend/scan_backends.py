@@ -0,0 +1,269 @@
+"""
+Pluggable network I/O for NetworkScanner.
+
+A ScanBackend answers the scanner's discovery (ARP), port probing, name
+resolution, fingerprinting (nmap) and banner requests. Without one,
+NetworkScanner talks to the live network itself; with one, every stage
+goes through the backend and nothing touches scapy, nmap, sockets or the
+ARP cache.
+
+SimulatedNetwork is a deterministic stand-in for a LAN: hosts drawn from
+device profiles with per-host latency, per-probe loss, open ports,
+vendors, hostnames and service banners, all derived from a seed. It waits
+out simulated latency with real sleeps, so stage timings and concurrency
+behave like the real engines, and it scales past 10k hosts.
+"""
+import asyncio
+import ipaddress
+import random
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:
+    from .banner_grabber import SignatureIndex, banner_summary
+    from .oui_db import lookup_vendor
+except ImportError:
+    from banner_grabber import SignatureIndex, banner_summary
+    from oui_db import lookup_vendor
+
+
+class ScanBackend(ABC):
+    """Network I/O behind each NetworkScanner stage"""
+
+    @abstractmethod
+    def network_ranges(self) -> List[str]:
+        """Ranges to scan when the scanner is not given one"""
+
+    def prepare(self):
+        """Called once when the scanner starts in full mode, e.g. to flush caches"""
+
+    @abstractmethod
+    def arp_sweep(self, ip_range: str) -> Dict[str, str]:
+        """MAC address of every host answering ARP in ip_range"""
+
+    @abstractmethod
+    def probe_ports(self, ips: Iterable[str], ports: List[int]) -> Dict[str, List[int]]:
+        """Open ports among ports on every host"""
+
+    def probe_targets(self, targets: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        """Open ports among each host's own port list"""
+        groups: Dict[Tuple[int, ...], List[str]] = {}
+        for ip, ports in targets.items():
+            groups.setdefault(tuple(ports), []).append(ip)
+        results = {}
+        for ports, ips in groups.items():
+            results.update(self.probe_ports(ips, list(ports)))
+        return results
+
+    @abstractmethod
+    def resolve_hostnames(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Hostname of every host, '' when it has none"""
+
+    @abstractmethod
+    def fingerprint(self, ips: Iterable[str], port_results: Dict[str, List[int]],
+                    ports: List[int] = None) -> Dict[str, Dict]:
+        """nmap-style mac, vendor, hostname and ports per host.
+
+        Hosts with open ports in port_results get a deep port scan, of
+        ports when given, else of nmap's well-known range.
+        """
+
+    @abstractmethod
+    def grab_banners(self, targets: Dict[str, List[int]]) -> Dict[str, List[Dict]]:
+        """Services identified from the banners of each host's open ports"""
+
+
+# Probes in nmap's default deep scan, -p 20-1024
+NMAP_DEFAULT_PORTS = 1005
+
+_SMB2_REPLY = b'\x00\x00\x00\x41\xfeSMB\x40\x00'
+_BANNERS = {
+    22: b'SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.6\r\n',
+    80: b'HTTP/1.1 200 OK\r\nServer: nginx/1.18.0\r\n\r\n',
+    443: b'HTTP/1.1 400 Bad Request\r\nServer: nginx/1.18.0\r\n\r\n',
+    445: _SMB2_REPLY,
+    631: b'HTTP/1.1 200 OK\r\nServer: CUPS/2.4 IPP/2.1\r\n\r\n',
+    3306: b'J\x00\x00\x00\x0a8.0.36\x00',
+    5000: b'HTTP/1.1 200 OK\r\nServer: nginx\r\n\r\n',
+}
+
+# (weight, MAC prefix, hostname stem, {port: probability open}, banners overriding _BANNERS)
+PROFILES: List[Tuple[int, str, str, Dict[int, float], Dict[int, bytes]]] = [
+    (14, 'f0:18:98', 'macbook', {22: 0.2, 5000: 0.3, 62078: 0.6}, {}),
+    (12, '44:65:0d', 'echo', {}, {}),
+    (10, '28:6c:07', 'android', {}, {}),
+    (10, '3c:5a:b4', 'chromecast', {8008: 0.9, 8009: 0.9},
+     {8008: b'HTTP/1.1 404 Not Found\r\nServer: Google Cast\r\n\r\n'}),
+    (10, 'd4:be:d9', 'desktop', {135: 0.8, 139: 0.9, 445: 0.9, 3389: 0.6}, {}),
+    (8, 'b8:27:eb', 'raspberrypi', {22: 0.95, 80: 0.3},
+     {22: b'SSH-2.0-OpenSSH_7.9p1 Raspbian-10+deb10u2\r\n'}),
+    (8, '00:0c:29', 'vm', {22: 0.8, 80: 0.4, 443: 0.4, 3306: 0.2}, {}),
+    (7, '3c:d9:2b', 'printer', {80: 0.9, 443: 0.5, 631: 0.9, 9100: 0.9},
+     {80: b'HTTP/1.1 200 OK\r\nServer: HP HTTP Server; HP LaserJet\r\n\r\n'}),
+    (6, '28:57:be', 'ipcam', {80: 0.9, 554: 0.95},
+     {80: b'HTTP/1.1 200 OK\r\nServer: App-webs/\r\n\r\n',
+      554: b'RTSP/1.0 200 OK\r\nCSeq: 1\r\nServer: Hikvision-Webs\r\n\r\n'}),
+    (5, '00:11:32', 'nas', {22: 0.5, 80: 0.9, 139: 0.9, 445: 0.9, 5000: 0.9}, {}),
+    (5, 'ac:84:c6', 'router', {22: 0.3, 53: 0.9, 80: 0.95, 443: 0.6},
+     {22: b'SSH-2.0-dropbear_2020.81\r\n', 80: b'HTTP/1.1 200 OK\r\nServer: lighttpd/1.4.59\r\n\r\n'}),
+    (5, '00:0e:58', 'sonos', {1400: 0.9}, {}),
+]
+
+
+class SimulatedHost:
+    __slots__ = ('ip', 'mac', 'vendor', 'hostname', 'ports', 'latency', 'banners')
+
+    def __init__(self, ip: str, mac: str, vendor: str, hostname: str, ports: List[int],
+                 latency: float, banners: Dict[int, bytes]):
+        self.ip = ip
+        self.mac = mac
+        self.vendor = vendor
+        self.hostname = hostname
+        self.ports = ports
+        self.latency = latency
+        self.banners = banners
+
+
+class SimulatedNetwork(ScanBackend):
+    """Deterministic simulated LAN of hosts drawn from PROFILES.
+
+    latency is the mean round trip per host (each host gets 0.5x to 1.5x
+    of it) and loss the chance that any single probe goes unanswered; a
+    lost probe costs probe_timeout. ARP sweeps send at arp_pps and retry
+    lost requests arp_retries times, then wait arp_timeout for replies.
+    """
+
+    def __init__(self, hosts: int = 1000, network: str = '10.0.0.0/16', seed: int = 0,
+                 latency: float = 0.002, loss: float = 0.0, hostname_ratio: float = 0.6,
+                 probe_timeout: float = 0.05, concurrency: int = 1024, arp_pps: float = 50000,
+                 arp_retries: int = 2, arp_timeout: float = 0.2, dns_latency: float = 0.01,
+                 nmap_chunk: int = 256, nmap_chunk_time: float = 0.05,
+                 profiles: Sequence[Tuple] = PROFILES):
+        self.network = ipaddress.IPv4Network(network, strict=False)
+        if hosts > self.network.num_addresses - 2:
+            raise ValueError(f"{hosts} hosts do not fit in {network}")
+        self.seed = seed
+        self.loss = loss
+        self.probe_timeout = probe_timeout
+        self.concurrency = concurrency
+        self.arp_pps = arp_pps
+        self.arp_retries = arp_retries
+        self.arp_timeout = arp_timeout
+        self.dns_latency = dns_latency
+        self.nmap_chunk = nmap_chunk
+        self.nmap_chunk_time = nmap_chunk_time
+        self.index = SignatureIndex()
+        self.probes_sent = 0
+        self.hosts = self._generate(hosts, latency, hostname_ratio, profiles)
+
+    def _generate(self, count: int, latency: float, hostname_ratio: float,
+                  profiles: Sequence[Tuple]) -> Dict[str, SimulatedHost]:
+        rng = random.Random(self.seed)
+        base = int(self.network.network_address)
+        offsets = sorted(rng.sample(range(1, self.network.num_addresses - 1), count))
+        weights = [profile[0] for profile in profiles]
+        hosts = {}
+        for n, offset in enumerate(offsets):
+            _, prefix, stem, port_odds, banners = rng.choices(profiles, weights)[0]
+            ip = str(ipaddress.IPv4Address(base + offset))
+            mac = prefix + ''.join(f':{b:02x}' for b in rng.getrandbits(24).to_bytes(3, 'big'))
+            ports = sorted(port for port, odds in port_odds.items() if rng.random() < odds)
+            hosts[ip] = SimulatedHost(
+                ip, mac, lookup_vendor(mac) or 'Unknown',
+                f'{stem}-{n}' if rng.random() < hostname_ratio else '',
+                ports, latency * (0.5 + rng.random()),
+                {port: banners.get(port, _BANNERS.get(port)) for port in ports
+                 if banners.get(port, _BANNERS.get(port))})
+        return hosts
+
+    def _lost(self, ip: str, key, attempt: int = 0) -> bool:
+        """Whether one probe is dropped, the same way on every run with the same seed"""
+        if not self.loss:
+            return False
+        return zlib.crc32(f'{self.seed}:{ip}:{key}:{attempt}'.encode()) / 2 ** 32 < self.loss
+
+    def network_ranges(self) -> List[str]:
+        return [str(self.network)]
+
+    def arp_sweep(self, ip_range: str) -> Dict[str, str]:
+        network = ipaddress.IPv4Network(ip_range, strict=False)
+        found = {}
+        lost = 0
+        for ip, host in self.hosts.items():
+            if ipaddress.IPv4Address(ip) not in network:
+                continue
+            for attempt in range(self.arp_retries + 1):
+                if not self._lost(ip, 'arp', attempt):
+                    found[ip] = host.mac
+                    break
+                lost += 1
+        sent = network.num_addresses + lost
+        self.probes_sent += sent
+        time.sleep(sent / self.arp_pps + self.arp_timeout)
+        return found
+
+    async def _probe(self, ip: str, port: int, semaphore: asyncio.Semaphore) -> bool:
+        host = self.hosts.get(ip)
+        async with semaphore:
+            self.probes_sent += 1
+            if host is None or self._lost(ip, port):
+                await asyncio.sleep(self.probe_timeout)
+                return False
+            await asyncio.sleep(host.latency)
+            return port in host.ports
+
+    async def probe_targets_async(self, targets: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [(ip, port, asyncio.ensure_future(self._probe(ip, port, semaphore)))
+                 for ip, ports in targets.items() for port in ports]
+        results = {ip: [] for ip in targets}
+        for ip, port, task in tasks:
+            if await task:
+                results[ip].append(port)
+        return results
+
+    def probe_ports(self, ips: Iterable[str], ports: List[int]) -> Dict[str, List[int]]:
+        return asyncio.run(self.probe_targets_async({ip: ports for ip in ips}))
+
+    def probe_targets(self, targets: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        return asyncio.run(self.probe_targets_async(targets))
+
+    def resolve_hostnames(self, ips: Iterable[str]) -> Dict[str, str]:
+        # One windowed batch of queries per concurrency slots, like AsyncHostnameResolver
+        ips = list(ips)
+        for _ in range(0, len(ips), self.concurrency):
+            time.sleep(self.dns_latency)
+        return {ip: self.hosts[ip].hostname if ip in self.hosts else '' for ip in ips}
+
+    def fingerprint(self, ips: Iterable[str], port_results: Dict[str, List[int]],
+                    ports: List[int] = None) -> Dict[str, Dict]:
+        ips = [ip for ip in ips if ip in self.hosts]
+        for _ in range(0, len(ips), self.nmap_chunk):
+            time.sleep(self.nmap_chunk_time)
+        results = {}
+        for ip in ips:
+            host = self.hosts[ip]
+            deep = []
+            if port_results.get(ip):
+                # Without a port list every open port is reported, as if nmap's range covered them all
+                self.probes_sent += len(ports) if ports is not None else NMAP_DEFAULT_PORTS
+                deep = [port for port in host.ports if ports is None or port in ports]
+            results[ip] = {'mac': host.mac.upper(), 'vendor': host.vendor, 'hostname': host.hostname,
+                           'ports': deep}
+        return results
+
+    def grab_banners(self, targets: Dict[str, List[int]]) -> Dict[str, List[Dict]]:
+        results = {}
+        pending = [(ip, port) for ip, ports in targets.items() if ip in self.hosts for port in sorted(set(ports))]
+        for start in range(0, len(pending), self.concurrency):
+            batch = pending[start:start + self.concurrency]
+            time.sleep(max((self.hosts[ip].latency for ip, _ in batch), default=0))
+            for ip, port in batch:
+                banner = self.hosts[ip].banners.get(port)
+                if banner is None or self._lost(ip, ('banner', port)):
+                    continue
+                service = self.index.match(banner) or {'service': 'unknown', 'product': '', 'version': ''}
+                results.setdefault(ip, []).append(dict(service, port=port, banner=banner_summary(banner)))
+        return results
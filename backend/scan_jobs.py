@@ -0,0 +1,181 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .device_table import DeviceTable
+    from .metrics import SCANS, ScanTimer
+except ImportError:
+    from device_table import DeviceTable
+    from metrics import SCANS, ScanTimer
+
+# scan_fn(progress_callback) -> iterable of devices; an iterable with a checkpoint
+# attribute (a ScheduledScan) leaves it on the job once iteration ends
+ScanFunction = Callable[[Callable[[Dict], None]], Iterable[Dict]]
+Listener = Callable[[str, Dict], None]
+
+
+class ScanJob:
+    """A single sweep and everything it has produced so far"""
+
+    def __init__(self, key: str, timer: ScanTimer = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = 'queued'
+        self.devices = DeviceTable()  # columnar; iterating yields device dicts
+        self.progress = None
+        self.error = None
+        self.timer = timer if timer is not None else ScanTimer()  # per-stage timing breakdown
+        self.attached = 1  # callers sharing this sweep
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.checkpoint = None  # where a budgeted scan stopped, if it left hosts unfingerprinted
+        self._done = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the job finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def to_dict(self, include_devices: bool = True) -> Dict:
+        data = {
+            'scan_id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'device_count': len(self.devices),
+            'attached': self.attached,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'partial': self.checkpoint is not None,
+            'pending_hosts': len(self.checkpoint.pending) if self.checkpoint is not None else 0,
+            'timings': self.timer.breakdown(),
+        }
+        if include_devices:
+            data['devices'] = self.devices.to_dicts()
+        return data
+
+
+class ScanJobManager:
+    """Runs scans on a bounded worker pool and coalesces duplicate requests.
+
+    A submit for a key that already has a queued or running job attaches to
+    that job instead of starting another sweep. Finished jobs are kept in a
+    bounded store so results can be fetched by id afterwards.
+    """
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan-job')
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Listener):
+        """Register a callback receiving (event_name, payload) for every job event"""
+        self._listeners.append(listener)
+
+    def _emit(self, event: str, payload: Dict):
+        for listener in self._listeners:
+            try:
+                listener(event, payload)
+            except Exception as e:
+                print(f"Scan event listener error: {e}")
+
+    def submit(self, key: str, scan_fn: ScanFunction, timer: ScanTimer = None) -> Tuple[ScanJob, bool]:
+        """Start a scan for key, or join the in-flight one; returns (job, coalesced).
+
+        timer, when the scan starts, becomes the job's timing breakdown;
+        scan_fn should record its stage spans in it.
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                job.attached += 1
+                return job, True
+
+            job = ScanJob(key, timer)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            self._evict()
+        self._executor.submit(self._run, job, scan_fn)
+        return job, False
+
+    def _evict(self):
+        """Drop the oldest finished jobs beyond max_jobs (caller holds the lock)"""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if not self._jobs[job_id].active:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _run(self, job: ScanJob, scan_fn: ScanFunction):
+        job.status = 'running'
+        job.started_at = time.time()
+        job.timer.started_at = job.started_at
+
+        def on_progress(progress):
+            job.progress = progress
+            self._emit('scan_progress', dict(progress, scan_id=job.id))
+
+        try:
+            results = scan_fn(on_progress)
+            for device in results:
+                job.devices.append(device)
+                self._emit('device_found', {'scan_id': job.id, 'device': device})
+            job.checkpoint = getattr(results, 'checkpoint', None)
+            job.status = 'completed'
+        except Exception as e:
+            print(f"Scan job {job.id} failed: {str(e)}")
+            traceback.print_exc()
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.timer.finish()
+            SCANS.inc(status=job.status)
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            job._done.set()
+
+        if job.status == 'completed':
+            self._emit('scan_complete', {'scan_id': job.id, 'device_count': len(job.devices),
+                                         'partial': job.checkpoint is not None})
+        else:
+            self._emit('scan_error', {'scan_id': job.id, 'error': job.error})
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_job(self, key: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._active.get(key)
+
+    def latest_completed(self) -> Optional[ScanJob]:
+        """Most recently finished successful job"""
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.status == 'completed']
+        if not finished:
+            return None
+        return max(finished, key=lambda job: job.finished_at)
+
+    def jobs(self) -> List[ScanJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
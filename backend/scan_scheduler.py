@@ -0,0 +1,193 @@
+"""
+Time-budgeted, prioritized scans.
+
+iter_scan_network fingerprints every discovered host and finishes only
+when the last one is done. ScheduledScan sweeps for live hosts first and
+then fingerprints them a batch at a time in priority order until its
+wall-clock budget runs out:
+
+    new hosts, gateways (.1 and .254), hosts whose MAC changed, the rest
+
+When the budget is spent, every host it did not get to is still yielded,
+once, with 'complete': False and the inventory's last fingerprint where
+there is one, and the scan leaves a ScanCheckpoint. A later ScheduledScan
+given that checkpoint skips the sweep and carries on with the queued
+hosts in the same order.
+
+The budget is checked between stages and hosts, so a scan can overrun it
+by at most one stage of one batch.
+"""
+import ipaddress
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .device_identifier import discovered_device, set_type
+    from .metrics import ScanTimer
+except ImportError:
+    from device_identifier import discovered_device, set_type
+    from metrics import ScanTimer
+
+NEW, GATEWAY, CHANGED, OTHER = range(4)
+PRIORITY_NAMES = ('new', 'gateway', 'changed', 'other')
+GATEWAY_OCTETS = ('1', '254')
+
+# (ip, mac, priority) of a host waiting to be fingerprinted
+QueuedHost = Tuple[str, str, int]
+
+
+def host_priority(ip: str, mac: str, record: Optional[Dict]) -> int:
+    """Priority class of a live host given its inventory record (None if never seen); lower goes first"""
+    if record is None or record.get('fingerprinted_at') is None:
+        return NEW
+    if ip.rsplit('.', 1)[-1] in GATEWAY_OCTETS:
+        return GATEWAY
+    if mac and record.get('mac') and mac.lower() != record['mac'].lower():
+        return CHANGED
+    return OTHER
+
+
+def _address_key(ip: str) -> Tuple[int, int]:
+    address = ipaddress.ip_address(ip)
+    return address.version, int(address)
+
+
+class ScanCheckpoint:
+    """Where a budgeted scan stopped: the devices it finished and the hosts still queued.
+
+    to_dict() is JSON-safe and from_dict() restores it, so a checkpoint can
+    be stored and handed to a ScheduledScan later.
+    """
+
+    def __init__(self, mode: str, devices: List[Dict], pending: List[QueuedHost]):
+        self.mode = mode
+        self.devices = devices
+        self.pending = pending
+
+    def to_dict(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'devices': self.devices,
+            'pending': [{'ip': ip, 'mac': mac, 'priority': PRIORITY_NAMES[priority]}
+                        for ip, mac, priority in self.pending],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScanCheckpoint':
+        pending = [(host['ip'], host['mac'], PRIORITY_NAMES.index(host['priority'])) for host in data['pending']]
+        return cls(data['mode'], list(data['devices']), pending)
+
+
+class ScheduledScan:
+    """Iterable scan of every range that fingerprints hosts by priority within budget seconds.
+
+    scanner's liveness_sweep() runs once, unless resuming, and its
+    fingerprint_hosts() once per batch; identifier, if given, types both
+    finished and unfinished devices. budget=None never stops early. Every
+    device yielded carries 'complete'; once iteration ends, checkpoint is a
+    ScanCheckpoint if any host was left unfingerprinted, else None. Given a
+    checkpoint, the scan resumes it: its finished devices are yielded
+    again, then its queue is worked.
+    """
+
+    def __init__(self, scanner, budget: float = None, identifier=None, mode: str = None,
+                 checkpoint: ScanCheckpoint = None, batch_size: int = 32,
+                 progress_callback: Callable[[Dict], None] = None, should_stop: Callable[[], bool] = None,
+                 timer: ScanTimer = None, clock=time.monotonic):
+        self.scanner = scanner
+        self.budget = budget
+        self.identifier = identifier
+        self.resume = checkpoint
+        self.mode = checkpoint.mode if checkpoint is not None else (mode or scanner.mode)
+        self.inventory = getattr(scanner, 'inventory', None)
+        if self.mode == 'delta' and self.inventory is None:
+            raise ValueError("Delta scans need a device inventory")
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.should_stop = should_stop
+        self.timer = timer if timer is not None else ScanTimer()
+        self._clock = clock
+        self.checkpoint: Optional[ScanCheckpoint] = None
+
+    def _report(self, stage: str, completed: int, total: int, pending: int):
+        if self.progress_callback:
+            self.progress_callback({
+                'range': ','.join(getattr(self.scanner, 'network_ranges', [])),
+                'stage': stage,
+                'completed': completed,
+                'total': total,
+                'pending': pending,
+            })
+
+    def _discover(self) -> Tuple[List[Dict], List[QueuedHost]]:
+        """Sweep every range; returns devices served from the inventory and the prioritized queue"""
+        started = time.perf_counter()
+        alive = self.scanner.liveness_sweep()
+        # liveness_sweep already records the span in the stage histogram
+        self.timer.add('arp', time.perf_counter() - started, observe=False)
+        self.timer.count('hosts_discovered', len(alive))
+
+        cached = []
+        targets = alive
+        if self.mode == 'delta':
+            targets, cached = self.inventory.plan_delta(alive)
+            self.timer.count('hosts_cached', len(cached))
+        records = self.inventory.get_many(targets) if self.inventory is not None else {}
+        queue = [(ip, mac, host_priority(ip, mac, records.get(ip))) for ip, mac in targets.items()]
+        queue.sort(key=lambda host: (host[2], _address_key(host[0])))
+        return cached, queue
+
+    def _partial(self, ip: str, mac: str, priority: int, record: Optional[Dict]) -> Dict:
+        """A queued host as discovered, on top of its last fingerprint when the MAC still matches"""
+        if record is not None and (not mac or not record.get('mac') or mac.lower() == record['mac'].lower()):
+            device = dict(record)
+        else:
+            device = discovered_device(ip, mac)
+        device.update(status='active', complete=False, priority=PRIORITY_NAMES[priority])
+        return set_type(device, self.identifier)
+
+    def __iter__(self) -> Iterator[Dict]:
+        deadline = None if self.budget is None else self._clock() + self.budget
+
+        def stopped():
+            if deadline is not None and self._clock() >= deadline:
+                return True
+            return self.should_stop is not None and self.should_stop()
+
+        finished = []  # complete devices, carried into the checkpoint
+        if self.resume is not None:
+            cached, queue = [dict(device) for device in self.resume.devices], list(self.resume.pending)
+        else:
+            self._report('arp', 0, 0, 0)
+            cached, queue = self._discover()
+        for device in cached:
+            device.update(status='active', complete=True)
+            finished.append(set_type(device, self.identifier))
+            yield device
+        total = len(finished) + len(queue)
+
+        while queue and not stopped():
+            batch, queue = queue[:self.batch_size], queue[self.batch_size:]
+            base = len(finished)
+            self._report(PRIORITY_NAMES[batch[0][2]], base, total, len(batch) + len(queue))
+            done = set()
+            for device in self.scanner.fingerprint_hosts(
+                    {ip: mac for ip, mac, _ in batch}, should_stop=stopped, timer=self.timer,
+                    progress=lambda stage, count: self._report(stage, base + count, total,
+                                                               len(batch) + len(queue) - count)):
+                done.add(device['ip'])
+                device['complete'] = True
+                finished.append(set_type(device, self.identifier))
+                yield device
+            # A batch cut short goes back to the front; a host that failed in a finished batch is dropped
+            if stopped():
+                queue = [host for host in batch if host[0] not in done] + queue
+
+        if queue:
+            records = self.inventory.get_many(ip for ip, _, _ in queue) if self.inventory is not None else {}
+            for ip, mac, priority in queue:
+                yield self._partial(ip, mac, priority, records.get(ip))
+            self.timer.count('hosts_deferred', len(queue))
+            self.checkpoint = ScanCheckpoint(self.mode, finished, queue)
+            print(f"Scan stopped with {len(queue)} of {total} hosts left to fingerprint")
+        self._report('done', len(finished), total, len(queue))
@@ -0,0 +1,266 @@
+"""
+Sharded multi-process scanning.
+
+Ranges are split into CIDR shards (a /24 each by default) and handed to a
+process pool. Every worker keeps one scanner for its lifetime and runs
+each shard through the normal pipeline. Results are merged in the parent
+as shards finish, through a reducer that drops duplicates from
+overlapping ranges.
+
+Each worker gets a share of the probe budget, so the pool as a whole
+stays within the configured rate. Every scan has its own cancel event,
+sent along with each of its shards, that workers poll between stages
+and hosts; cancelling sets it and drops the shards that have not
+started, leaving other scans on the same pool running. The pool outlives a scan, so only the first one pays for
+starting the workers.
+"""
+import importlib
+import ipaddress
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .rate_control import DEFAULT_GLOBAL_PPS, ScanRateLimiter
+    from .metrics import ScanTimer
+    from .inventory import DeviceInventory
+except ImportError:
+    from rate_control import DEFAULT_GLOBAL_PPS, ScanRateLimiter
+    from metrics import ScanTimer
+    from inventory import DeviceInventory
+
+DEFAULT_SHARD_PREFIX = 24
+
+
+def split_cidr(ranges: Iterable[str], prefix: int = DEFAULT_SHARD_PREFIX) -> List[str]:
+    """Split ranges into shards no larger than /prefix, dropping shards covered twice"""
+    shards = []
+    seen = set()
+    for network_range in ranges:
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        subnets = [network] if network.prefixlen >= prefix else network.subnets(new_prefix=prefix)
+        for subnet in subnets:
+            if subnet in seen or any(subnet.subnet_of(other) for other in seen if other.prefixlen < subnet.prefixlen):
+                continue
+            seen.add(subnet)
+            shards.append(str(subnet))
+    return shards
+
+
+class DeviceReducer:
+    """Streaming merge of per-shard results, deduplicated by IP (or MAC when there is no IP)"""
+
+    def __init__(self):
+        self._by_key: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _key(device: Dict) -> Optional[str]:
+        if device.get('ip'):
+            return f"ip:{device['ip']}"
+        if device.get('mac'):
+            return f"mac:{device['mac'].lower()}"
+        return None
+
+    def add(self, device: Dict) -> Optional[Dict]:
+        """Merge one device; returns it when first seen, None when it only updated a known one"""
+        key = self._key(device)
+        if key is None:
+            return None
+        known = self._by_key.get(key)
+        if known is None:
+            self._by_key[key] = device
+            return device
+        # Same host from an overlapping shard: keep what the first report lacked
+        for field, value in device.items():
+            if field == 'ports':
+                known['ports'] = known.get('ports', []) + [p for p in value if p not in known.get('ports', [])]
+            elif value and (not known.get(field) or known.get(field) == 'Unknown'):
+                known[field] = value
+        return None
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def devices(self) -> List[Dict]:
+        return list(self._by_key.values())
+
+
+# Per worker process state, set up by _init_worker
+_worker_scanner = None
+
+
+def _load(path: str):
+    module, _, name = path.rpartition('.')
+    return getattr(importlib.import_module(module), name)
+
+
+def _init_worker(scanner_path: str, options: Dict):
+    global _worker_scanner
+    _worker_scanner = (scanner_path, options)
+
+
+def _scanner():
+    """Build this process's scanner on first use"""
+    global _worker_scanner
+    if isinstance(_worker_scanner, tuple):
+        path, options = _worker_scanner
+        options = dict(options)
+        limits = options.pop('rate_limiter_options', None)
+        if limits is not None:
+            options['rate_limiter'] = ScanRateLimiter(**limits)
+        inventory_path = options.pop('inventory_path', None)
+        if inventory_path is not None:
+            options['inventory'] = DeviceInventory(inventory_path)
+        identifier_path = options.pop('identifier_path', None)
+        if identifier_path is not None:
+            options['identifier'] = _load(identifier_path)()
+        _worker_scanner = _load(path)(**options)
+        selector = getattr(_worker_scanner, 'port_selector', None)
+        if selector is not None and identifier_path is not None:
+            selector.classify = options['identifier'].identify_device
+    return _worker_scanner
+
+
+def _scan_shard(shard: str, mode: Optional[str], cancel) -> Tuple[List[Dict], float]:
+    """Run one shard through the scanner pipeline inside a worker; returns its devices and seconds.
+
+    cancel is the event of the scan the shard belongs to.
+    """
+    if cancel.is_set():
+        return [], 0.0
+    started = time.perf_counter()
+    scanner = _scanner()
+    scanner.network_ranges = [shard]
+    if getattr(scanner, 'rate_limiter', None) is not None:
+        scanner.rate_limiter.add_range(shard)
+    if getattr(scanner, 'port_selector', None) is not None:
+        # Start from what the parent and the other workers have recorded since
+        scanner.port_selector.reload()
+    devices = list(scanner.iter_scan_network(mode=mode, should_stop=cancel.is_set))
+    return devices, time.perf_counter() - started
+
+
+class ShardedScanner:
+    """Scan ranges as CIDR shards spread over a process pool.
+
+    scanner_path names the scanner class to build in each worker (a
+    dotted path, so spawned workers can import it) and options are its
+    keyword arguments. Its iter_scan_network must accept mode and
+    should_stop. Workers build their own ScanRateLimiter from the
+    'rate_limiter_options' entry, with global_pps split evenly between
+    them; range and host budgets apply per shard and are not split.
+    An 'inventory_path' entry opens that DeviceInventory in each worker,
+    and 'identifier_path' names an identifier class the worker builds and
+    passes as the scanner's identifier and its port selector's classify.
+    """
+
+    def __init__(self, network_ranges: List[str], options: Dict = None, processes: int = None,
+                 shard_prefix: int = DEFAULT_SHARD_PREFIX,
+                 scanner_path: str = 'backend.network_scanner.NetworkScanner',
+                 mp_context: str = 'spawn'):
+        self.network_ranges = list(network_ranges)
+        self.shards = split_cidr(self.network_ranges, shard_prefix)
+        self.processes = max(1, min(processes or os.cpu_count() or 1, len(self.shards) or 1))
+        self.options = dict(options or {})
+        self.scanner_path = scanner_path
+        self._context = multiprocessing.get_context(mp_context)
+        # Cancel events of the running scans; proxies from a manager, so they can travel with each task
+        self._manager = None
+        self._scans = set()
+        self._executor = None
+
+    def _worker_options(self) -> Dict:
+        options = dict(self.options)
+        limits = dict(options.get('rate_limiter_options') or {})
+        limits['global_pps'] = limits.get('global_pps', DEFAULT_GLOBAL_PPS) / self.processes
+        options['rate_limiter_options'] = limits
+        return options
+
+    def cancel(self):
+        """Stop every running scan: queued shards are dropped, running ones stop at their next check"""
+        for event in list(self._scans):
+            event.set()
+
+    def _cancel_event(self):
+        if self._manager is None:
+            self._manager = self._context.Manager()
+        return self._manager.Event()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Worker pool, started on first use and kept so later scans skip process start-up"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=self._context, initializer=_init_worker,
+                initargs=(self.scanner_path, self._worker_options()))
+        return self._executor
+
+    def iter_scan_network(self, progress_callback: Callable[[Dict], None] = None,
+                          mode: str = None, should_stop: Callable[[], bool] = None,
+                          timer: ScanTimer = None) -> Iterator[Dict]:
+        """Yield each unique device as its shard completes.
+
+        Worker stage spans stay in the worker processes; timer gets one
+        'shard' span per shard with the time its worker spent on it.
+        """
+        timer = timer if timer is not None else ScanTimer()
+        reducer = DeviceReducer()
+        total = len(self.shards)
+        completed = 0
+        executor = self._pool()
+        cancel = self._cancel_event()
+        self._scans.add(cancel)
+        pending = {executor.submit(_scan_shard, shard, mode, cancel): shard for shard in self.shards}
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                if should_stop and should_stop():
+                    cancel.set()
+                if cancel.is_set():
+                    print("Sharded scan cancelled")
+                    break
+                for future in done:
+                    shard = pending.pop(future)
+                    completed += 1
+                    try:
+                        devices, seconds = future.result()
+                        timer.add('shard', seconds)
+                    except Exception as e:
+                        print(f"Shard {shard} failed: {e}")
+                        devices = []
+                    for device in devices:
+                        if reducer.add(device) is not None:
+                            timer.count('hosts_discovered')
+                            yield device
+                    if progress_callback:
+                        progress_callback({'range': shard, 'stage': 'shards',
+                                           'completed': completed, 'total': total})
+        finally:
+            if pending:
+                # Drop queued shards and let running ones notice the event before the pool is reused
+                cancel.set()
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+            self._scans.discard(cancel)
+        print(f"Sharded scan: {len(reducer)} devices from {completed}/{total} shards")
+
+    def scan_network(self, mode: str = None) -> List[Dict]:
+        return list(self.iter_scan_network(mode=mode))
+
+    def close(self):
+        """Cancel anything running and stop the worker processes"""
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,87 @@
+"""Memory and throughput of DeviceTable against a list of device dicts.
+
+Run from the repository root:
+
+    python benchmarks/bench_device_table.py [--devices 65536]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.device_table import DeviceTable
+
+VENDORS = ['Apple Inc.', 'Samsung Electronics', 'Hewlett Packard', 'TP-LINK', 'Raspberry Pi Foundation',
+           'Espressif Inc.', 'Sony Interactive', 'Unknown']
+TYPES = ['Computer', 'Apple Device', 'Printer', 'IoT Device', 'Router', 'Unknown Device']
+PORTS = [21, 22, 23, 53, 80, 139, 443, 445, 548, 631, 1883, 3389, 5353, 8080, 8443, 9100]
+
+
+def synthetic_devices(count, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'ip': f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}',
+        'mac': ':'.join(f'{rng.randrange(256):02x}' for _ in range(6)),
+        'vendor': rng.choice(VENDORS),
+        'status': 'active',
+        'ports': sorted(rng.sample(PORTS, rng.randrange(0, 5))),
+        'hostname': f'host-{i}' if rng.random() < 0.3 else '',
+        'type': rng.choice(TYPES),
+        'first_seen': 1700000000.0 + i,
+        'last_seen': 1700003600.0 + i,
+    } for i in range(count)]
+
+
+def measure(build):
+    """(result, bytes it holds, build seconds); timed separately since tracing slows allocation"""
+    elapsed = timed(build, 1)
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=65536)
+    args = parser.parse_args()
+
+    source = synthetic_devices(args.devices)
+    dicts, dict_bytes, dict_build = measure(lambda: [dict(d, ports=list(d['ports'])) for d in source])
+    table, table_bytes, table_build = measure(lambda: DeviceTable(source))
+
+    def dict_filter():
+        return [d for d in dicts
+                if d['ip'].startswith('10.0.') and 22 in d['ports'] and d['type'] == 'Computer']
+
+    def table_filter():
+        return table.in_subnet('10.0.0.0/16') & table.with_port(22) & table.of_type('Computer')
+
+    assert len(dict_filter()) == int(table_filter().sum())
+    gateways = timed(lambda: [d for d in dicts if d['ip'].endswith('.1')]), timed(table.gateways)
+
+    print(f"{args.devices} devices")
+    print(f"{'':24}{'dicts':>12}{'DeviceTable':>14}")
+    print(f"{'memory (MiB)':24}{dict_bytes / 2**20:12.1f}{table_bytes / 2**20:14.1f}")
+    print(f"{'build (ms)':24}{dict_build * 1e3:12.1f}{table_build * 1e3:14.1f}")
+    print(f"{'subnet+port+type (ms)':24}{timed(dict_filter) * 1e3:12.2f}{timed(table_filter) * 1e3:14.2f}")
+    print(f"{'gateways (ms)':24}{gateways[0] * 1e3:12.2f}{gateways[1] * 1e3:14.2f}")
+    print(f"{'to dicts (ms)':24}{'-':>12}{timed(table.to_dicts, 1) * 1e3:14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Payload size and latency of /api/devices pages against the full device list.
+
+Builds a DeviceTable of --devices synthetic devices and runs the work the
+endpoint does per request (filter, page, project, encode, compress) for a
+few typical queries, next to the baseline of serialising every device as
+one JSON array. Sizes are in KiB, times are the median over --repeat runs.
+MessagePack and brotli rows appear only when those packages are installed.
+
+Run from the repository root:
+
+    python benchmarks/bench_devices_api.py [--devices 10000] [--limit 500] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import device_query
+from backend.device_query import DeviceQuery, compress, encode, etag
+from backend.device_table import DeviceTable
+from bench_device_table import synthetic_devices
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1e3
+
+
+def report(label, make_body, repeat):
+    """One line per format and coding: size and time from the table to the bytes on the wire"""
+    for fmt in device_query.formats():
+        for coding in [None] + device_query.content_codings():
+            size = len(compress(make_body(fmt), coding))
+            elapsed = median_ms(lambda: compress(make_body(fmt), coding), repeat)
+            print(f"{label:<28} {fmt:<8} {coding or 'identity':<9} {size / 1024:10.1f} {elapsed:10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    devices = synthetic_devices(args.devices)
+    table = DeviceTable(devices)
+    queries = {
+        f'page of {args.limit}': DeviceQuery(limit=args.limit),
+        f'page of {args.limit}, ip+type': DeviceQuery(limit=args.limit, fields=['ip', 'type']),
+        'printers with 9100 open': DeviceQuery(types=['Printer'], ports=[9100], limit=args.limit),
+        'one /24': DeviceQuery(subnets=['10.0.7.0/24'], limit=args.limit),
+    }
+
+    print(f"{args.devices} devices")
+    print(f"{'request':<28} {'format':<8} {'coding':<9} {'KiB':>10} {'ms':>10}")
+    # What /api/scan hands the client today: every device in one array
+    report('full list', lambda fmt: encode({'devices': table.to_dicts()}, fmt), max(1, args.repeat // 4))
+    for label, query in queries.items():
+        report(label, lambda fmt, query=query: encode(query.page(table), fmt), args.repeat)
+
+    def walk():
+        cursor, pages = None, 0
+        while True:
+            page = DeviceQuery(limit=args.limit, cursor=cursor).page(table)
+            encode(page)
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                return pages
+    pages = walk()
+    elapsed = median_ms(walk, max(1, args.repeat // 4))
+    print(f"walking all {pages} pages: {elapsed:.1f} ms ({elapsed / pages:.2f} ms/page)")
+    revalidate = median_ms(lambda: etag('scan:bench', queries[f'page of {args.limit}'], 'json', 'gzip'),
+                           args.repeat * 10)
+    print(f"304 revalidation (ETag only): {revalidate * 1e3:.1f} us")
+    print(f"json of full list: {len(json.dumps(devices)) / 1024:.1f} KiB before compact separators")
+
+
+if __name__ == '__main__':
+    main()
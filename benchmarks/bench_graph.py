@@ -0,0 +1,63 @@
+"""Graph construction, layout and render cost at increasing network sizes.
+
+Run from the repository root:
+
+    python benchmarks/bench_graph.py [--sizes 100 1000 10000] [--render]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.graph_generator import LAYOUTS, THUMBNAIL_SIZE, build_graph, compute_layout, render_image
+
+TYPES = ['Computer', 'IoT Device', 'Printer', 'Apple Device', 'Android Device', 'Media Device']
+
+
+def synthetic_devices(count):
+    devices = [{'ip': '10.0.0.1', 'vendor': 'Gateway', 'type': 'Router'}]
+    for i in range(count - 1):
+        devices.append({
+            'ip': f'10.{(i // 62500) % 256}.{(i // 250) % 250}.{i % 250 + 2}',
+            'vendor': 'Unknown',
+            'hostname': f'host-{i}',
+            'type': TYPES[i % len(TYPES)],
+        })
+    return devices
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--spring-limit', type=int, default=500,
+                        help='skip the networkx spring layout above this many nodes (it needs scipy beyond 500)')
+    parser.add_argument('--render', action='store_true', help='also time a thumbnail PNG render')
+    args = parser.parse_args()
+
+    print(f"{'nodes':>7} {'build':>9} " + ' '.join(f'{name:>9}' for name in LAYOUTS[1:])
+          + (f" {'render':>9}" if args.render else ''))
+    for size in args.sizes:
+        devices = synthetic_devices(size)
+        graph = build_graph(devices)
+        row = [f'{timed(lambda: build_graph(devices)):9.3f}']
+        for layout in LAYOUTS[1:]:
+            if layout == 'spring' and size > args.spring_limit:
+                row.append(f"{'-':>9}")
+                continue
+            row.append(f'{timed(lambda: compute_layout(graph, layout)):9.3f}')
+        if args.render:
+            row.append(f"{timed(lambda: render_image(devices, 'png', **THUMBNAIL_SIZE)):9.3f}")
+        print(f'{size:>7} ' + ' '.join(row))
+    print('times in seconds')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Per-device cost of DeviceIdentifier on synthetic records.
+
+Run from the repository root:
+
+    python benchmarks/bench_identifier.py [--records 100000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.device_identifier import DeviceIdentifier
+
+VENDORS = ['Apple Inc.', 'Samsung Electronics', 'Hewlett Packard', 'TP-LINK', 'Raspberry Pi Foundation',
+           'Espressif Inc.', 'Sony Interactive', 'Amazon Technologies', 'Google LLC', 'Hikvision',
+           'VMware, Inc.', 'Synology', 'Sonos', 'Unknown', '']
+HOSTNAMES = ['', '', 'office-printer', 'ipcam-02', 'xbox-one', 'ps5', 'pixel-phone', 'macbook-pro',
+             'nas01', 'gw', 'core-switch', 'raspberrypi', 'vm-build', 'host']
+PORTS = [21, 22, 25, 53, 80, 123, 139, 443, 445, 548, 1883, 3389, 5009, 8009, 8080, 32400, 62078]
+MACS = ['', '00:0c:29:aa:bb:cc', '01:00:5e:00:00:fb', 'b8:27:eb:12:34:56', 'ff:ff:ff:ff:ff:ff']
+
+
+def synthetic_devices(count, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'ip': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+        'mac': rng.choice(MACS),
+        'vendor': rng.choice(VENDORS),
+        'hostname': rng.choice(HOSTNAMES) + (str(rng.randrange(50)) if rng.random() < 0.3 else ''),
+        'ports': sorted(rng.sample(PORTS, rng.randrange(0, 5))),
+    } for _ in range(count)]
+
+
+def uncompiled_identify(identifier, device_info):
+    """The previous per-call implementation: one re.search per pattern"""
+    ip = device_info.get('ip', '')
+    mac = device_info.get('mac', '').lower()
+    vendor = device_info.get('vendor', '').lower()
+    ports = device_info.get('ports', [])
+    hostname = device_info.get('hostname', '').lower()
+    if (ip.endswith('.1') or ip.endswith('.254')) and any(port in ports for port in [53, 80, 443]):
+        return 'Router'
+    for pattern, device_type in dict(identifier.hostname_patterns).items():
+        if re.search(pattern, hostname):
+            return device_type
+    for pattern, device_type in identifier.vendor_patterns.items():
+        if re.search(pattern.lower(), vendor):
+            return device_type
+    ports_set = set(ports)
+    for signature_ports, device_type in identifier.port_signatures:
+        if ports and all(port in ports_set for port in signature_ports):
+            return device_type
+    mac_type = identifier._analyze_mac_prefix(mac)
+    if mac_type:
+        return mac_type
+    if ports:
+        if 80 in ports or 443 in ports:
+            return 'Web Server'
+        if 22 in ports:
+            return 'Network Device'
+        if set([139, 445]).intersection(ports):
+            return 'Windows Device'
+    if len(ports) > 5:
+        return 'Server'
+    return 'Unknown Device'
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:8.3f} s  {elapsed / count * 1e6:8.2f} us/device")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    devices = synthetic_devices(args.records)
+    identifier = DeviceIdentifier()
+    print(f"{args.records} synthetic devices")
+
+    baseline = timed('uncompiled, one pattern at a time', args.records,
+                     lambda: [uncompiled_identify(identifier, d) for d in devices])
+
+    identifier.clear_cache()
+    single = timed('identify_device (cold caches)', args.records,
+                   lambda: [identifier.identify_device(d) for d in devices])
+    timed('identify_device (warm caches)', args.records,
+          lambda: [identifier.identify_device(d) for d in devices])
+
+    identifier.clear_cache()
+    batch = timed('identify_many (cold caches)', args.records, lambda: identifier.identify_many(devices))
+    timed('identify_many (warm caches)', args.records, lambda: identifier.identify_many(devices))
+
+    assert baseline == single == batch, "classification results differ"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Cold import time of the API module, against a budget.
+
+Each run imports api in a fresh interpreter under `python -X importtime`
+with the monitor disabled and a scratch inventory, then reports the
+median total and the modules with the largest cumulative import time.
+It exits non-zero when the median is over the budget, so it can gate CI.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py [--module api] [--runs 5] [--budget-ms 500] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+
+def import_times(module, env):
+    """(total microseconds, {package: cumulative microseconds}) of one cold import.
+
+    Packages are the ones imported by the module itself and by the interpreter
+    at startup; anything they import is counted in their time.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BACKEND, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    total = 0
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            total += int(cumulative)
+        if (depth == 0 and name != module) or (depth == 1 and name.split('.')[0] != module):
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + int(cumulative)
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='api')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, NETMAP_MONITOR_INTERVAL='0',
+                   NETMAP_INVENTORY=os.path.join(scratch, 'inventory.db'))
+        runs = [import_times(args.module, env) for _ in range(args.runs)]
+
+    median = statistics.median(total for total, _ in runs) / 1e3
+    slowest = {}
+    for _, packages in runs:
+        for name, spent in packages.items():
+            slowest.setdefault(name, []).append(spent)
+    ranked = sorted(((statistics.median(v) / 1e3, k) for k, v in slowest.items()), reverse=True)
+
+    print(f"import {args.module}: median {median:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"{'ms':>8}  module")
+    for spent, name in ranked[:args.top]:
+        print(f"{spent:8.1f}  {name}")
+    if median > args.budget_ms:
+        print(f"OVER BUDGET by {median - args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
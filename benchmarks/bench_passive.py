@@ -0,0 +1,87 @@
+"""Passive discovery throughput on synthetic pcap files.
+
+Each run writes a pcap of --packets frames, of which --discovery is the
+fraction of ARP, DHCP, mDNS, SSDP and NetBIOS frames copied from the
+bundled fixture with their source MAC spread over --hosts hosts; the
+rest are TCP frames that must be skipped. It then streams the file
+through read_capture and PassiveDiscovery and reports packets/s, MB/s
+and the tracemalloc peak, which stays flat as the file grows.
+
+Run from the repository root:
+
+    python benchmarks/bench_passive.py [--packets 1000000] [--discovery 0.05 0.5 1.0]
+                                       [--hosts 5000] [--no-memory]
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.passive import PassiveDiscovery, read_capture
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'tests', 'fixtures', 'passive_lan.pcap')
+# 192.168.1.50 -> 93.184.216.34, TCP SYN to 443
+OTHER = bytes.fromhex(
+    'ac84c6000001d4bed90000500800450000280001000040065c3ac0a80132'
+    '5db8d822c351 01bb000000000000000050022000d5a30000'.replace(' ', ''))
+
+
+def write_capture(path, packets, discovery, hosts):
+    templates = [frame for _, _, frame in read_capture(FIXTURE)
+                 if frame[12:14] == b'\x08\x06' or frame[23:24] == b'\x11']
+    every = round(1 / discovery) if discovery else 0
+    record = struct.Struct('<IIII')
+    with open(path, 'wb', buffering=1 << 20) as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for n in range(packets):
+            if every and n % every == 0:
+                frame = bytearray(templates[(n // every) % len(templates)])
+                frame[6:12] = (0x020000000000 + n // every % hosts).to_bytes(6, 'big')
+            else:
+                frame = OTHER
+            f.write(record.pack(1700000000 + n // 100000, n % 100000 * 10, len(frame), len(frame)))
+            f.write(frame)
+    return os.path.getsize(path)
+
+
+def run(path, trace=False):
+    discovery = PassiveDiscovery()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    discovery.feed_capture(read_capture(path))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    return discovery.stats(), elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=1000000)
+    parser.add_argument('--discovery', type=float, nargs='+', default=[0.05, 0.5, 1.0],
+                        help='fraction of frames from discovery protocols')
+    parser.add_argument('--hosts', type=int, default=5000)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run')
+    args = parser.parse_args()
+
+    print(f"{'discovery':>9} {'MB':>7} {'hosts':>6} {'seconds':>8} {'packets/s':>10} {'MB/s':>7} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for fraction in args.discovery:
+            path = os.path.join(scratch, 'capture.pcap')
+            size = write_capture(path, args.packets, fraction, args.hosts)
+            stats, elapsed, _ = run(path)
+            peak = 0 if args.no_memory else run(path, trace=True)[2]
+            print(f"{fraction:9.0%} {size / 1e6:7.1f} {stats['hosts']:>6} {elapsed:8.2f} "
+                  f"{stats['packets'] / elapsed:10,.0f} {size / 1e6 / elapsed:7.1f} {peak / 2 ** 20:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Probes sent against open ports found, fixed port list versus adaptive port selection.
+
+Scans a SimulatedNetwork --rounds times per strategy, each strategy with
+its own fresh inventory, then once more over a network it has not seen
+(another seed, same device mix). 'fixed' probes the four common ports on
+every host and deep scans 20-1024 on hosts with one open; 'adaptive-N'
+probes the N ports a PortSelector ranks likeliest per host and deep scans
+its top ports. Probes exclude the ARP sweep. Found is the share of every
+discovered host's open ports the scan reported.
+
+The simulated deep scan reports every open port when run over 20-1024,
+including those above 1024 that nmap would not reach there, so the fixed
+row is a generous baseline.
+
+Run from the repository root:
+
+    python benchmarks/bench_port_selection.py [--hosts 500] [--rounds 4] [--budgets 4 8 12]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.device_identifier import DeviceIdentifier
+from backend.inventory import DeviceInventory
+from backend.network_scanner import NetworkScanner
+from backend.scan_backends import SimulatedNetwork
+from bench_scan import network_for
+
+
+def scan(scanner, network):
+    """(probes sent, ports found, open ports, seconds) of one scan"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        alive = scanner.liveness_sweep()
+        sent = network.probes_sent
+        started = time.perf_counter()
+        devices = list(scanner.fingerprint_hosts(alive))
+        elapsed = time.perf_counter() - started
+    found = sum(len(set(device['ports']) & set(network.hosts[device['ip']].ports)) for device in devices)
+    total = sum(len(network.hosts[ip].ports) for ip in alive)
+    return network.probes_sent - sent, found, total, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[4, 8, 12])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.001, help='mean round trip in seconds')
+    args = parser.parse_args()
+
+    def make_network(seed):
+        return SimulatedNetwork(hosts=args.hosts, network=network_for(args.hosts), seed=seed,
+                                latency=args.latency, arp_timeout=0.01, nmap_chunk_time=0.0)
+
+    strategies = [('fixed', 'fixed', None)] + [(f'adaptive-{budget}', 'adaptive', budget)
+                                               for budget in args.budgets]
+    identifier = DeviceIdentifier()
+    print(f"{args.hosts} hosts, {args.rounds} rounds")
+    print(f"{'strategy':<12} {'scan':<7} {'probes':>9} {'per host':>9} {'found':>7} {'ports/1k probes':>16} {'s':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, selection, budget in strategies:
+            inventory = DeviceInventory(os.path.join(directory, f'{label}.db'))
+            network = make_network(args.seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                scanner = NetworkScanner(backend=network, mode='full', inventory=inventory, banners=False,
+                                         port_selection=selection, probe_budget=budget or 8)
+            if scanner.port_selector is not None:
+                scanner.port_selector.classify = identifier.identify_device
+            runs = [(str(n + 1), network) for n in range(args.rounds)] + [('unseen', make_network(args.seed + 1))]
+            for name, target in runs:
+                scanner.backend = target
+                probes, found, total, elapsed = scan(scanner, target)
+                print(f"{label:<12} {name:<7} {probes:>9} {probes / args.hosts:>9.1f} {found / max(total, 1):>7.1%} "
+                      f"{found * 1000 / max(probes, 1):>16.1f} {elapsed:>7.2f}")
+            inventory.close()
+
+
+if __name__ == '__main__':
+    main()
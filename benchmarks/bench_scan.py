@@ -0,0 +1,101 @@
+"""End-to-end scan time, per-stage latency and memory on a simulated network, per port engine.
+
+Every run scans a SimulatedNetwork, so results are reproducible and no
+packets leave the machine. Stage times are wall-clock seconds spent in
+each NetworkScanner stage; 'hosts' is the per-host merge that follows
+them. Memory is the tracemalloc peak of a separate run, since tracing
+slows the scan down.
+
+Run from the repository root:
+
+    python benchmarks/bench_scan.py [--hosts 1000 10000] [--engines async threaded]
+                                    [--latency 0.002] [--loss 0.01] [--no-memory]
+"""
+import argparse
+import contextlib
+import io
+import ipaddress
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.network_scanner import NetworkScanner
+from backend.scan_backends import SimulatedNetwork
+
+STAGES = ('_arp_sweep_all', '_probe_ports', '_resolve_hostnames', '_nmap_stage', '_grab_banners')
+STAGE_NAMES = ('arp', 'ports', 'dns', 'nmap', 'banners')
+
+
+def network_for(hosts):
+    """Smallest 10.0.0.0 block holding hosts at a quarter occupancy"""
+    prefix = 32 - max(8, math.ceil(math.log2(hosts * 4)))
+    return str(ipaddress.IPv4Network(f'10.0.0.0/{prefix}'))
+
+
+def timed_scanner(scanner):
+    """Wrap the scanner's stage methods so each accumulates its wall-clock time"""
+    spent = dict.fromkeys(STAGES, 0.0)
+
+    def wrap(name):
+        method = getattr(scanner, name)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                spent[name] += time.perf_counter() - started
+        setattr(scanner, name, timed)
+
+    for name in STAGES:
+        wrap(name)
+    return spent
+
+
+def run(hosts, engine, args, trace=False):
+    network = SimulatedNetwork(hosts=hosts, network=network_for(hosts), seed=args.seed,
+                               latency=args.latency, loss=args.loss)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scanner = NetworkScanner(backend=network, engine=engine, mode='full')
+        spent = timed_scanner(scanner)
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        devices = scanner.scan_network()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        if trace:
+            tracemalloc.stop()
+    return len(devices), elapsed, spent, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--engines', nargs='+', default=['async', 'threaded'], choices=['async', 'threaded'])
+    parser.add_argument('--latency', type=float, default=0.002, help='mean round trip in seconds')
+    parser.add_argument('--loss', type=float, default=0.01, help='probability a probe is dropped')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run')
+    args = parser.parse_args()
+
+    header = ''.join(f'{name:>9}' for name in STAGE_NAMES)
+    print(f"latency {args.latency * 1e3:.1f} ms, loss {args.loss:.1%}")
+    print(f"{'hosts':>7} {'engine':>9} {'found':>7} {'total s':>8}{header}{'hosts':>9} {'peak MiB':>9}")
+    for hosts in args.hosts:
+        for engine in args.engines:
+            found, elapsed, spent, _ = run(hosts, engine, args)
+            peak = 0 if args.no_memory else run(hosts, engine, args, trace=True)[3]
+            stages = ''.join(f'{spent[name]:9.2f}' for name in STAGES)
+            # The ARP sweep runs before the per-range loop; DNS overlaps the port probe
+            merge = elapsed - sum(spent.values()) + spent['_resolve_hostnames']
+            print(f"{hosts:>7} {engine:>9} {found:>7} {elapsed:8.2f}{stages}{merge:9.2f} "
+                  f"{peak / 2 ** 20:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
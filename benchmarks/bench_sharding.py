@@ -0,0 +1,120 @@
+"""Sharded scan throughput against a simulated responder, by number of worker processes.
+
+Every /24 shard answers with a fixed set of hosts. The simulated ARP stage
+builds and parses real reply frames and waits out a reply window; the
+nmap stage parses generated nmap XML, so each shard costs both CPU and
+network wait like a real one.
+
+Run from the repository root:
+
+    python benchmarks/bench_sharding.py [--shards 16] [--hosts 200] [--processes 1 2 4]
+"""
+import argparse
+import ipaddress
+import os
+import socket
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.arp_engine import build_request_template, parse_reply
+from backend.nmap_stage import parse_nmap_xml
+from backend.network_scanner import NetworkScanner
+from backend.sharding import ShardedScanner
+
+REPLY_WINDOW = 0.2  # seconds the simulated ARP sweep waits for replies
+PORTS = [22, 53, 80, 139, 443, 445, 631, 3389, 8080, 9100]
+
+
+def _responders(shard, hosts):
+    network = ipaddress.IPv4Network(shard)
+    return [str(ip) for ip in list(network.hosts())[:hosts]]
+
+
+def _mac(ip):
+    return '02:' + ':'.join(f'{b:02x}' for b in zlib.crc32(ip.encode()).to_bytes(4, 'big')) + ':01'
+
+
+def _nmap_xml(ips):
+    hosts = []
+    for ip in ips:
+        seed = zlib.crc32(ip.encode())
+        ports = ''.join(
+            f'<port protocol="tcp" portid="{port}"><state state="{"open" if seed >> i & 1 else "closed"}" '
+            f'reason="syn-ack"/><service name="svc"/></port>'
+            for i, port in enumerate(PORTS))
+        hosts.append(f'<host><status state="up"/><address addr="{ip}" addrtype="ipv4"/>'
+                     f'<address addr="{_mac(ip).upper()}" addrtype="mac" vendor="Simulated"/>'
+                     f'<hostnames><hostname name="h{seed % 1000}.sim"/></hostnames><ports>{ports}</ports></host>')
+    return f'<nmaprun>{"".join(hosts)}</nmaprun>'
+
+
+class SimulatedScanner(NetworkScanner):
+    """NetworkScanner whose network I/O is answered by a deterministic simulated LAN"""
+
+    hosts_per_shard = 200
+
+    def __init__(self, **kwargs):
+        sys.stdout = open(os.devnull, 'w')  # keep worker progress output out of the report
+        super().__init__('10.0.0.0/24', mode='full', **kwargs)
+
+    def clear_arp_cache(self):
+        pass
+
+    def _scan_ip_range_arp(self, ip_range):
+        found = {}
+        for ip in _responders(ip_range, self.hosts_per_shard):
+            frame = bytearray(build_request_template(bytes.fromhex(_mac(ip).replace(':', '')),
+                                                     socket.inet_aton(ip)))
+            frame[20:22] = b'\x00\x02'
+            reply_ip, mac = parse_reply(bytes(frame))
+            found[reply_ip] = mac
+        time.sleep(REPLY_WINDOW)
+        return found
+
+    def _probe_ports(self, ips):
+        return {ip: [PORTS[zlib.crc32(ip.encode()) % len(PORTS)]] for ip in ips}
+
+    def _resolve_hostnames(self, ips):
+        for ip in ips:
+            self.resolver.cache.put(ip, '', 3600)
+        return {}
+
+    def _nmap_stage(self, ips, port_results):
+        return parse_nmap_xml(_nmap_xml(sorted(ips)))
+
+    def _grab_banners(self, targets):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', type=int, default=16, help='number of /24 shards')
+    parser.add_argument('--hosts', type=int, default=200, help='responders per shard')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    SimulatedScanner.hosts_per_shard = args.hosts
+    network = ipaddress.IPv4Network('10.0.0.0/16')
+    ranges = [str(subnet) for subnet in list(network.subnets(new_prefix=24))[:args.shards]]
+    expected = args.shards * min(args.hosts, 254)
+
+    print(f"{args.shards} shards x {args.hosts} hosts, {os.cpu_count()} CPUs")
+    print(f"{'processes':>9} {'seconds':>9} {'hosts/s':>9} {'speedup':>8}")
+    baseline = None
+    for processes in args.processes:
+        with ShardedScanner(ranges, processes=processes, scanner_path='bench_sharding.SimulatedScanner',
+                            options={'rate_limiter_options': {'global_pps': 10 ** 9, 'range_pps': 10 ** 9}}) as sharded:
+            sharded.scan_network()  # start the workers outside the timed run
+            started = time.perf_counter()
+            devices = sharded.scan_network()
+            elapsed = time.perf_counter() - started
+        assert len(devices) == expected, (len(devices), expected)
+        baseline = baseline or elapsed
+        print(f"{processes:>9} {elapsed:9.2f} {len(devices) / elapsed:9.0f} {baseline / elapsed:7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,48 @@
-import React, { useEffect, useRef } from "react";
+import React, { useEffect, useMemo, useState } from "react";
 import { Card } from "./ui/card";
 
+const API_URL = "http://localhost:5000";
+const WIDTH = 1000;
+const HEIGHT = 700;
+const NODE_RADIUS = 18;
+
+// Router in the middle, every other device on concentric rings around it
+const radialLayout = (nodes) => {
+  const positions = {};
+  const center = { x: WIDTH / 2, y: HEIGHT / 2 };
+  const [router, ...others] = nodes;
+  if (!router) return positions;
+  positions[router.id] = center;
+
+  const perRing = 24;
+  others.forEach((node, index) => {
+    const ring = Math.floor(index / perRing);
+    const ringSize = Math.min(perRing, others.length - ring * perRing);
+    const angle = ((index % perRing) / ringSize) * 2 * Math.PI;
+    const radius = 160 + ring * 90;
+    positions[node.id] = {
+      x: center.x + radius * Math.cos(angle),
+      y: center.y + radius * Math.sin(angle),
+    };
+  });
+  return positions;
+};
+
 export const NetworkGraph = ({ devices }) => {
-  const graphRef = useRef(null);
+  const [graph, setGraph] = useState({ nodes: [], edges: [] });
+  const [etag, setEtag] = useState(null);
 
   useEffect(() => {
     const loadGraph = async () => {
       try {
-        const response = await fetch("http://localhost:5000/api/graph");
-        const blob = await response.blob();
-        const url = URL.createObjectURL(blob);
-        if (graphRef.current) {
-          graphRef.current.src = url;
-        }
-        return () => URL.revokeObjectURL(url);
+        const headers = etag ? { "If-None-Match": etag } : {};
+        const response = await fetch(`${API_URL}/api/graph?format=json`, {
+          headers,
+        });
+        // 202 means the first scan is still running; the next device update retries
+        if (response.status === 304 || response.status === 202 || !response.ok) return;
+        setEtag(response.headers.get("ETag"));
+        setGraph(await response.json());
       } catch (error) {
         console.error("Failed to load graph:", error);
       }
@@ -24,6 +53,8 @@ export const NetworkGraph = ({ devices }) => {
     }
   }, [devices]);
 
+  const positions = useMemo(() => radialLayout(graph.nodes), [graph]);
+
   if (!devices.length) {
     return (
       <div className="text-center py-8 text-muted-foreground">
@@ -34,12 +65,47 @@ export const NetworkGraph = ({ devices }) => {
 
   return (
     <Card className="p-4">
-      <img
-        ref={graphRef}
-        alt="Network Graph"
+      <svg
+        viewBox={`0 0 ${WIDTH} ${HEIGHT}`}
         className="w-full h-auto"
         style={{ minHeight: "400px" }}
-      />
+      >
+        {graph.edges.map((edge) => {
+          const source = positions[edge.source];
+          const target = positions[edge.target];
+          if (!source || !target) return null;
+          return (
+            <line
+              key={`${edge.source}-${edge.target}`}
+              x1={source.x}
+              y1={source.y}
+              x2={target.x}
+              y2={target.y}
+              stroke="#2f3640"
+              strokeOpacity={0.4}
+              strokeWidth={1.5}
+            />
+          );
+        })}
+        {graph.nodes.map((node) => {
+          const position = positions[node.id];
+          if (!position) return null;
+          return (
+            <g key={node.id} transform={`translate(${position.x},${position.y})`}>
+              <title>{node.label}</title>
+              <circle r={NODE_RADIUS} fill={node.color} fillOpacity={0.8} />
+              <text
+                y={NODE_RADIUS + 12}
+                textAnchor="middle"
+                fontSize="10"
+                className="fill-current"
+              >
+                {node.id}
+              </text>
+            </g>
+          );
+        })}
+      </svg>
     </Card>
   );
 };
@@ -1,4 +1,5 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
+import { io } from "socket.io-client";
 import { Card, CardHeader, CardContent } from "./ui/card";
 import { Button } from "./ui/button";
 import { Alert, AlertDescription } from "./ui/alert";
@@ -16,13 +17,80 @@ import { NetworkGraph } from "./NetworkGraph";
 import { format } from "date-fns";
 import { useTheme } from "./theme-provider";
 
+const API_URL = "http://localhost:5000";
+
 const NetworkMapper = () => {
   const [devices, setDevices] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [lastScan, setLastScan] = useState(null);
   const [activeView, setActiveView] = useState("list");
+  const [progress, setProgress] = useState(null);
   const { theme, setTheme } = useTheme();
+  const socketRef = useRef(null);
+  const scanIdRef = useRef(null);
+  // Scan events that arrive before /api/scan has said which scan is ours
+  const bufferedRef = useRef(null);
+  const startScanRef = useRef(() => {});
+
+  useEffect(() => {
+    const socket = io(API_URL);
+    socketRef.current = socket;
+
+    const scanEvents = {
+      device_found: (data) =>
+        setDevices((prev) =>
+          prev.some((d) => d.ip === data.device.ip)
+            ? prev
+            : [...prev, data.device]
+        ),
+      scan_progress: (data) => setProgress(data),
+      scan_complete: (data) => {
+        setLoading(false);
+        setProgress(null);
+        setLastScan(new Date());
+        if (data.device_count === 0) {
+          setError("No devices found on the network");
+        }
+      },
+      scan_error: (data) => {
+        setProgress(null);
+        handleError(new Error(data.error));
+      },
+    };
+    Object.entries(scanEvents).forEach(([event, handle]) => {
+      socket.on(event, (data) => {
+        if (bufferedRef.current) {
+          bufferedRef.current.push([event, data]);
+        } else if (data.scan_id === scanIdRef.current) {
+          handle(data);
+        }
+      });
+    });
+    // Adopt the scan id and replay what was buffered while the request was in flight
+    startScanRef.current = (scanId) => {
+      const buffered = bufferedRef.current || [];
+      bufferedRef.current = null;
+      scanIdRef.current = scanId;
+      buffered
+        .filter(([, data]) => data.scan_id === scanId)
+        .forEach(([event, data]) => scanEvents[event](data));
+    };
+
+    // Background monitor changes apply whichever scan is on screen
+    const upsertDevice = (data) =>
+      setDevices((prev) => [
+        ...prev.filter((d) => d.ip !== data.device.ip),
+        data.device,
+      ]);
+    socket.on("device_joined", upsertDevice);
+    socket.on("device_changed", upsertDevice);
+    socket.on("device_left", (data) => {
+      setDevices((prev) => prev.filter((d) => d.ip !== data.device.ip));
+    });
+
+    return () => socket.disconnect();
+  }, []);
 
   const handleError = (error) => {
     console.error("Error:", error);
@@ -33,32 +101,37 @@ const NetworkMapper = () => {
   const scanNetwork = async () => {
     setLoading(true);
     setError(null);
+    setDevices([]);
+    setProgress(null);
+    scanIdRef.current = null;
+    bufferedRef.current = [];
     try {
-      const response = await fetch("http://localhost:5000/api/scan");
+      const response = await fetch(`${API_URL}/api/scan`);
+      const data = await response.json();
       if (!response.ok) {
-        const data = await response.json();
         throw new Error(
           data.error || `Network scan failed with status: ${response.status}`
         );
       }
-      const data = await response.json();
-      if (Array.isArray(data) && data.length > 0) {
-        setDevices(data);
-        setLastScan(new Date());
-      } else {
-        setDevices([]);
-        setError("No devices found on the network");
+      // Devices arrive through the device_found socket events; when joining
+      // a sweep that is already running, start from what it has found so far
+      if (data.coalesced) {
+        setDevices(data.devices || []);
+        setProgress(data.progress);
       }
+      startScanRef.current(data.scan_id);
     } catch (error) {
+      bufferedRef.current = null;
       handleError(error);
-    } finally {
-      setLoading(false);
     }
   };
 
   const downloadGraph = async () => {
     try {
-      const response = await fetch("http://localhost:5000/api/graph");
+      const response = await fetch(`${API_URL}/api/graph`);
+      if (response.status === 202) {
+        throw new Error("The first scan is still running, try again shortly");
+      }
       if (!response.ok) {
         const data = await response.json();
         throw new Error(data.error || "Failed to download network map");
@@ -156,9 +229,20 @@ const NetworkMapper = () => {
               </Alert>
             )}
 
+            {progress && (
+              <p className="text-sm text-muted-foreground mb-4">
+                Scanning {progress.range}: {progress.stage}
+                {progress.total > 0 &&
+                  ` (${progress.completed}/${progress.total} hosts)`}
+              </p>
+            )}
+
             <div className="bg-card rounded-lg p-4">
               {activeView === "list" ? (
-                <DeviceList devices={devices} loading={loading} />
+                <DeviceList
+                  devices={devices}
+                  loading={loading && !devices.length}
+                />
               ) : (
                 <NetworkGraph devices={devices} />
               )}
@@ -0,0 +1,83 @@
+import os
+import shutil
+import socket
+import subprocess
+import pytest
+from backend import arp_engine
+from backend.arp_engine import RawArpSweeper, build_request_template, parse_reply
+
+def test_request_template():
+    frame = build_request_template(bytes.fromhex('020000000001'), socket.inet_aton('10.0.0.1'))
+    assert len(frame) == 42
+    assert frame[:6] == b'\xff' * 6
+    assert frame[12:14] == b'\x08\x06'
+    assert frame[20:22] == b'\x00\x01'  # who-has
+    assert frame[28:32] == socket.inet_aton('10.0.0.1')
+
+def test_parse_reply():
+    reply = bytearray(build_request_template(bytes.fromhex('aabbccddeeff'), socket.inet_aton('10.0.0.7')))
+    reply[20:22] = b'\x00\x02'
+    assert parse_reply(bytes(reply)) == ('10.0.0.7', 'aa:bb:cc:dd:ee:ff')
+    # Requests and non-ARP frames are ignored
+    assert parse_reply(bytes(build_request_template(b'\x00' * 6, b'\x00' * 4))) is None
+    assert parse_reply(b'\x00' * 60) is None
+
+def test_interface_listing_is_cached(monkeypatch):
+    import psutil
+    calls = []
+    real = psutil.net_if_addrs
+
+    def counting():
+        calls.append(1)
+        return real()
+    monkeypatch.setattr(psutil, 'net_if_addrs', counting)
+    monkeypatch.setattr(arp_engine, '_interfaces', None)
+    first = arp_engine.local_interfaces()
+    assert arp_engine.local_interfaces() is first
+    assert len(calls) == 1
+    arp_engine.local_interfaces(max_age=0)
+    assert len(calls) == 2
+
+def _ip(*args):
+    return subprocess.run(['ip'] + list(args), capture_output=True, text=True)
+
+@pytest.fixture
+def veth_pair():
+    """A veth pair standing in for a LAN segment: the kernel answers ARP on the peer side"""
+    if not shutil.which('ip') or not RawArpSweeper.supported():
+        pytest.skip("Needs iproute2 and raw socket privileges")
+    local, peer = f'nmt{os.getpid() % 10000}a', f'nmt{os.getpid() % 10000}b'
+    if _ip('link', 'add', local, 'type', 'veth', 'peer', 'name', peer).returncode != 0:
+        pytest.skip("Cannot create veth pair")
+    try:
+        _ip('addr', 'add', '10.254.7.2/24', 'dev', peer)
+        _ip('addr', 'add', '10.254.7.3/24', 'dev', peer)
+        _ip('link', 'set', local, 'up')
+        _ip('link', 'set', peer, 'up')
+        with open(f'/sys/class/net/{local}/address') as f:
+            local_mac = f.read().strip()
+        with open(f'/sys/class/net/{peer}/address') as f:
+            peer_mac = f.read().strip()
+        yield local, local_mac, peer_mac
+    finally:
+        _ip('link', 'del', local)
+
+def test_sweep_over_veth(veth_pair):
+    interface, local_mac, peer_mac = veth_pair
+    sweeper = RawArpSweeper(interface, local_mac, '10.254.7.1', rate_pps=2000,
+                            retries=1, reply_timeout=0.5)
+    found = sweeper.sweep_range('10.254.7.0/28')
+    assert found == {'10.254.7.2': peer_mac, '10.254.7.3': peer_mac}
+
+def test_rate_limited_sweep_records_metrics(veth_pair):
+    from backend.rate_control import ScanRateLimiter
+    interface, local_mac, peer_mac = veth_pair
+    limiter = ScanRateLimiter(global_pps=500, range_pps=500)
+    limiter.add_range('10.254.7.0/24')
+    sweeper = RawArpSweeper(interface, local_mac, '10.254.7.1', retries=0, reply_timeout=0.5,
+                            rate_limiter=limiter)
+    assert sweeper.sweep_range('10.254.7.0/28') == {'10.254.7.2': peer_mac, '10.254.7.3': peer_mac}
+    stats = limiter.snapshot()['arp']
+    assert stats['sent'] == 14
+    assert stats['answered'] == 2
+    assert stats['lost'] == 0
@@ -0,0 +1,120 @@
+import socket
+import threading
+import time
+import pytest
+from backend.banner_grabber import PROBES, BannerGrabber, SignatureIndex, banner_summary
+from backend.device_identifier import DeviceIdentifier
+from backend.rate_control import ScanRateLimiter
+
+class FakeService:
+    """Loopback TCP service that sends a greeting and/or answers the first request"""
+
+    def __init__(self, greeting=b'', reply=None, stream=False, ip='127.0.0.1'):
+        self.greeting = greeting
+        self.reply = reply
+        self.stream = stream
+        self.requests = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((ip, 0))
+        self.sock.listen(64)
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _handle(self, conn):
+        try:
+            if self.greeting:
+                conn.sendall(self.greeting)
+            if self.stream:
+                while not self._stop.is_set():
+                    conn.sendall(b'x' * 4096)
+            conn.settimeout(2)
+            request = conn.recv(1024)
+            self.requests.append(request)
+            if self.reply and request:
+                conn.sendall(self.reply(request))
+                time.sleep(0.5)  # hold the connection open like a keep-alive server
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+def _http_reply(request):
+    if request.startswith(b'HEAD '):
+        return b'HTTP/1.1 200 OK\r\nServer: CUPS/2.4 IPP/2.1\r\nContent-Length: 0\r\n\r\n'
+    return b''
+
+@pytest.fixture
+def services():
+    running = {
+        'ssh': FakeService(greeting=b'SSH-2.0-OpenSSH_9.2p1 Debian-2\r\n'),
+        'http': FakeService(reply=_http_reply),
+        'silent': FakeService(),
+        'flood': FakeService(stream=True),
+    }
+    yield running
+    for service in running.values():
+        service.close()
+
+def test_signature_index_prefers_earlier_signatures():
+    index = SignatureIndex()
+    assert index.match(b'SSH-2.0-dropbear_2022.83\r\n') == {'service': 'ssh', 'product': 'Dropbear',
+                                                             'version': '2022.83'}
+    assert index.match(b'SSH-2.0-Cisco-1.25\r\n')['product'] == 'Cisco-1.25'
+    assert index.match(b'HTTP/1.0 200 OK\r\nServer: nginx/1.24.0\r\n\r\n') == {
+        'service': 'http', 'product': 'nginx', 'version': '1.24.0'}
+    assert index.match(b'HTTP/1.1 404 Not Found\r\n\r\n')['product'] == 'HTTP'
+    assert index.match(b'\x00\x00\x00\x41\xfeSMB\x40\x00')['product'] == 'SMB2'
+    assert index.match(b'\x16\x03\x01\x00') is None
+
+def test_grab_many_matches_loopback_services(services):
+    grabber = BannerGrabber(read_bytes=256, read_timeout=0.5, greeting_timeout=0.2)
+    ports = [service.port for service in services.values()]
+    results = grabber.grab_many({'127.0.0.1': ports})
+
+    found = {s['port']: s for s in results['127.0.0.1']}
+    assert found[services['ssh'].port]['product'] == 'OpenSSH'
+    assert found[services['ssh'].port]['version'] == '9.2p1'
+    assert found[services['http'].port]['product'] == 'CUPS'
+    # The silent service got the null probe, then an HTTP HEAD on the same connection
+    assert services['silent'].requests == [PROBES['http']]
+    assert services['silent'].port not in found
+    # A service that never stops talking is cut off at the read cap
+    assert found[services['flood'].port]['service'] == 'unknown'
+    assert len(found[services['flood'].port]['banner']) <= 80
+
+def test_grab_many_records_banner_metrics(services):
+    limiter = ScanRateLimiter()
+    grabber = BannerGrabber(read_timeout=0.5, greeting_timeout=0.2, rate_limiter=limiter)
+    grabber.grab_many({'127.0.0.1': [services['ssh'].port, services['silent'].port]})
+    assert limiter.snapshot()['banner']['sent'] == 2
+    assert limiter.snapshot()['banner']['answered'] == 1
+
+def test_services_feed_identification():
+    identifier = DeviceIdentifier()
+    device = {'ip': '10.0.0.20', 'vendor': 'Unknown', 'ports': [631, 22],
+              'services': [{'port': 22, 'service': 'ssh', 'product': 'OpenSSH'},
+                           {'port': 631, 'service': 'http', 'product': 'CUPS'}]}
+    assert identifier.identify_device(device) == 'Printer'
+    assert identifier.identify_device(dict(device, services=[])) == 'SSH Server'
+
+def test_banner_summary_masks_binary():
+    assert banner_summary(b'\x00\x01RFB 003.008\n') == '..RFB 003.008'
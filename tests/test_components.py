@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+from backend.components import Components
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+HEAVY = ('scapy', 'matplotlib', 'networkx', 'numpy', 'psutil', 'network_scanner', 'graph_generator')
+
+def test_api_import_defers_heavy_modules(tmp_path):
+    env = dict(os.environ, NETMAP_MONITOR_INTERVAL='0', NETMAP_INVENTORY=str(tmp_path / 'inventory.db'))
+    code = f"import api, sys; print(','.join(m for m in {HEAVY!r} if m in sys.modules)); print(api.components.built())"
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ['', '[]']
+
+def test_components_are_built_once_on_first_use(tmp_path):
+    components = Components(scan_processes=1, monitor_interval=0,
+                            inventory_path=str(tmp_path / 'inventory.db'))
+    assert components.built() == []
+    identifier = components.identifier()
+    assert components.identifier() is identifier
+    assert components.built() == ['identifier']
+
+    monitor = components.monitor()
+    assert components.monitor() is monitor
+    assert monitor.scanner is components.scanner()
+    assert components.sharded_scanner() is None
+    assert components.built() == ['identifier', 'monitor', 'scanner', 'sharded_scanner']
+    assert monitor.status()['running'] is False
@@ -0,0 +1,88 @@
+import gzip
+import json
+import pytest
+from werkzeug.datastructures import MultiDict
+from backend import device_query
+from backend.device_query import DeviceQuery, compress, decode_cursor, encode, encode_cursor, etag
+from backend.device_table import DeviceTable
+
+def make_table():
+    devices = []
+    for i in range(1, 41):
+        devices.append({
+            'ip': f'10.0.{i % 2}.{i}',
+            'mac': f'aa:bb:cc:00:00:{i:02x}',
+            'vendor': 'Apple' if i % 3 == 0 else 'Cisco',
+            'status': 'up',
+            'ports': [22, 80] if i % 4 == 0 else [443],
+            'type': 'Router' if i % 5 == 0 else 'Computer',
+        })
+    devices.append({'ip': 'fe80::1', 'mac': 'aa:bb:cc:00:01:00', 'type': 'Computer'})
+    return DeviceTable(devices), devices
+
+def test_cursor_pages_cover_every_match_in_ip_order():
+    table, devices = make_table()
+    seen = []
+    cursor = None
+    while True:
+        page = DeviceQuery(limit=7, cursor=cursor).page(table)
+        assert page['total'] == len(devices)
+        seen.extend(page['devices'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(devices)
+    assert sorted(seen, key=lambda d: d['mac']) == sorted(devices, key=lambda d: d['mac'])
+    ipv4 = [tuple(int(p) for p in d['ip'].split('.')) for d in seen[:-1]]
+    assert ipv4 == sorted(ipv4)
+    assert seen[-1]['ip'] == 'fe80::1'
+
+def test_cursor_survives_rows_added_before_it():
+    table, devices = make_table()
+    first = DeviceQuery(limit=10).page(table)
+    table.append({'ip': '10.0.0.0', 'mac': 'aa:bb:cc:00:02:00'})
+    second = DeviceQuery(limit=10, cursor=first['next_cursor']).page(table)
+    last_ip = first['devices'][-1]['ip']
+    assert second['devices'][0]['ip'] != last_ip
+    assert not {d['mac'] for d in first['devices']} & {d['mac'] for d in second['devices']}
+
+def test_filters_and_projection_from_args():
+    table, devices = make_table()
+    args = MultiDict([('subnet', '10.0.0.0/24'), ('type', 'Router,Computer'), ('vendor', 'Apple'),
+                      ('port', '22'), ('port', '443'), ('fields', 'ip,ports')])
+    page = DeviceQuery.from_args(args).page(table)
+    expected = [d for d in devices if d['ip'].startswith('10.0.0.') and d['vendor'] == 'Apple']
+    assert page['total'] == len(expected) > 0
+    assert {d['ip'] for d in page['devices']} == {d['ip'] for d in expected}
+    assert all(set(d) == {'ip', 'ports'} for d in page['devices'])
+
+    assert DeviceQuery(types=['Printer']).page(table) == {'devices': [], 'total': 0, 'next_cursor': None}
+
+@pytest.mark.parametrize('args', [{'port': 'ssh'}, {'port': '70000'}, {'subnet': '10.0.0.0/33'},
+                                  {'limit': '0'}, {'cursor': 'not-a-cursor'}])
+def test_invalid_arguments_raise_value_error(args):
+    with pytest.raises(ValueError):
+        DeviceQuery.from_args(MultiDict(args))
+
+def test_encodings_round_trip():
+    table, _ = make_table()
+    page = DeviceQuery(limit=20).page(table)
+    body = encode(page)
+    assert json.loads(gzip.decompress(compress(body, 'gzip'))) == page
+    assert compress(body, None) == body
+    assert decode_cursor(encode_cursor(12345678901)) == 12345678901
+    with pytest.raises(ValueError):
+        encode(page, 'xml')
+    if device_query.msgpack is not None:
+        assert device_query.msgpack.unpackb(encode(page, 'msgpack')) == page
+        assert 'msgpack' in device_query.formats()
+    if device_query.brotli is not None:
+        assert device_query.brotli.decompress(compress(body, 'br')) == body
+
+def test_etag_depends_on_version_query_and_representation():
+    query = DeviceQuery(types=['Router'], limit=50)
+    tag = etag('scan:1', query, 'json', 'gzip')
+    assert tag == etag('scan:1', DeviceQuery(types=['Router'], limit=50), 'json', 'gzip')
+    assert tag != etag('scan:2', query, 'json', 'gzip')
+    assert tag != etag('scan:1', DeviceQuery(types=['Router'], limit=51), 'json', 'gzip')
+    assert tag != etag('scan:1', query, 'json', None)
@@ -0,0 +1,101 @@
+import json
+import threading
+import numpy as np
+from backend.device_query import DeviceQuery
+from backend.device_table import DeviceTable
+
+DEVICES = [
+    {'ip': '192.168.1.1', 'mac': 'AA:BB:CC:00:00:01', 'vendor': 'Netgear', 'status': 'active',
+     'ports': [443, 80], 'hostname': 'gw', 'type': 'Router'},
+    {'ip': '192.168.1.20', 'mac': '00:11:22:33:44:55', 'vendor': 'Unknown', 'status': 'active',
+     'ports': [22], 'hostname': '', 'type': 'Computer', 'first_seen': 100.0},
+    {'ip': '10.0.5.9', 'mac': 'b8:27:eb:12:34:56', 'vendor': 'Raspberry Pi Foundation', 'status': 'active',
+     'ports': [22, 8080], 'hostname': 'pi', 'type': 'Raspberry Pi'},
+    {'ip': 'fe80::1', 'mac': '0011.2233.4455', 'banner': {'ssh': 'OpenSSH_9.6'}},
+]
+
+def test_round_trip():
+    table = DeviceTable(DEVICES, capacity=1)
+    assert len(table) == 4
+    expected = [dict(d, ports=sorted(d['ports'])) if 'ports' in d else d for d in DEVICES]
+    assert table.to_dicts() == expected
+    assert table == expected
+    assert table[-1] == DEVICES[-1]
+    assert json.loads(table.to_json()) == expected
+
+def test_vectorized_filters():
+    table = DeviceTable(DEVICES)
+    assert table.in_subnet('192.168.1.0/24').tolist() == [True, True, False, False]
+    assert table.with_port(22).tolist() == [False, True, True, False]
+    assert table.with_port(80, 8080).tolist() == [True, False, True, False]
+    assert table.with_port(9999).tolist() == [False] * 4
+    assert table.of_type('Router', 'Computer').tolist() == [True, True, False, False]
+    assert table.gateways().tolist() == [True, False, False, False]
+
+    selected = table.where(subnet='192.168.0.0/16', port=22)
+    assert [d['ip'] for d in selected] == ['192.168.1.20']
+    assert table.select(np.array([False, False, True, True])).to_dicts()[1] == DEVICES[3]
+
+def test_ports_beyond_one_word():
+    table = DeviceTable()
+    for port in range(1, 200):
+        table.append({'ip': f'10.0.0.{port}', 'ports': [port, 1]})
+    assert table.row(150)['ports'] == [1, 151]
+    assert int(table.with_port(1).sum()) == 199
+    assert table.with_port(199).tolist()[-1]
+
+def test_rows_in_sort_key_order_with_projection():
+    table = DeviceTable(DEVICES)
+    order = np.argsort(table.sort_keys())
+    assert [d['ip'] for d in table.rows(order)] == ['10.0.5.9', '192.168.1.1', '192.168.1.20', 'fe80::1']
+    assert table.rows(range(4)) == table.to_dicts()
+    assert table.rows([0, 3], fields=['ip', 'banner']) == [
+        {'ip': '192.168.1.1'}, {'ip': 'fe80::1', 'banner': {'ssh': 'OpenSSH_9.6'}}]
+
+def test_reads_while_appending():
+    table = DeviceTable(capacity=1)
+    done = threading.Event()
+
+    def append():
+        for n in range(3000):
+            table.append({'ip': f'10.0.{n // 256}.{n % 256}', 'ports': [n % 200 + 1]})
+        done.set()
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    # Growing never exposes zeroed rows to a reader
+    while not done.is_set():
+        assert all(device.get('ip') for device in table)
+    writer.join()
+    assert [device['ports'] for device in table][:3] == [[1], [2], [3]]
+
+def test_filters_while_appending():
+    table = DeviceTable(capacity=1)
+    done = threading.Event()
+
+    def append():
+        for n in range(3000):
+            table.append({'ip': f'10.0.{n // 256}.{n % 256}', 'type': 'NAS', 'ports': [n % 200 + 1]})
+        done.set()
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    query = DeviceQuery(subnets=['10.0.0.0/16'], types=['NAS'], ports=[1, 2], limit=5)
+    while not done.is_set():
+        page = query.page(table)
+        assert len(page['devices']) <= 5 and page['total'] <= len(table)
+        assert len(table.where(subnet='10.0.0.0/16', type='NAS', port=1)) <= len(table)
+    writer.join()
+    assert query.page(table)['total'] == 30
+
+def test_port_bits_are_unique_across_threads():
+    vocabulary = {}
+    tables = [DeviceTable(port_vocabulary=vocabulary) for _ in range(4)]
+    threads = [threading.Thread(target=table.extend, args=([{'ports': list(range(1, 2001))}],))
+               for table in tables]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(vocabulary.values()) == list(range(2000))
+    assert all(table[0]['ports'] == list(range(1, 2001)) for table in tables)
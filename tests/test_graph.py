@@ -1,7 +1,9 @@
 import pytest
-from backend.graph_generator import NetworkGraphGenerator
+from backend.graph_generator import NetworkGraphGenerator, choose_layout, compute_layout
 import matplotlib.pyplot as plt
 import io
+import json
+import numpy as np
 
 @pytest.fixture
 def graph_generator():
@@ -68,4 +70,80 @@ def test_graph_properties(graph_generator, sample_devices):
     
     # Check if all devices are connected to router
     router_connections = list(graph_generator.G.edges('Router'))
-    assert len(router_connections) == len(sample_devices)
\ No newline at end of file
+    assert len(router_connections) == len(sample_devices)
+
+def test_render_formats(graph_generator, sample_devices):
+    svg, _ = graph_generator.render(sample_devices, 'svg')
+    assert svg.lstrip().startswith(b'<?xml')
+    thumb, _ = graph_generator.render(sample_devices, 'png', thumbnail=True)
+    full, _ = graph_generator.render(sample_devices, 'png')
+    assert len(thumb) < len(full)
+
+    graph = json.loads(graph_generator.render(sample_devices, 'json')[0])
+    assert {node['id'] for node in graph['nodes']} == {d['ip'] for d in sample_devices}
+    assert len(graph['edges']) == len(sample_devices) - 1
+
+def test_render_cache(graph_generator, sample_devices, monkeypatch):
+    calls = []
+    original = graph_generator._draw
+    monkeypatch.setattr(graph_generator, '_draw', lambda *a, **kw: calls.append(1) or original(*a, **kw))
+
+    first, key = graph_generator.render(sample_devices, 'png', thumbnail=True)
+    # Same devices in another order hit the cache
+    second, second_key = graph_generator.render(list(reversed(sample_devices)), 'png', thumbnail=True)
+    assert first == second
+    assert key == second_key
+    assert len(calls) == 1
+
+    changed = [dict(sample_devices[0], hostname='gw')] + sample_devices[1:]
+    assert graph_generator.render_key(changed, 'png', True) != key
+
+def _many_devices(count):
+    return [{'ip': f'10.0.{i // 250}.{i % 250 + 2}', 'vendor': 'Unknown',
+             'type': 'Computer' if i % 3 else 'IoT Device'} for i in range(count)]
+
+def test_large_graph_layouts(graph_generator):
+    devices = [{'ip': '10.0.0.1', 'vendor': 'Gateway', 'type': 'Unknown Device'}] + _many_devices(600)
+    graph = graph_generator._build_graph(devices)
+    assert len(graph) == 601
+    assert all(u == '10.0.0.1' for u, _ in graph_generator.G.edges('10.0.0.1'))
+    assert graph_generator.G.number_of_edges() == 600
+
+    for layout in ('radial', 'force'):
+        pos = compute_layout(graph, layout)
+        assert set(pos) == set(graph.nodes)
+        coords = np.array(list(pos.values()))
+        assert np.isfinite(coords).all()
+        assert len(np.unique(coords.round(6), axis=0)) == len(coords)
+
+    assert choose_layout(600) == 'force'
+    assert choose_layout(20000) == 'radial'
+    png, key = graph_generator.render(devices, 'png', thumbnail=True, layout='radial')
+    assert key != graph_generator.render_key(devices, 'png', True, 'force')
+    with pytest.raises(ValueError):
+        graph_generator.render(devices, 'png', layout='circle')
+    with pytest.raises(ValueError):
+        graph_generator.render(devices, 'png', layout='spring')
+
+def test_concurrent_renders_match_serial():
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.graph_generator import THUMBNAIL_SIZE, render_image
+
+    jobs = [(_many_devices(count), fmt, layout)
+            for count in (3, 12, 40, 250)
+            for fmt in ('png', 'svg')
+            for layout in ('spring', 'radial')]
+    serial = [render_image(devices, fmt, layout=layout, **THUMBNAIL_SIZE) for devices, fmt, layout in jobs]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(2):
+            futures = [pool.submit(render_image, devices, fmt, layout=layout, **THUMBNAIL_SIZE)
+                       for devices, fmt, layout in jobs]
+            assert [f.result() for f in futures] == serial
+
+    # A shared generator with its cache bypassed must not mix up concurrent renders
+    generator = NetworkGraphGenerator()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(generator._draw, devices, fmt, layout=layout, **THUMBNAIL_SIZE)
+                   for devices, fmt, layout in jobs]
+        assert [f.result() for f in futures] == serial
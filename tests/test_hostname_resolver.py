@@ -0,0 +1,130 @@
+import socket
+import struct
+import threading
+import pytest
+from backend.hostname_resolver import (AsyncHostnameResolver, HostnameCache, build_ptr_query,
+                                       parse_nbstat_response, parse_ptr_response, reverse_name)
+
+class StubDNSServer:
+    """Loopback DNS server answering PTR queries from a fixed table"""
+
+    def __init__(self, names, silent=(), ip='127.0.0.1', port=0, reply=None):
+        self.names = names
+        self.silent = set(silent)
+        self.queries = []
+        self.reply = reply or self._ptr_reply
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((ip, port))
+        self.sock.settimeout(0.1)
+        self.address = self.sock.getsockname()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _ptr_reply(self, query):
+        question = query[12:]
+        qname = []
+        offset = 0
+        while question[offset]:
+            length = question[offset]
+            qname.append(question[offset + 1:offset + 1 + length].decode())
+            offset += length + 1
+        question = question[:offset + 5]
+        ip = '.'.join(reversed(qname[:4]))
+        self.queries.append(ip)
+        if ip in self.silent:
+            return None
+        name = self.names.get(ip)
+        header = query[:2] + struct.pack('!HHHHH', 0x8180 if name else 0x8183, 1, 1 if name else 0, 0, 0)
+        if not name:
+            return header + question
+        rdata = b''.join(bytes([len(l)]) + l.encode() for l in name.split('.')) + b'\x00'
+        answer = b'\xc0\x0c' + struct.pack('!HHIH', 12, 1, 600, len(rdata)) + rdata
+        return header + question + answer
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                query, addr = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            response = self.reply(query)
+            if response:
+                self.sock.sendto(response, addr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+@pytest.fixture
+def dns_server():
+    server = StubDNSServer({'10.0.0.2': 'printer.lan', '10.0.0.3': 'nas.lan'}, silent={'10.0.0.9'})
+    yield server
+    server.close()
+
+def _resolver(server, **kwargs):
+    return AsyncHostnameResolver(nameservers=[server.address[0]], port=server.address[1],
+                                 timeout=0.2, retries=1, **kwargs)
+
+def test_ptr_query_roundtrip():
+    query = build_ptr_query('192.168.1.20', 0x1234)
+    assert reverse_name('192.168.1.20') == '20.1.168.192.in-addr.arpa'
+    assert parse_ptr_response(query) == (0x1234, 0, None, 0)
+
+def test_batch_resolution_and_negative_cache(dns_server):
+    resolver = _resolver(dns_server)
+    ips = ['10.0.0.2', '10.0.0.3', '10.0.0.4', '10.0.0.9']
+    assert resolver.resolve_many(ips) == {'10.0.0.2': 'printer.lan', '10.0.0.3': 'nas.lan',
+                                          '10.0.0.4': '', '10.0.0.9': ''}
+    # The silent host was retried once, every other host asked once
+    assert sorted(dns_server.queries) == sorted(ips + ['10.0.0.9'])
+
+    dns_server.queries.clear()
+    assert resolver.resolve_many(ips)['10.0.0.2'] == 'printer.lan'
+    assert resolver.resolve('10.0.0.4') == ''
+    assert dns_server.queries == []
+
+def test_reply_for_another_name_is_ignored():
+    server = StubDNSServer({'10.0.0.2': 'printer.lan'})
+    # Every query is answered as if it asked about 10.0.0.2, keeping its transaction id
+    server.reply = lambda query: server._ptr_reply(query[:2] + build_ptr_query('10.0.0.2', 0)[2:])
+    try:
+        resolver = _resolver(server)
+        assert resolver.resolve_many(['10.0.0.2', '10.0.0.3']) == {'10.0.0.2': 'printer.lan', '10.0.0.3': ''}
+    finally:
+        server.close()
+
+def test_cache_expiry_and_bound():
+    cache = HostnameCache(max_entries=2)
+    cache.put('10.0.0.1', 'a', ttl=10, now=0)
+    cache.put('10.0.0.2', '', ttl=5, now=0)
+    assert cache.get('10.0.0.2', now=4) == ''
+    assert cache.get('10.0.0.2', now=6) is None
+    cache.put('10.0.0.3', 'c', ttl=10, now=0)
+    cache.put('10.0.0.4', 'd', ttl=10, now=0)
+    assert cache.get('10.0.0.1', now=1) is None
+    assert len(cache) == 2
+
+def _nbstat_reply(query):
+    names = [(b'WORKGROUP', 0x00, 0x8400), (b'OFFICE-PC', 0x00, 0x0400), (b'OFFICE-PC', 0x20, 0x0400)]
+    body = bytes([len(names)]) + b''.join(n.ljust(15) + bytes([s]) + struct.pack('!H', f) for n, s, f in names)
+    header = query[:2] + struct.pack('!HHHHH', 0x8400, 0, 1, 0, 0)
+    return header + query[12:46] + struct.pack('!HHIH', 0x21, 1, 0, len(body)) + body
+
+def test_netbios_fallback(dns_server):
+    try:
+        netbios = StubDNSServer({}, ip='127.0.0.5', port=137, reply=_nbstat_reply)
+    except OSError:
+        pytest.skip("Cannot bind the NetBIOS port on loopback")
+    try:
+        resolver = _resolver(dns_server, fallbacks=['netbios'])
+        assert resolver.resolve_many(['127.0.0.5', '10.0.0.2']) == {'127.0.0.5': 'OFFICE-PC',
+                                                                     '10.0.0.2': 'printer.lan'}
+    finally:
+        netbios.close()
+
+def test_parse_nbstat_rejects_short_response():
+    assert parse_nbstat_response(b'\x00' * 20) is None
@@ -11,4 +11,76 @@ def test_device_identifier():
     ]
     
     for test_input, expected in test_cases:
-        assert identifier.identify_device(test_input) == expected
\ No newline at end of file
+        assert identifier.identify_device(test_input) == expected
+
+def _reference_identify(identifier, device_info):
+    """The original one-pattern-at-a-time identification, kept as an oracle"""
+    import re
+    ip = device_info.get('ip', '')
+    mac = device_info.get('mac', '').lower()
+    vendor = device_info.get('vendor', '').lower()
+    ports = device_info.get('ports', [])
+    hostname = device_info.get('hostname', '').lower()
+    if (ip.endswith('.1') or ip.endswith('.254')) and any(port in ports for port in [53, 80, 443]):
+        return 'Router'
+    for pattern, device_type in identifier.hostname_patterns.items():
+        if re.search(pattern, hostname):
+            return device_type
+    for pattern, device_type in identifier.vendor_patterns.items():
+        if re.search(pattern.lower(), vendor):
+            return device_type
+    ports_set = set(ports)
+    for signature_ports, device_type in identifier.port_signatures:
+        if ports and all(port in ports_set for port in signature_ports):
+            return device_type
+    mac_type = identifier._analyze_mac_prefix(mac)
+    if mac_type:
+        return mac_type
+    if ports:
+        if 80 in ports or 443 in ports:
+            return 'Web Server'
+        if 22 in ports:
+            return 'Network Device'
+        if set([139, 445]).intersection(ports):
+            return 'Windows Device'
+    if len(ports) > 5:
+        return 'Server'
+    return 'Unknown Device'
+
+
+def _synthetic_devices(count, seed=7):
+    import random
+    rng = random.Random(seed)
+    vendors = ['Apple Inc.', 'Samsung Electronics', 'Hewlett Packard', 'TP-LINK', 'Raspberry Pi Foundation',
+               'Espressif Inc.', 'Sony Interactive', 'Amazon Technologies', 'Google LLC', 'Hikvision',
+               'VMware, Inc.', 'Synology', 'Sonos', 'Unknown', '']
+    hostnames = ['', '', 'office-printer', 'ipcam-02', 'xbox-one', 'ps5', 'pixel-phone', 'macbook-pro',
+                 'nas01', 'gw', 'core-switch', 'raspberrypi', 'vm-build', 'host']
+    ports = [21, 22, 25, 53, 80, 123, 139, 443, 445, 548, 1883, 3389, 5009, 8009, 8080, 32400, 62078]
+    macs = ['', '00:0c:29:aa:bb:cc', '01:00:5e:00:00:fb', 'b8:27:eb:12:34:56', 'ff:ff:ff:ff:ff:ff']
+    devices = []
+    for i in range(count):
+        devices.append({
+            'ip': f'10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.choice([1, 254, rng.randrange(2, 254)])}',
+            'mac': rng.choice(macs),
+            'vendor': rng.choice(vendors),
+            'hostname': rng.choice(hostnames),
+            'ports': rng.sample(ports, rng.randrange(0, 8)),
+        })
+    return devices
+
+
+def test_compiled_rules_match_reference():
+    identifier = DeviceIdentifier()
+    devices = _synthetic_devices(5000)
+
+    expected = [_reference_identify(identifier, device) for device in devices]
+    assert [identifier.identify_device(device) for device in devices] == expected
+    assert identifier.identify_many(devices) == expected
+
+def test_patterns_with_their_own_groups():
+    identifier = DeviceIdentifier()
+    identifier.hostname_patterns = {r'(living|bed)room-tv': 'Smart TV', r'nas\d+': 'NAS', **identifier.hostname_patterns}
+    identifier.compile_rules()
+    assert identifier.identify_device({'hostname': 'bedroom-tv'}) == 'Smart TV'
+    assert identifier.identify_device({'hostname': 'nas01'}) == 'NAS'
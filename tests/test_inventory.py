@@ -0,0 +1,129 @@
+import sqlite3
+import pytest
+from backend.device_identifier import DeviceIdentifier
+from backend.inventory import DeviceInventory
+from backend.network_scanner import NetworkScanner
+from backend.scan_backends import SimulatedNetwork
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = DeviceInventory(str(tmp_path / 'inventory.db'), max_age=3600)
+    yield inventory
+    inventory.close()
+
+def _device(ip, mac, ports=None):
+    return {'ip': ip, 'mac': mac, 'vendor': 'Unknown', 'hostname': '', 'ports': ports or []}
+
+def test_upsert_keeps_first_seen(inventory):
+    inventory.upsert(_device('10.0.0.2', 'aa:aa:aa:aa:aa:02', [22]), now=100.0)
+    inventory.upsert(_device('10.0.0.2', 'aa:aa:aa:aa:aa:02', [22, 80]), now=200.0)
+
+    record = inventory.get('10.0.0.2')
+    assert record['first_seen'] == 100.0
+    assert record['last_seen'] == 200.0
+    assert record['fingerprinted_at'] == 200.0
+    assert record['ports'] == [22, 80]
+
+def test_plan_delta(inventory):
+    inventory.upsert(_device('10.0.0.2', 'aa:aa:aa:aa:aa:02'), now=3000.0)
+    inventory.upsert(_device('10.0.0.3', 'aa:aa:aa:aa:aa:03'), now=3000.0)
+    inventory.upsert(_device('10.0.0.4', 'aa:aa:aa:aa:aa:04'), now=0.0)
+
+    to_fingerprint, cached = inventory.plan_delta({
+        '10.0.0.2': 'AA:AA:AA:AA:AA:02',  # unchanged, case differs
+        '10.0.0.3': 'bb:bb:bb:bb:bb:03',  # MAC changed
+        '10.0.0.4': 'aa:aa:aa:aa:aa:04',  # stale fingerprint
+        '10.0.0.5': 'aa:aa:aa:aa:aa:05',  # new host
+    }, now=5000.0)
+
+    assert set(to_fingerprint) == {'10.0.0.3', '10.0.0.4', '10.0.0.5'}
+    assert [device['ip'] for device in cached] == ['10.0.0.2']
+    assert inventory.get('10.0.0.2')['last_seen'] == 5000.0
+
+def test_delta_scan_skips_known_hosts(inventory, monkeypatch):
+    scanner = NetworkScanner('10.0.0.0/29', mode='delta', inventory=inventory)
+    arp = {'10.0.0.2': 'aa:aa:aa:aa:aa:02', '10.0.0.3': 'aa:aa:aa:aa:aa:03'}
+    scanned = []
+
+    def fake_scan_ip(ip, ports, info, mac=''):
+        scanned.append(ip)
+        return _device(ip, mac, ports)
+
+    monkeypatch.setattr(scanner, '_scan_ip_range_arp', lambda ip_range: dict(arp))
+    monkeypatch.setattr(scanner, '_probe_ports', lambda ips: {ip: [22] for ip in ips})
+    monkeypatch.setattr(scanner, '_nmap_stage', lambda ips, ports: {})
+    monkeypatch.setattr(scanner, '_scan_ip', fake_scan_ip)
+
+    first = scanner.scan_network()
+    assert sorted(scanned) == ['10.0.0.2', '10.0.0.3']
+
+    scanned.clear()
+    arp['10.0.0.4'] = 'aa:aa:aa:aa:aa:04'
+    second = scanner.scan_network()
+    assert scanned == ['10.0.0.4']
+    assert {d['ip'] for d in second} == {'10.0.0.2', '10.0.0.3', '10.0.0.4'}
+    assert len(first) == 2
+
+    # A full scan re-fingerprints everything
+    scanned.clear()
+    scanner.scan_network(mode='full')
+    assert sorted(scanned) == ['10.0.0.2', '10.0.0.3', '10.0.0.4']
+
+def test_services_are_kept(inventory):
+    services = [{'service': 'http', 'product': 'nginx', 'version': '1.24', 'port': 80, 'banner': ''}]
+    inventory.upsert(dict(_device('10.0.0.2', 'aa:aa:aa:aa:aa:02', [80]), services=services), now=3000.0)
+    inventory.upsert(_device('10.0.0.3', 'aa:aa:aa:aa:aa:03'), now=3000.0)
+    # A liveness-only update leaves the last fingerprint's services alone
+    inventory.upsert(_device('10.0.0.2', 'aa:aa:aa:aa:aa:02', [80]), fingerprinted=False, now=3500.0)
+
+    assert inventory.get_many(['10.0.0.2'])['10.0.0.2']['services'] == services
+    _, cached = inventory.plan_delta({'10.0.0.2': 'aa:aa:aa:aa:aa:02', '10.0.0.3': 'aa:aa:aa:aa:aa:03'},
+                                     now=4000.0)
+    assert [device.get('services') for device in cached] == [services, None]
+
+def test_inventory_without_services_column_is_upgraded(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE devices (ip TEXT PRIMARY KEY, mac TEXT NOT NULL DEFAULT '', "
+                 "vendor TEXT NOT NULL DEFAULT 'Unknown', hostname TEXT NOT NULL DEFAULT '', "
+                 "ports TEXT NOT NULL DEFAULT '[]', type TEXT, first_seen REAL NOT NULL, "
+                 "last_seen REAL NOT NULL, fingerprinted_at REAL)")
+    conn.execute("INSERT INTO devices VALUES ('10.0.0.2', '', 'Unknown', '', '[22]', NULL, 1, 1, 1)")
+    conn.commit()
+    conn.close()
+    inventory = DeviceInventory(path)
+    assert inventory.get('10.0.0.2')['ports'] == [22]
+    inventory.upsert(dict(_device('10.0.0.2', ''), services=[{'service': 'ssh', 'port': 22}]))
+    assert inventory.get('10.0.0.2')['services'] == [{'service': 'ssh', 'port': 22}]
+    inventory.close()
+
+def test_delta_scan_serves_services_from_inventory(inventory):
+    network = SimulatedNetwork(hosts=120, network='10.1.0.0/24', seed=3, latency=0.001, arp_timeout=0.01)
+    scanner = NetworkScanner(backend=network, mode='full', inventory=inventory)
+    full = {d['ip']: d for d in scanner.scan_network()}
+    delta = {d['ip']: d for d in scanner.scan_network(mode='delta')}
+    with_services = {ip for ip, device in full.items() if device.get('services')}
+    assert with_services
+    assert {ip for ip, device in delta.items() if device.get('services')} == with_services
+
+def test_host_that_changed_address_is_found_by_mac(inventory):
+    inventory.upsert(_device('10.0.0.2', 'AA:AA:AA:AA:AA:02', [22]), now=3000.0)
+    inventory.upsert(_device('10.0.0.3', 'aa:aa:aa:aa:aa:03'), now=3000.0)
+
+    to_fingerprint, cached = inventory.plan_delta({
+        '10.0.0.9': 'aa:aa:aa:aa:aa:02',  # .2 moved here
+        '10.0.0.3': 'aa:aa:aa:aa:aa:03',
+        '10.0.0.4': 'aa:aa:aa:aa:aa:03',  # same MAC, but .3 still answers
+    }, now=3500.0)
+
+    assert sorted(device['ip'] for device in cached) == ['10.0.0.3', '10.0.0.9']
+    assert to_fingerprint == {'10.0.0.4': 'aa:aa:aa:aa:aa:03'}
+    assert inventory.get('10.0.0.2') is None
+    assert inventory.get('10.0.0.9')['ports'] == [22] and inventory.get('10.0.0.9')['first_seen'] == 3000.0
+
+def test_identified_type_is_stored(inventory):
+    network = SimulatedNetwork(hosts=30, network='10.2.0.0/24', latency=0.001, arp_timeout=0.01)
+    scanner = NetworkScanner(backend=network, mode='full', inventory=inventory, identifier=DeviceIdentifier())
+    devices = scanner.scan_network()
+    stored = inventory.get_many(device['ip'] for device in devices)
+    assert all(stored[device['ip']]['type'] == device['type'] for device in devices)
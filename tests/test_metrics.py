@@ -0,0 +1,78 @@
+import os
+import sys
+import types
+import pytest
+from backend.metrics import MetricsRegistry, ScanProfiler, ScanTimer, STAGE_SECONDS
+from backend.network_scanner import NetworkScanner
+from backend.rate_control import ScanRateLimiter
+from backend.scan_backends import SimulatedNetwork
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('demo_seconds', 'Demo latency', buckets=(0.1, 1))
+    counter = registry.counter('demo_total', 'Demo count')
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, stage='arp')
+    counter.inc(3, source='say "hi"')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE demo_seconds histogram' in lines
+    assert 'demo_seconds_bucket{le="0.1",stage="arp"} 1' in lines
+    assert 'demo_seconds_bucket{le="1",stage="arp"} 2' in lines
+    assert 'demo_seconds_bucket{le="+Inf",stage="arp"} 3' in lines
+    assert 'demo_seconds_sum{stage="arp"} 5.55' in lines
+    assert 'demo_seconds_count{stage="arp"} 3' in lines
+    assert 'demo_total{source="say \\"hi\\""} 3' in lines
+
+def test_scan_timing_breakdown():
+    network = SimulatedNetwork(hosts=50, network='10.3.0.0/24', latency=0.001, arp_timeout=0.01)
+    scanner = NetworkScanner(backend=network, mode='full')
+    timer = ScanTimer()
+    arp_spans = STAGE_SECONDS.count(stage='arp')
+
+    devices = list(scanner.iter_scan_network(timer=timer))
+    breakdown = timer.breakdown()
+    assert set(breakdown['stages']) == {'arp', 'dns', 'tcp_probe', 'nmap', 'banners', 'host'}
+    assert breakdown['stages']['host']['spans'] == len(devices) == 50
+    assert breakdown['counters'] == {'hosts_discovered': 50, 'hosts_fingerprinted': 50}
+    assert breakdown['stages']['arp']['seconds'] <= breakdown['total_seconds']
+    assert STAGE_SECONDS.count(stage='arp') == arp_spans + 1
+
+def test_rate_limiter_probe_counters():
+    registry = MetricsRegistry()
+    limiter = ScanRateLimiter()
+    limiter.register_metrics(registry)
+    limiter.metrics['tcp'].record(sent=10, answered=7, lost=3, retransmits=1)
+    text = registry.render()
+    assert 'netmap_probes_sent_total{type="tcp"} 10' in text
+    assert 'netmap_probes_lost_total{type="tcp"} 3' in text
+    assert 'netmap_probes_retransmits_total{type="tcp"} 1' in text
+    assert 'netmap_probe_limit{type="arp"}' in text
+
+def test_profiler_writes_report(tmp_path):
+    with ScanProfiler(output_dir=str(tmp_path)) as profiler:
+        sum(i * i for i in range(10000))
+    summary = profiler.summary()
+    assert os.path.exists(summary['path'])
+    assert 'function calls' in summary['hotspots']
+    with pytest.raises(ValueError):
+        ScanProfiler('perf')
+
+def test_pyinstrument_is_imported_on_request(tmp_path, monkeypatch):
+    class Profiler:
+        def start(self):
+            pass
+
+        def stop(self):
+            pass
+
+        def output_html(self):
+            return '<html></html>'
+
+    monkeypatch.setitem(sys.modules, 'pyinstrument', types.SimpleNamespace(Profiler=Profiler))
+    with ScanProfiler('pyinstrument', output_dir=str(tmp_path)) as profiler:
+        pass
+    assert profiler.summary()['path'].endswith('.html')
+    monkeypatch.setitem(sys.modules, 'pyinstrument', None)
+    with pytest.raises(ValueError):
+        ScanProfiler('pyinstrument')
@@ -0,0 +1,102 @@
+import pytest
+from backend.device_identifier import DeviceIdentifier
+from backend.inventory import DeviceInventory
+from backend.monitor import NetworkMonitor
+
+class FakeScanner:
+    """Scripted liveness sweeps; fingerprints come from a per-host table"""
+
+    def __init__(self, inventory=None):
+        self.inventory = inventory
+        self.alive = {}
+        self.hostnames = {}
+        self.fingerprinted = []
+
+    def liveness_sweep(self):
+        return dict(self.alive)
+
+    def fingerprint_hosts(self, arp_results, progress=None, should_stop=None):
+        self.fingerprinted.append(sorted(arp_results))
+        for ip, mac in arp_results.items():
+            device = {'ip': ip, 'mac': mac, 'vendor': 'Unknown', 'ports': [22],
+                      'hostname': self.hostnames.get(ip, '')}
+            if self.inventory is not None:
+                self.inventory.upsert(device)
+            yield device
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def monitor():
+    scanner = FakeScanner()
+    clock = Clock()
+    monitor = NetworkMonitor(scanner, DeviceIdentifier(), liveness_interval=60, deep_interval=180,
+                             absent_sweeps=2, clock=clock)
+    events = []
+    monitor.add_listener(lambda event, payload: events.append((event, payload['device']['ip'])))
+    return monitor, scanner, clock, events
+
+def test_join_change_and_leave_events(monitor):
+    monitor, scanner, clock, events = monitor
+    scanner.alive = {'10.0.0.2': '00:11:22:33:44:02', '10.0.0.3': '00:11:22:33:44:03'}
+    assert monitor.run_once()['joined'] == 2
+    assert sorted(events) == [('device_joined', '10.0.0.2'), ('device_joined', '10.0.0.3')]
+    assert all(device['type'] for device in monitor.devices())
+
+    # A host answering from a new MAC is fingerprinted again at once
+    events.clear()
+    clock.now += 60
+    scanner.alive['10.0.0.3'] = '00:11:22:33:44:99'
+    del scanner.alive['10.0.0.2']
+    monitor.run_once()
+    assert events == [('device_changed', '10.0.0.3')]
+    changes = monitor.events_since(0)[0][-1]['changes']
+    assert changes['mac'] == {'old': '00:11:22:33:44:03', 'new': '00:11:22:33:44:99'}
+
+    # Leaving takes absent_sweeps missed sweeps
+    events.clear()
+    clock.now += 60
+    monitor.run_once()
+    assert events == [('device_left', '10.0.0.2')]
+    assert [d['ip'] for d in monitor.devices()] == ['10.0.0.3']
+
+def test_deep_rescans_are_staggered(monitor):
+    monitor, scanner, clock, events = monitor
+    scanner.alive = {f'10.0.0.{i}': f'00:11:22:33:44:{i:02x}' for i in range(2, 8)}
+    monitor.run_once()
+    assert len(scanner.fingerprinted[0]) == 6
+
+    # deep_interval is three liveness intervals: a third of the hosts per pass
+    rescanned = []
+    for _ in range(3):
+        clock.now += 60
+        scanner.fingerprinted.clear()
+        monitor.run_once()
+        rescanned.extend(scanner.fingerprinted[0])
+    assert sorted(rescanned) == sorted(scanner.alive)
+
+    scanner.hostnames['10.0.0.2'] = 'office-printer'
+    for _ in range(3):
+        clock.now += 60
+        monitor.run_once()
+    assert ('device_changed', '10.0.0.2') in events
+    assert {d['ip']: d['type'] for d in monitor.devices()}['10.0.0.2'] == 'Printer'
+
+def test_fresh_inventory_hosts_join_without_fingerprinting():
+    inventory = DeviceInventory(':memory:')
+    inventory.upsert({'ip': '10.0.0.5', 'mac': '00:11:22:33:44:05', 'ports': [80]}, now=990)
+    scanner = FakeScanner(inventory)
+    scanner.alive = {'10.0.0.5': '00:11:22:33:44:05', '10.0.0.6': '00:11:22:33:44:06'}
+    monitor = NetworkMonitor(scanner, clock=Clock())
+
+    monitor.run_once()
+    assert scanner.fingerprinted == [['10.0.0.6']]
+    events, last_seq = monitor.events_since(0)
+    assert last_seq == 2
+    assert {event['device']['ip'] for event in events} == {'10.0.0.5', '10.0.0.6'}
+    assert monitor.events_since(last_seq) == ([], 2)
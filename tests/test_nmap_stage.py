@@ -0,0 +1,69 @@
+import os
+import subprocess
+import threading
+import time
+import pytest
+from backend.nmap_stage import NmapBatchScanner, parse_nmap_xml, DISCOVERY_ARGUMENTS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return f.read()
+
+def test_parse_discovery_fixture():
+    hosts = parse_nmap_xml(_fixture('nmap_discovery.xml'))
+
+    # Hosts reported down are dropped
+    assert set(hosts) == {'192.168.1.1', '192.168.1.23', '192.168.1.40'}
+    assert hosts['192.168.1.1']['mac'] == 'C0:06:C3:4A:11:02'
+    assert hosts['192.168.1.1']['vendor'] == 'TP-Link Limited'
+    assert hosts['192.168.1.1']['hostname'] == 'router.lan'
+    assert hosts['192.168.1.23']['hostname'] == ''
+    assert hosts['192.168.1.23']['ports'] == []
+
+def test_parse_port_fixture():
+    hosts = parse_nmap_xml(_fixture('nmap_ports.xml'))
+
+    # Filtered ports are not reported as open
+    assert hosts['192.168.1.1']['ports'] == [53, 80, 443]
+    assert hosts['192.168.1.40']['ports'] == [22, 80]
+
+def test_batches_are_bounded(monkeypatch):
+    scanner = NmapBatchScanner(max_processes=2, chunk_size=10)
+    scanner.nmap_path = '/usr/bin/nmap'
+    calls = []
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_nmap(command, input, **kwargs):
+        ips = input.split('\n')
+        with lock:
+            calls.append(ips)
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        hosts = ''.join(f'<host><status state="up"/><address addr="{ip}" addrtype="ipv4"/></host>' for ip in ips)
+        return subprocess.CompletedProcess(command, 0, stdout=f'<nmaprun>{hosts}</nmaprun>', stderr='')
+
+    monkeypatch.setattr(subprocess, 'run', fake_nmap)
+    # Two concurrent scans each have a pool of two; the process slots hold them to two nmaps in all
+    ips = [f'10.0.0.{i}' for i in range(1, 46)]
+    other_ips = [f'10.0.1.{i}' for i in range(1, 46)]
+    other = threading.Thread(target=scanner.scan, args=(other_ips, DISCOVERY_ARGUMENTS))
+    other.start()
+    results = scanner.scan(ips, DISCOVERY_ARGUMENTS)
+    other.join()
+
+    assert len(calls) == 10
+    assert sorted(ip for chunk in calls for ip in chunk) == sorted(ips + other_ips)
+    assert max(peak) == 2
+    assert set(results) == set(ips)
+
+def test_scan_without_nmap_returns_nothing():
+    scanner = NmapBatchScanner(nmap_path='definitely-not-nmap')
+    assert not scanner.available
+    assert scanner.discover(['192.168.1.1']) == {}
@@ -0,0 +1,45 @@
+import pytest
+from backend.oui_db import OUIDatabase, compile_registry, read_registry, lookup_vendor, mac_to_int
+from backend.device_identifier import DeviceIdentifier
+
+IEEE_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-L,70B3D5,IEEE Registration Authority,445 Hoes Lane Piscataway NJ US 08554
+MA-M,70B3D51,Example MA-M Vendor,Somewhere
+MA-S,70B3D5123,"Example MA-S Vendor, Inc.",Somewhere else
+MA-L,001122,Cimsys Inc,Korea
+"""
+
+@pytest.fixture
+def small_db(tmp_path):
+    source = tmp_path / 'oui.csv'
+    source.write_text(IEEE_CSV)
+    output = tmp_path / 'oui.bin'
+    assert compile_registry(read_registry(str(source)), str(output)) == 4
+    db = OUIDatabase(str(output))
+    yield db
+    db.close()
+
+def test_most_specific_prefix_wins(small_db):
+    assert small_db.lookup('70:b3:d5:12:34:56') == 'Example MA-S Vendor, Inc.'
+    assert small_db.lookup('70-B3-D5-1F-FF-FF') == 'Example MA-M Vendor'
+    assert small_db.lookup('70b3.d5ff.0000') == 'IEEE Registration Authority'
+    assert small_db.lookup('00:11:22:33:44:55') == 'Cimsys Inc'
+    assert small_db.lookup('00:11:23:33:44:55') is None
+    assert len(small_db) == 4
+
+def test_partial_mac_prefix():
+    assert mac_to_int('00:11:22') == 0x001122000000
+    assert mac_to_int('') is None
+
+def test_missing_database_returns_none(tmp_path):
+    db = OUIDatabase(str(tmp_path / 'missing.bin'))
+    assert db.lookup('00:11:22:33:44:55') is None
+
+def test_bundled_database():
+    assert lookup_vendor('00:0c:29:aa:bb:cc') == 'VMware, Inc.'
+    assert lookup_vendor('B8:27:EB:00:00:01') == 'Raspberry Pi Foundation'
+
+def test_identifier_uses_oui_vendor():
+    identifier = DeviceIdentifier()
+    # No vendor from nmap, but the MAC prefix is registered to the Raspberry Pi Foundation
+    assert identifier.identify_device({'ip': '10.0.0.9', 'mac': 'b8:27:eb:12:34:56'}) == 'Raspberry Pi'
@@ -0,0 +1,183 @@
+import os
+import socket
+import struct
+import threading
+import time
+import pytest
+from backend.device_identifier import DeviceIdentifier
+from backend.network_scanner import NetworkScanner
+from backend.passive import (LINKTYPE_LINUX_SLL, MAX_SNAPLEN, LiveCapture, PassiveBackend, PassiveDiscovery,
+                             read_capture)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def discover(name, **kwargs):
+    discovery = PassiveDiscovery(**kwargs)
+    discovery.feed_capture(read_capture(os.path.join(FIXTURES, name)))
+    return discovery
+
+def test_pcap_and_pcapng_agree():
+    pcap, pcapng = discover('passive_lan.pcap'), discover('passive_lan.pcapng')
+    assert pcap.devices() == pcapng.devices()
+    # TCP and a trailing fragment are skipped, a truncated mDNS reply is counted as an error
+    assert pcap.stats() == {'packets': 15, 'parsed': 12, 'repeats': 0, 'errors': 1, 'hosts': 7}
+
+def _block(block_type, body):
+    body += b'\x00' * (-len(body) % 4)
+    return struct.pack('<II', block_type, len(body) + 12) + body + struct.pack('<I', len(body) + 12)
+
+def _pcapng(tmp_path, *blocks):
+    section = _block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+    interface = _block(1, struct.pack('<HHI', 1, 0, 0))
+    path = tmp_path / 'capture.pcapng'
+    path.write_bytes(section + interface + b''.join(blocks))
+    return list(read_capture(str(path)))
+
+def _packet(iface, data, captured=None):
+    return _block(6, struct.pack('<IIIII', iface, 0, 0, len(data) if captured is None else captured, len(data)) + data)
+
+def test_pcapng_packet_on_unknown_interface_is_skipped(tmp_path):
+    frames = _pcapng(tmp_path, _packet(3, b'lost'), _packet(0, b'kept'))
+    assert [frame for _, _, frame in frames] == [b'kept']
+
+def test_pcapng_captured_length_is_clamped_to_block(tmp_path):
+    frames = _pcapng(tmp_path, _packet(0, b'abcd', captured=1 << 30), _packet(0, b'next'))
+    assert [frame for _, _, frame in frames] == [b'abcd', b'next']
+
+def test_pcapng_malformed_block_length_stops_reading(tmp_path):
+    for length in (8, 13):
+        frames = _pcapng(tmp_path, _packet(0, b'kept'), struct.pack('<II', 6, length) + b'\x00' * 64)
+        assert [frame for _, _, frame in frames] == [b'kept']
+
+def test_pcap_record_over_snaplen_stops_reading(tmp_path):
+    header = struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)
+    record = struct.pack('<IIII', 0, 0, 4, 4) + b'kept'
+    path = tmp_path / 'capture.pcap'
+    path.write_bytes(header + record + struct.pack('<IIII', 0, 0, MAX_SNAPLEN + 1, 0) + b'\x00' * 64)
+    assert [frame for _, _, frame in read_capture(str(path))] == [b'kept']
+
+def test_repeated_frames_only_refresh_hosts():
+    discovery = discover('passive_lan.pcap')
+    devices = discovery.devices()
+    discovery.feed_capture((timestamp + 60, linktype, frame) for timestamp, linktype, frame
+                           in read_capture(os.path.join(FIXTURES, 'passive_lan.pcap')))
+    assert discovery.stats()['repeats'] == 12
+    again = discovery.devices()
+    assert [d['last_seen'] - 60 for d in again] == [d['last_seen'] for d in devices]
+    assert [dict(d, last_seen=0) for d in again] == [dict(d, last_seen=0) for d in devices]
+
+def test_device_records_from_each_protocol():
+    devices = {d['ip']: d for d in discover('passive_lan.pcap').devices()}
+    assert sorted(devices) == ['192.168.1.1', '192.168.1.20', '192.168.1.30', '192.168.1.40',
+                               '192.168.1.41', '192.168.1.50', '192.168.1.60']
+
+    # DHCP: the lease binds the MAC of the DISCOVER to the ACKed address; the server answers on 67
+    laptop = devices['192.168.1.50']
+    assert laptop['mac'] == 'D4:BE:D9:00:00:50' and laptop['hostname'] == 'alice-laptop'
+    assert laptop['services'][0]['product'] == 'MSFT 5.0'
+    assert devices['192.168.1.1']['ports'] == [67]
+
+    # mDNS: hostname from the A record, port and model from SRV and TXT
+    printer = devices['192.168.1.20']
+    assert printer['hostname'] == 'officejet' and printer['ports'] == [631, 5353]
+    assert printer['services'][0]['service'] == 'ipp'
+    assert printer['services'][0]['product'] == 'HP OfficeJet Pro 9010'
+
+    # SSDP: SERVER header and the LOCATION port
+    camera = devices['192.168.1.30']
+    assert camera['ports'] == [1900, 8000] and 'Hikvision' in camera['services'][0]['product']
+
+    # NetBIOS registration and browser datagram
+    assert devices['192.168.1.40']['hostname'] == 'RASPBERRYPI'
+    assert devices['192.168.1.41']['hostname'] == 'FILESERVER'
+
+    types = {ip: DeviceIdentifier().identify_device(d) for ip, d in devices.items()}
+    assert types['192.168.1.20'] == 'Printer'
+    assert types['192.168.1.30'] == 'Security Camera'
+
+def test_hosts_are_bounded():
+    discovery = discover('passive_lan.pcap', max_hosts=3)
+    assert discovery.stats()['hosts'] == 3
+    # The least recently seen hosts were evicted
+    assert [d['ip'] for d in discovery.devices()] == ['192.168.1.20', '192.168.1.40', '192.168.1.41']
+
+def test_linux_cooked_capture():
+    arp = bytes.fromhex('00010800060400') + b'\x02' + bytes.fromhex('b827eb000040') + socket.inet_aton('10.1.0.9')
+    # packet type, ARPHRD_ETHER, address length, padded source address, protocol
+    sll = bytes.fromhex('0000' '0001' '0006' 'b827eb0000400000' '0806')
+    discovery = PassiveDiscovery()
+    discovery.feed(sll + arp + b'\x00' * 10, 1.0, LINKTYPE_LINUX_SLL)
+    assert [(d['ip'], d['mac']) for d in discovery.devices()] == [('10.1.0.9', 'B8:27:EB:00:00:40')]
+
+def test_repeated_frame_restores_what_it_set():
+    def announce(ip):
+        arp = (bytes.fromhex('00010800060400') + b'\x02' + bytes.fromhex('aaaaaaaaaa01') + socket.inet_aton(ip)
+               + b'\x00' * 10)
+        return bytes.fromhex('ffffffffffff' 'aaaaaaaaaa01' '0806') + arp
+
+    discovery = PassiveDiscovery()
+    for timestamp, ip in enumerate(['10.0.0.5', '10.0.0.6', '10.0.0.5']):
+        discovery.feed(announce(ip), float(timestamp))
+    assert discovery.stats()['repeats'] == 1
+    assert [d['ip'] for d in discovery.devices()] == ['10.0.0.5']
+
+def test_ip_header_longer_than_frame_is_skipped():
+    ethernet = bytes.fromhex('ffffffffffff' 'b827eb000040' '0800')
+    # IHL 15 claims a 60-byte header inside a 28-byte packet
+    ip = bytes.fromhex('4f00001c00000000' '4011' '0000') + socket.inet_aton('10.1.0.9') + socket.inet_aton('10.1.0.255')
+    discovery = PassiveDiscovery()
+    discovery.feed(ethernet + ip + bytes.fromhex('0089008900080000'), 1.0)
+    assert discovery.stats()['packets'] == 1 and discovery.devices() == []
+
+def test_mdns_compression_loop_is_an_error():
+    ethernet = bytes.fromhex('01005e0000fb' 'b827eb000040' '0800')
+    # A response whose answer name is a pointer to itself
+    dns = bytes.fromhex('0000840000000001' '00000000' 'c00c' '0001' '0001' '00000078' '0000')
+    udp = bytes.fromhex('14e914e9') + (8 + len(dns)).to_bytes(2, 'big') + b'\x00\x00'
+    ip = (bytes.fromhex('4500') + (20 + len(udp) + len(dns)).to_bytes(2, 'big') + bytes.fromhex('000000004011' '0000')
+          + socket.inet_aton('10.1.0.9') + socket.inet_aton('224.0.0.251'))
+    discovery = PassiveDiscovery()
+    discovery.feed(ethernet + ip + udp + dns, 1.0)
+    assert discovery.stats()['errors'] == 1
+
+def test_scanner_over_passive_backend():
+    backend = PassiveBackend(discover('passive_lan.pcap'))
+    scanner = NetworkScanner(backend=backend, mode='full')
+    assert scanner.network_ranges == ['192.168.1.0/24']
+    devices = {d['ip']: d for d in scanner.scan_network()}
+    assert len(devices) == 7
+    assert devices['192.168.1.20']['hostname'] == 'officejet'
+    assert devices['192.168.1.20']['ports'] == [631, 5353]
+    assert devices['192.168.1.30']['services'][0]['port'] == 8000
+    assert scanner.rate_limiter.snapshot()['tcp']['sent'] == 0
+
+def test_adaptive_port_selection_over_passive_backend():
+    scanner = NetworkScanner(backend=PassiveBackend(discover('passive_lan.pcap')), mode='full',
+                             port_selection='adaptive')
+    devices = {d['ip']: d for d in scanner.scan_network()}
+    assert len(devices) == 7
+    assert devices['192.168.1.20']['ports'] == [631, 5353]
+    assert scanner.port_selector.stats()[631]['open'] == 1
+
+def test_live_capture_filters_in_kernel():
+    if not LiveCapture.supported():
+        pytest.skip("raw packet sockets are unavailable")
+    capture = LiveCapture('lo', timeout=0.1)
+    frames = []
+    started = threading.Event()
+
+    def collect():
+        # should_stop is first polled once the filtered socket is open
+        for frame in capture.frames(duration=1.0, should_stop=lambda: started.set() or False):
+            frames.append(frame)
+    thread = threading.Thread(target=collect)
+    thread.start()
+    started.wait()
+    time.sleep(0.2)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for port in (9999, 5353, 8080):
+        sender.sendto(b'\x00' * 12, ('127.0.0.1', port))
+    sender.close()
+    thread.join()
+    udp = [frame for _, _, frame in frames if frame[12:14] == b'\x08\x00' and frame[23] == 17]
+    assert udp and {int.from_bytes(frame[36:38], 'big') for frame in udp} == {5353}
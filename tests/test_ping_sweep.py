@@ -0,0 +1,100 @@
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import pytest
+from backend.inventory import DeviceInventory
+from backend.network_scanner import NetworkScanner
+from backend.ping_sweep import PingSweeper, checksum
+from backend.rate_control import ScanRateLimiter
+
+def test_checksum():
+    # RFC 1071's example, and an echo request carrying its own checksum summing to zero
+    assert checksum(b'\x00\x01\xf2\x03\xf4\xf5\xf6\xf7') == 0x220d
+    assert checksum(bytes.fromhex('0800f7fc00000003')) == 0
+
+def _ipv4(src, protocol, payload):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), 0, 0, 64, protocol, 0,
+                         socket.inet_aton(src), socket.inet_aton('10.0.0.1'))
+    return header + payload
+
+def test_replies_are_matched_by_cookie():
+    sweeper = PingSweeper()
+    address = socket.inet_aton('10.9.0.7')
+    echo = bytearray(sweeper._echo(address))
+    echo[0] = 0  # the reply echoes identifier, sequence and payload
+    assert sweeper.parse_reply(_ipv4('10.9.0.7', socket.IPPROTO_ICMP, bytes(echo))) == ('10.9.0.7', 'icmp')
+    # The same reply from another host carries the wrong cookie
+    assert sweeper.parse_reply(_ipv4('10.9.0.8', socket.IPPROTO_ICMP, bytes(echo))) is None
+
+    syn = sweeper._segment(socket.inet_aton('10.0.0.1'), address, 443, 0x02)
+    sport, dport, seq = struct.unpack_from('!HHI', syn)
+    syn_ack = struct.pack('!HHIIBBHHH', 443, sport, 12345, seq + 1, 5 << 4, 0x12, 1024, 0, 0)
+    assert sweeper.parse_reply(_ipv4('10.9.0.7', socket.IPPROTO_TCP, syn_ack)) == ('10.9.0.7', 'tcp-syn/443')
+    wrong = struct.pack('!HHIIBBHHH', 443, sport, 12345, seq + 2, 5 << 4, 0x12, 1024, 0, 0)
+    assert sweeper.parse_reply(_ipv4('10.9.0.7', socket.IPPROTO_TCP, wrong)) is None
+
+    ack = sweeper._segment(socket.inet_aton('10.0.0.1'), address, 80, 0x10)
+    cookie = struct.unpack_from('!I', ack, 8)[0]
+    rst = struct.pack('!HHIIBBHHH', 80, sport, cookie, 0, 5 << 4, 0x04, 0, 0, 0)
+    assert sweeper.parse_reply(_ipv4('10.9.0.7', socket.IPPROTO_TCP, rst)) == ('10.9.0.7', 'tcp-ack/80')
+
+def _run(*args):
+    return subprocess.run(list(args), capture_output=True, text=True)
+
+@pytest.fixture
+def routed_namespace():
+    """Hosts 10.252.9.5 and .6 in a network namespace, reachable only through a route via 10.253.8.2"""
+    if not shutil.which('ip') or not PingSweeper.supported():
+        pytest.skip("Needs iproute2 and raw socket privileges")
+    tag = os.getpid() % 10000
+    namespace, local, peer = f'nmp{tag}', f'nmp{tag}a', f'nmp{tag}b'
+    if _run('ip', 'netns', 'add', namespace).returncode != 0:
+        pytest.skip("Cannot create network namespace")
+    try:
+        in_ns = ('ip', 'netns', 'exec', namespace)
+        steps = [
+            ('ip', 'link', 'add', local, 'type', 'veth', 'peer', 'name', peer),
+            ('ip', 'link', 'set', peer, 'netns', namespace),
+            ('ip', 'addr', 'add', '10.253.8.1/24', 'dev', local),
+            ('ip', 'link', 'set', local, 'up'),
+            in_ns + ('ip', 'addr', 'add', '10.253.8.2/24', 'dev', peer),
+            in_ns + ('ip', 'link', 'set', peer, 'up'),
+            in_ns + ('ip', 'link', 'set', 'lo', 'up'),
+            in_ns + ('ip', 'addr', 'add', '10.252.9.5/32', 'dev', 'lo'),
+            in_ns + ('ip', 'addr', 'add', '10.252.9.6/32', 'dev', 'lo'),
+            ('ip', 'route', 'add', '10.252.9.0/24', 'via', '10.253.8.2'),
+        ]
+        for step in steps:
+            result = _run(*step)
+            if result.returncode != 0:
+                pytest.skip(f"{' '.join(step)}: {result.stderr.strip()}")
+        yield in_ns
+    finally:
+        _run('ip', 'route', 'del', '10.252.9.0/24')
+        _run('ip', 'link', 'del', local)
+        _run('ip', 'netns', 'del', namespace)
+
+def test_icmp_sweep_of_routed_range(routed_namespace):
+    limiter = ScanRateLimiter()
+    limiter.add_range('10.252.9.0/29')
+    sweeper = PingSweeper(syn_ports=(), ack_ports=(), reply_timeout=0.5, rate_limiter=limiter)
+    assert sweeper.sweep_range('10.252.9.0/29') == {'10.252.9.5': 'icmp', '10.252.9.6': 'icmp'}
+    stats = limiter.snapshot()['ping']
+    # Six addresses in the first pass, the four silent ones once more
+    assert stats['sent'] == 10 and stats['answered'] == 2
+
+def test_tcp_pings_find_hosts_ignoring_echo(routed_namespace):
+    _run(*routed_namespace, 'sysctl', '-qw', 'net.ipv4.icmp_echo_ignore_all=1')
+    syn = PingSweeper(syn_ports=(80,), ack_ports=(), retries=0, reply_timeout=0.5)
+    assert syn.sweep_range('10.252.9.4/31') == {'10.252.9.5': 'tcp-syn/80'}
+    ack = PingSweeper(syn_ports=(), ack_ports=(443,), retries=0, reply_timeout=0.5)
+    assert ack.sweep(['10.252.9.6', '10.252.9.7']) == {'10.252.9.6': 'tcp-ack/443'}
+
+def test_scanner_ping_sweeps_routed_ranges(routed_namespace):
+    scanner = NetworkScanner(network_range='10.252.9.0/29', mode='delta', banners=False,
+                             inventory=DeviceInventory(':memory:'))
+    devices = {d['ip']: d for d in scanner.scan_network()}
+    assert sorted(devices) == ['10.252.9.5', '10.252.9.6']
+    assert devices['10.252.9.5']['mac'] == ''
@@ -0,0 +1,85 @@
+import asyncio
+import socket
+import pytest
+from backend.port_scanner import AsyncPortScanner, RttEstimator
+
+def _listen(ip):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((ip, 0))
+    sock.listen(16)
+    return sock
+
+def _closed_port(ip):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((ip, 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+@pytest.fixture
+def loopback_listeners():
+    # 127.0.0.0/8 stands in for a LAN: each address is its own "host"
+    listeners = {}
+    try:
+        for ip in ('127.0.0.2', '127.0.0.3', '127.0.0.4'):
+            listeners[ip] = _listen(ip)
+    except OSError:
+        pytest.skip("Loopback aliases not available")
+    yield listeners
+    for sock in listeners.values():
+        sock.close()
+
+def test_scan_hosts_finds_open_ports(loopback_listeners):
+    open_ports = {ip: sock.getsockname()[1] for ip, sock in loopback_listeners.items()}
+    closed = _closed_port('127.0.0.2')
+    ports = sorted(set(open_ports.values())) + [closed]
+
+    scanner = AsyncPortScanner(max_concurrency=64, per_host_concurrency=2)
+    results = scanner.scan_hosts(open_ports.keys(), ports)
+
+    assert set(results) == set(open_ports)
+    for ip, port in open_ports.items():
+        assert port in results[ip]
+        assert closed not in results[ip]
+
+def test_rtt_adapts_timeout(loopback_listeners):
+    ip, sock = next(iter(loopback_listeners.items()))
+    scanner = AsyncPortScanner(initial_timeout=1.0, min_timeout=0.05)
+    scanner.scan_hosts([ip], [sock.getsockname()[1]])
+
+    # Loopback round trips are far below the initial 1 s guess
+    assert scanner._host_estimator(ip).timeout < 1.0
+    assert scanner.rtt.timeout < 1.0
+
+def test_slow_host_does_not_hold_global_slots():
+    done = []
+
+    async def connect(ip, port, timeout):
+        await asyncio.sleep(0.05 if ip == '10.0.0.1' else 0)
+        done.append(ip)
+        return False
+
+    scanner = AsyncPortScanner(max_concurrency=2, per_host_concurrency=1)
+    scanner._connect = connect
+    scanner.scan_targets({'10.0.0.1': [1, 2, 3, 4], '10.0.0.2': [1, 2, 3, 4]})
+    # The fast host finishes while the slow one is on its first probe
+    assert done[:5] == ['10.0.0.2'] * 4 + ['10.0.0.1']
+
+def test_host_estimates_are_bounded():
+    scanner = AsyncPortScanner(max_hosts=2)
+    first = scanner._host_estimator('10.0.0.1')
+    scanner._host_estimator('10.0.0.2')
+    assert scanner._host_estimator('10.0.0.1') is first
+    scanner._host_estimator('10.0.0.3')
+    # The least recently probed host was dropped
+    assert list(scanner._host_rtt) == ['10.0.0.1', '10.0.0.3']
+
+def test_rtt_estimator_falls_back_to_parent():
+    parent = RttEstimator(initial_timeout=2.0)
+    child = RttEstimator(initial_timeout=2.0, parent=parent)
+    assert child.timeout == 2.0
+    parent.observe(0.1)
+    assert child.timeout == parent.timeout
+    child.observe(0.2)
+    assert child.srtt == 0.2
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import pytest
+from backend.device_identifier import DeviceIdentifier
+from backend.inventory import DeviceInventory
+from backend.network_scanner import NetworkScanner
+from backend.port_selector import PORT_PRIORS, PortSelector, subnet_of
+from backend.scan_backends import SimulatedNetwork
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = DeviceInventory(str(tmp_path / 'inventory.db'))
+    yield inventory
+    inventory.close()
+
+def test_subnet_of():
+    assert subnet_of('10.1.2.3') == '10.1.2.0/24'
+    assert subnet_of('fe80::1') == 'fe80::1'
+
+def test_ranking_learns_per_type_and_subnet():
+    selector = PortSelector(probe_budget=4, explore=0)
+    assert selector.probe_list('10.0.0.5') == [80, 443, 22, 445]
+
+    selector.record([(f'10.0.0.{n}', 'Printer', [9100, 631, 80], [9100, 631]) for n in range(20)])
+    selector.record([(f'10.0.1.{n}', None, [62078, 80], [62078]) for n in range(20)])
+    assert selector.probe_list('10.0.2.5', 'Printer')[:2] == [631, 9100]
+    assert selector.probe_list('10.0.1.99')[0] == 62078
+    # Its own subnet weighs in on top of what every host showed
+    assert (selector.estimate(62078, selector.contexts('10.0.1.99'))
+            > selector.estimate(62078, selector.contexts('10.0.2.5')) > PORT_PRIORS[62078])
+    assert selector.stats(('type', 'Printer'))[80] == {'probed': 20, 'open': 0, 'rate': 0.0}
+
+def test_known_ports_and_exploration():
+    selector = PortSelector(probe_budget=8, explore=0.25)
+    assert 32400 in selector.probe_list('10.0.0.5', known=[32400])
+    lists = [selector.probe_list(f'10.0.0.{n}') for n in range(50)]
+    assert all(len(ports) == len(set(ports)) == 8 for ports in lists)
+    assert all(ports[:6] == lists[0][:6] for ports in lists)
+    # Exploration slots rotate over ports with little evidence
+    assert len({port for ports in lists for port in ports[6:]}) > 2
+    assert selector.deep_ports(5) == sorted([80, 443, 22, 445, 139])
+
+def test_counts_persist_in_inventory(inventory):
+    selector = PortSelector(inventory)
+    selector.record([('10.0.0.1', 'NAS', [5000, 22], [5000])])
+    selector.record([('10.0.0.2', 'NAS', [5000], [5000])])
+    reloaded = PortSelector(inventory)
+    assert reloaded.stats()[5000] == {'probed': 2, 'open': 2, 'rate': 1.0}
+    assert reloaded.stats(('type', 'NAS'))[22]['probed'] == 1
+    assert ('subnet', '10.0.0.0/24', 5000, 2, 2) in inventory.port_stats()
+    # Counts another selector recorded are picked up on reload
+    selector.record([('10.0.0.3', 'NAS', [5000], [])])
+    reloaded.reload()
+    assert reloaded.stats()[5000]['probed'] == 3
+
+def test_priors_cover_identifier_signatures():
+    identifier = DeviceIdentifier()
+    for ports, _ in identifier.port_signatures:
+        assert set(ports) <= set(PORT_PRIORS)
+
+def test_rejects_unknown_port_selection():
+    with pytest.raises(ValueError):
+        NetworkScanner(backend=SimulatedNetwork(hosts=4, network='10.9.0.0/24'), port_selection='random')
+
+def test_adaptive_scanner_finds_more_with_fewer_probes(inventory):
+    def run(**options):
+        network = SimulatedNetwork(hosts=60, network='10.6.0.0/24', latency=0.001, arp_timeout=0.01)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scanner = NetworkScanner(backend=network, mode='full', banners=False, **options)
+            if scanner.port_selector is not None:
+                scanner.port_selector.classify = DeviceIdentifier().identify_device
+            for _ in range(2):
+                alive = scanner.liveness_sweep()
+                sent = network.probes_sent
+                devices = list(scanner.fingerprint_hosts(alive))
+        found = sum(len(set(device['ports']) & set(network.hosts[device['ip']].ports)) for device in devices)
+        return network.probes_sent - sent, found, sum(len(host.ports) for host in network.hosts.values())
+
+    fixed_probes, fixed_found, total = run()
+    probes, found, _ = run(inventory=inventory, port_selection='adaptive')
+    assert probes * 4 < fixed_probes
+    assert found > fixed_found and found >= 0.9 * total
+    assert PortSelector(inventory).stats()[62078]['open'] > 0
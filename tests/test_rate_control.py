@@ -0,0 +1,105 @@
+import asyncio
+import socket
+import pytest
+from backend.rate_control import AdaptiveGate, AimdController, ScanRateLimiter, TokenBucket
+from backend.port_scanner import AsyncPortScanner
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_reservations():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Out of burst: each further token is 1/rate later than the previous one
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    clock.now = 1.0
+    assert bucket.reserve() == 0
+
+def test_limiter_applies_tightest_budget():
+    clock = FakeClock()
+    limiter = ScanRateLimiter(global_pps=1000, range_pps=100, host_pps=10, clock=clock)
+    limiter.add_range('10.0.0.0/24')
+    delays = [limiter.reserve('10.0.0.5') for _ in range(3)]
+    # Host bucket (burst 1, 10 pps) is the bottleneck
+    assert delays == [0, pytest.approx(0.1), pytest.approx(0.2)]
+    # Other hosts in the range only share the range and global budgets
+    assert limiter.reserve('10.0.0.6') == 0
+    assert limiter.reserve('192.168.5.5', per_host=False) == 0
+
+def test_aimd_backs_off_on_loss():
+    controller = AimdController(initial=64, minimum=4, maximum=128, increase=8, window=10,
+                                loss_threshold=0.1)
+    for _ in range(10):
+        controller.record(False)
+    assert controller.current == 72
+    for i in range(10):
+        controller.record(i < 5)
+    assert controller.current == 36
+    for _ in range(100):
+        controller.record(True)
+    assert controller.current == 4
+
+def test_adaptive_gate_follows_controller():
+    controller = AimdController(initial=3)
+    gate = AdaptiveGate(controller, cap=100)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with gate:
+            peak = max(peak, gate.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(20)))
+
+    asyncio.run(main())
+    assert peak == 3
+    assert gate.in_flight == 0
+
+def test_port_scanner_records_metrics():
+    limiter = ScanRateLimiter(global_pps=200, range_pps=200, host_pps=200)
+    scanner = AsyncPortScanner(rate_limiter=limiter, initial_timeout=0.2)
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    port = listener.getsockname()[1]
+    try:
+        assert scanner.scan_hosts(['127.0.0.1'], [port]) == {'127.0.0.1': [port]}
+    finally:
+        listener.close()
+    stats = limiter.snapshot()
+    assert stats['tcp']['sent'] == 1
+    assert stats['tcp']['answered'] == 1
+    assert stats['tcp']['loss'] == 0
+
+def test_filtered_ports_are_not_congestion():
+    def scan(answer_retries):
+        limiter = ScanRateLimiter(global_pps=1e6, range_pps=1e6, host_pps=1e6)
+        scanner = AsyncPortScanner(rate_limiter=limiter, retries=1)
+        tried = set()
+
+        async def connect(ip, port, timeout):
+            retry = port in tried
+            tried.add(port)
+            return False if retry and answer_retries else None
+
+        scanner._connect = connect
+        scanner.scan_hosts(['10.0.0.1'], list(range(1, 201)))
+        return limiter
+
+    # Every port filtered: each attempt times out, which is no sign of loss
+    limiter = scan(answer_retries=False)
+    assert limiter.congestion['tcp'].limit == 64
+    assert limiter.snapshot()['tcp']['loss'] == 0
+    # Every port answering only its retry: the first attempts were dropped
+    limiter = scan(answer_retries=True)
+    assert limiter.congestion['tcp'].limit < 64
+    assert limiter.snapshot()['tcp']['lost'] == 200
@@ -0,0 +1,47 @@
+import pytest
+from backend.network_scanner import NetworkScanner
+from backend.scan_backends import ScanBackend, SimulatedNetwork
+
+def _network(**kwargs):
+    options = dict(hosts=300, network='10.2.0.0/22', latency=0.001, arp_timeout=0.01, probe_timeout=0.01)
+    options.update(kwargs)
+    return SimulatedNetwork(**options)
+
+def test_same_seed_same_network():
+    first, second = _network(seed=5), _network(seed=5)
+    assert [(h.ip, h.mac, h.hostname, h.ports) for h in first.hosts.values()] == \
+        [(h.ip, h.mac, h.hostname, h.ports) for h in second.hosts.values()]
+    assert [h.ip for h in _network(seed=6).hosts.values()] != [h.ip for h in first.hosts.values()]
+    with pytest.raises(ValueError):
+        SimulatedNetwork(hosts=300, network='10.2.0.0/24')
+
+def test_loss_is_deterministic_and_hides_ports():
+    lossless, lossy = _network(), _network(loss=0.3)
+    ips = list(lossless.hosts)
+    ports = [22, 80, 443, 445]
+    clean = lossless.probe_ports(ips, ports)
+    assert clean == {ip: [p for p in ports if p in lossless.hosts[ip].ports] for ip in ips}
+    dropped = lossy.probe_ports(ips, ports)
+    assert dropped == lossy.probe_ports(ips, ports)
+    assert sum(map(len, dropped.values())) < sum(map(len, clean.values()))
+    # ARP retries recover most hosts even at 30% loss
+    assert len(lossy.arp_sweep('10.2.0.0/22')) > 0.95 * len(ips)
+
+def test_threaded_and_async_engines_agree():
+    results = {}
+    for engine in ('async', 'threaded'):
+        scanner = NetworkScanner(backend=_network(hosts=60), engine=engine, mode='full')
+        results[engine] = sorted((d['ip'], tuple(d['ports'])) for d in scanner.scan_network())
+    assert results['async'] == results['threaded']
+    assert len(results['async']) == 60
+
+def test_backend_must_implement_every_stage():
+    class ArpOnly(ScanBackend):
+        def network_ranges(self):
+            return ['10.0.0.0/24']
+
+        def arp_sweep(self, ip_range):
+            return {}
+
+    with pytest.raises(TypeError):
+        ArpOnly()
@@ -0,0 +1,81 @@
+import threading
+import pytest
+from backend.scan_jobs import ScanJobManager
+
+@pytest.fixture
+def manager():
+    manager = ScanJobManager(max_workers=2, max_jobs=3)
+    yield manager
+    manager.shutdown()
+
+def _blocking_scan(release, devices):
+    def scan_fn(progress_callback):
+        progress_callback({'range': '10.0.0.0/24', 'stage': 'hosts', 'completed': 0, 'total': len(devices)})
+        release.wait(5)
+        for device in devices:
+            yield device
+    return scan_fn
+
+def test_concurrent_requests_coalesce(manager):
+    release = threading.Event()
+    devices = [{'ip': '10.0.0.1'}, {'ip': '10.0.0.2'}]
+
+    first, coalesced_first = manager.submit('lan', _blocking_scan(release, devices))
+    second, coalesced_second = manager.submit('lan', _blocking_scan(release, []))
+    assert not coalesced_first
+    assert coalesced_second
+    assert second is first
+    assert first.attached == 2
+
+    release.set()
+    assert first.wait(5)
+    assert first.status == 'completed'
+    assert first.devices == devices
+    assert manager.latest_completed() is first
+
+    # Once finished, the next request starts a fresh sweep
+    third, coalesced_third = manager.submit('lan', _blocking_scan(release, []))
+    assert not coalesced_third
+    assert third.id != first.id
+    third.wait(5)
+
+def test_different_keys_do_not_share_results(manager):
+    release = threading.Event()
+    release.set()
+    a, _ = manager.submit('a', _blocking_scan(release, [{'ip': '10.0.0.1'}]))
+    b, _ = manager.submit('b', _blocking_scan(release, [{'ip': '10.0.1.1'}]))
+    a.wait(5)
+    b.wait(5)
+    assert a.devices == [{'ip': '10.0.0.1'}]
+    assert b.devices == [{'ip': '10.0.1.1'}]
+    assert manager.get(a.id) is a
+    assert manager.get(b.id) is b
+
+def test_events_and_failures(manager):
+    events = []
+    manager.add_listener(lambda event, payload: events.append((event, payload)))
+
+    def failing_scan(progress_callback):
+        yield {'ip': '10.0.0.1'}
+        raise RuntimeError('interface went away')
+
+    job, _ = manager.submit('lan', failing_scan)
+    job.wait(5)
+
+    assert job.status == 'failed'
+    assert job.error == 'interface went away'
+    assert [name for name, _ in events] == ['device_found', 'scan_error']
+    assert all(payload['scan_id'] == job.id for _, payload in events)
+
+def test_result_store_is_bounded(manager):
+    release = threading.Event()
+    release.set()
+    jobs = []
+    for i in range(5):
+        job, _ = manager.submit(f'range-{i}', _blocking_scan(release, []))
+        job.wait(5)
+        jobs.append(job)
+
+    manager.submit('range-last', _blocking_scan(release, []))[0].wait(5)
+    assert len(manager.jobs()) <= 3
+    assert manager.get(jobs[0].id) is None
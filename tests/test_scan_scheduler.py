@@ -0,0 +1,123 @@
+import json
+import pytest
+from backend.inventory import DeviceInventory
+from backend.network_scanner import NetworkScanner
+from backend.scan_backends import SimulatedNetwork
+from backend.scan_jobs import ScanJobManager
+from backend.scan_scheduler import CHANGED, GATEWAY, NEW, OTHER, ScanCheckpoint, ScheduledScan, host_priority
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeScanner:
+    """Scripted sweep; every host takes one clock second to fingerprint"""
+
+    def __init__(self, alive, inventory=None, clock=None, mode='full'):
+        self.alive = alive
+        self.inventory = inventory
+        self.clock = clock or Clock()
+        self.mode = mode
+        self.network_ranges = ['10.0.0.0/24']
+        self.sweeps = 0
+        self.fingerprinted = []
+
+    def liveness_sweep(self):
+        self.sweeps += 1
+        return dict(self.alive)
+
+    def fingerprint_hosts(self, arp_results, progress=None, should_stop=None, timer=None):
+        for ip in arp_results:
+            if should_stop and should_stop():
+                return
+            self.clock.now += 1
+            self.fingerprinted.append(ip)
+            device = {'ip': ip, 'mac': arp_results[ip], 'vendor': 'Unknown', 'ports': [22], 'hostname': ''}
+            if self.inventory is not None:
+                self.inventory.upsert(device)
+            yield device
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = DeviceInventory(str(tmp_path / 'inventory.db'))
+    yield inventory
+    inventory.close()
+
+def mac(n):
+    return f'02:00:00:00:00:{n:02x}'
+
+def known_network(inventory):
+    """.5 is new, .1 a gateway, .7 moved to another MAC, .3 and .9 unchanged"""
+    for n in (1, 3, 7, 9):
+        inventory.upsert({'ip': f'10.0.0.{n}', 'mac': mac(n), 'vendor': 'Acme', 'ports': [80], 'hostname': f'h{n}'})
+    alive = {f'10.0.0.{n}': mac(n) for n in (1, 3, 5, 9)}
+    alive['10.0.0.7'] = mac(77)
+    return alive
+
+def test_host_priority():
+    record = {'mac': mac(1), 'fingerprinted_at': 1.0}
+    assert host_priority('10.0.0.9', mac(1), None) == NEW
+    assert host_priority('10.0.0.254', mac(2), record) == GATEWAY
+    assert host_priority('10.0.0.9', mac(2), record) == CHANGED
+    assert host_priority('10.0.0.9', mac(1).upper(), record) == OTHER
+
+def test_hosts_are_fingerprinted_in_priority_order(inventory):
+    scanner = FakeScanner(known_network(inventory), inventory)
+    devices = list(ScheduledScan(scanner, batch_size=2))
+    assert scanner.fingerprinted == ['10.0.0.5', '10.0.0.1', '10.0.0.7', '10.0.0.3', '10.0.0.9']
+    assert len(devices) == 5 and all(device['complete'] for device in devices)
+
+def test_budget_yields_consistent_partial_result_and_resumes(inventory):
+    clock = Clock()
+    scanner = FakeScanner(known_network(inventory), inventory, clock)
+    progress = []
+    scan = ScheduledScan(scanner, budget=2.5, batch_size=2, clock=clock, progress_callback=progress.append)
+    devices = list(scan)
+
+    by_ip = {device['ip']: device for device in devices}
+    assert len(devices) == len(by_ip) == 5
+    assert [ip for ip, device in by_ip.items() if device['complete']] == ['10.0.0.5', '10.0.0.1', '10.0.0.7']
+    # An unchanged host keeps its last fingerprint, flagged incomplete
+    assert by_ip['10.0.0.3'] == dict(inventory.get('10.0.0.3'), status='active', complete=False, priority='other')
+    assert progress[-1]['stage'] == 'done' and progress[-1]['pending'] == 2
+
+    checkpoint = ScanCheckpoint.from_dict(json.loads(json.dumps(scan.checkpoint.to_dict())))
+    assert [ip for ip, _, _ in checkpoint.pending] == ['10.0.0.3', '10.0.0.9']
+    resumed = ScheduledScan(scanner, checkpoint=checkpoint, clock=clock)
+    devices = list(resumed)
+    assert scanner.sweeps == 1
+    assert scanner.fingerprinted[-2:] == ['10.0.0.3', '10.0.0.9']
+    assert sorted(device['ip'] for device in devices) == sorted(by_ip)
+    assert all(device['complete'] for device in devices)
+    assert resumed.checkpoint is None
+
+def test_delta_mode_serves_fresh_hosts_first(inventory):
+    alive = known_network(inventory)
+    scanner = FakeScanner(alive, inventory, mode='delta')
+    devices = list(ScheduledScan(scanner, budget=0.5, clock=scanner.clock))
+    # .1, .3 and .9 are fresh in the inventory; the new host is the one fingerprint the budget allows
+    assert scanner.fingerprinted == ['10.0.0.5']
+    assert {d['ip'] for d in devices if d['complete']} == {'10.0.0.1', '10.0.0.3', '10.0.0.9', '10.0.0.5'}
+    moved = next(d for d in devices if d['ip'] == '10.0.0.7')
+    assert moved['complete'] is False and moved['mac'] == mac(77) and moved['ports'] == []
+
+def test_scheduled_scan_job_over_simulated_network():
+    network = SimulatedNetwork(hosts=40, network='10.4.0.0/24', latency=0.001, arp_timeout=0.01)
+    scanner = NetworkScanner(backend=network, mode='full')
+    manager = ScanJobManager(max_workers=1)
+    try:
+        job, _ = manager.submit('budget', lambda progress: ScheduledScan(scanner, budget=60, batch_size=16))
+        assert job.wait(30)
+        assert job.status == 'completed' and job.checkpoint is None
+        assert len(job.devices) == 40 and all(device['complete'] for device in job.devices)
+        assert job.to_dict(include_devices=False)['partial'] is False
+
+        job, _ = manager.submit('stopped', lambda progress: ScheduledScan(scanner, should_stop=lambda: True))
+        assert job.wait(30)
+        assert job.to_dict(include_devices=False)['pending_hosts'] == 40
+        assert not any(device['complete'] for device in job.devices)
+    finally:
+        manager.shutdown()
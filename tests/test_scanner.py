@@ -9,4 +9,42 @@ def test_network_scanner():
     for device in devices:
         assert 'ip' in device
         assert 'mac' in device
-        assert 'status' in device
\ No newline at end of file
+        assert 'status' in device
+
+def test_iter_scan_network_streams_devices(monkeypatch):
+    scanner = NetworkScanner('10.0.0.0/30')
+    monkeypatch.setattr(scanner, '_scan_ip_range_arp', lambda ip_range: {
+        '10.0.0.1': '00:11:22:33:44:01', '10.0.0.2': '00:11:22:33:44:02'
+    })
+    monkeypatch.setattr(scanner, '_probe_ports', lambda ips: {ip: [80] for ip in ips})
+    monkeypatch.setattr(scanner, '_nmap_stage', lambda ips, ports: {})
+    monkeypatch.setattr(scanner, '_scan_ip', lambda ip, ports, info, mac='': {
+        'ip': ip, 'mac': mac, 'status': 'active', 'ports': ports
+    })
+
+    progress = []
+    stream = scanner.iter_scan_network(progress_callback=progress.append)
+    first = next(stream)
+    assert first['ip'] in ('10.0.0.1', '10.0.0.2')
+    rest = list(stream)
+
+    assert {d['ip'] for d in [first] + rest} == {'10.0.0.1', '10.0.0.2'}
+    assert [p['stage'] for p in progress[:4]] == ['arp', 'ports', 'nmap', 'hosts']
+    assert progress[-1] == {'range': '10.0.0.0/30', 'stage': 'hosts', 'completed': 2, 'total': 2}
+
+def test_scan_against_simulated_network(monkeypatch):
+    from backend.scan_backends import SimulatedNetwork
+    monkeypatch.setattr(NetworkScanner, 'clear_arp_cache', lambda self: pytest.fail("ARP cache flushed"))
+    network = SimulatedNetwork(hosts=200, network='10.1.0.0/24', seed=3, latency=0.001, arp_timeout=0.01)
+    scanner = NetworkScanner(backend=network, mode='full')
+    assert scanner.network_ranges == ['10.1.0.0/24']
+
+    devices = {device['ip']: device for device in scanner.scan_network()}
+    assert set(devices) == set(network.hosts)
+    for ip, host in network.hosts.items():
+        assert devices[ip]['mac'].lower() == host.mac
+        assert devices[ip]['hostname'] == host.hostname
+        # nmap's deep scan only runs on hosts where the common-port probe found something
+        common = set(host.ports) & set(NetworkScanner.COMMON_PORTS)
+        assert set(devices[ip]['ports']) == (set(host.ports) if common else set())
+        assert {s['port'] for s in devices[ip].get('services', [])} == set(host.banners) & set(devices[ip]['ports'])
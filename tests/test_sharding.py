@@ -0,0 +1,100 @@
+import threading
+import time
+from backend.inventory import DeviceInventory
+from backend.scan_backends import SimulatedNetwork
+from backend.sharding import DeviceReducer, ShardedScanner, split_cidr
+
+class FakeScanner:
+    """Answers every shard with its .1 and .2 hosts, taking delay seconds per shard"""
+    delay = 0.0
+
+    def __init__(self, rate_limiter=None):
+        self.rate_limiter = rate_limiter
+        self.network_ranges = []
+
+    def iter_scan_network(self, mode=None, should_stop=None):
+        network = self.network_ranges[0]
+        prefix = network.rsplit('.', 1)[0]
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            if should_stop():
+                return
+            time.sleep(0.01)
+        for host in (1, 2):
+            yield {'ip': f'{prefix}.{host}', 'mac': f'02:00:00:00:00:0{host}', 'ports': [80],
+                   'budget': self.rate_limiter.global_pps}
+
+class SlowScanner(FakeScanner):
+    delay = 0.5
+
+def test_split_cidr():
+    assert split_cidr(['10.0.0.0/23', '10.0.1.0/24', '192.168.1.0/28']) == \
+        ['10.0.0.0/24', '10.0.1.0/24', '192.168.1.0/28']
+    assert len(split_cidr(['10.0.0.0/16'])) == 256
+    assert split_cidr(['10.0.0.0/22'], prefix=23) == ['10.0.0.0/23', '10.0.2.0/23']
+
+def test_reducer_merges_duplicates():
+    reducer = DeviceReducer()
+    assert reducer.add({'ip': '10.0.0.1', 'vendor': 'Unknown', 'ports': [80]}) is not None
+    assert reducer.add({'ip': '10.0.0.1', 'vendor': 'Netgear', 'ports': [80, 443], 'hostname': 'gw'}) is None
+    assert reducer.add({'mac': 'AA:00:00:00:00:01'}) is not None
+    assert reducer.add({'mac': 'aa:00:00:00:00:01'}) is None
+    assert reducer.devices()[0] == {'ip': '10.0.0.1', 'vendor': 'Netgear', 'ports': [80, 443], 'hostname': 'gw'}
+    assert len(reducer) == 2
+
+def test_sharded_scan_dedupes_and_splits_budget():
+    progress = []
+    with ShardedScanner(['10.0.0.0/23', '10.0.1.0/24'], processes=2, mp_context='fork',
+                        scanner_path=f'{__name__}.FakeScanner',
+                        options={'rate_limiter_options': {'global_pps': 1000}}) as sharded:
+        devices = list(sharded.iter_scan_network(progress_callback=progress.append))
+        # The pool is reused by the next scan
+        assert len(sharded.scan_network()) == 4
+    assert sorted(d['ip'] for d in devices) == ['10.0.0.1', '10.0.0.2', '10.0.1.1', '10.0.1.2']
+    assert {d['budget'] for d in devices} == {500}
+    assert progress[-1] == {'range': progress[-1]['range'], 'stage': 'shards', 'completed': 2, 'total': 2}
+
+def test_cancel_stops_running_and_queued_shards():
+    with ShardedScanner(['10.0.0.0/21'], processes=2, mp_context='fork',
+                        scanner_path=f'{__name__}.SlowScanner') as sharded:
+        threading.Timer(0.2, sharded.cancel).start()
+        started = time.monotonic()
+        devices = sharded.scan_network()
+        assert time.monotonic() - started < 2
+        assert devices == []
+
+def test_cancelling_one_scan_leaves_another_running():
+    with ShardedScanner(['10.0.0.0/23'], processes=2, mp_context='fork',
+                        scanner_path=f'{__name__}.SlowScanner',
+                        options={'rate_limiter_options': {'global_pps': 1000}}) as sharded:
+        stopped = threading.Event()
+        results = {}
+
+        def run(name, should_stop=None):
+            results[name] = list(sharded.iter_scan_network(should_stop=should_stop))
+
+        kept = threading.Thread(target=run, args=('kept',))
+        cancelled = threading.Thread(target=run, args=('cancelled', stopped.is_set))
+        kept.start()
+        cancelled.start()
+        threading.Timer(0.2, stopped.set).start()
+        kept.join()
+        cancelled.join()
+    assert len(results['kept']) == 4
+    assert results['cancelled'] == []
+
+def test_workers_share_port_statistics_by_type(tmp_path):
+    path = str(tmp_path / 'inventory.db')
+    options = {'backend': SimulatedNetwork(hosts=60, network='10.5.0.0/23', latency=0.001, arp_timeout=0.01),
+               'mode': 'full', 'banners': False, 'port_selection': 'adaptive', 'inventory_path': path,
+               'identifier_path': 'backend.device_identifier.DeviceIdentifier'}
+    with ShardedScanner(['10.5.0.0/23'], processes=2, mp_context='fork',
+                        scanner_path='backend.network_scanner.NetworkScanner', options=options) as sharded:
+        assert len(sharded.scan_network()) == 60
+    inventory = DeviceInventory(path)
+    try:
+        scopes = {(scope, key) for scope, key, _, _, _ in inventory.port_stats()}
+        assert {('subnet', '10.5.0.0/24'), ('subnet', '10.5.1.0/24')} <= scopes
+        assert any(scope == 'type' for scope, _ in scopes)
+    finally:
+        inventory.close()